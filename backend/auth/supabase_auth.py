@@ -1,11 +1,157 @@
 """Middleware d'authentification Supabase"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import time
+from typing import Dict, Optional
+
 import jwt
+from cachetools import TLRUCache, TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from config import settings
 
 security = HTTPBearer(auto_error=False)
 
+AUDIENCE = "authenticated"
+
+
+def _unverified_header(token: str) -> dict:
+    """En-tête du JWT (alg, kid) sans décoder le payload ni la signature"""
+    segment = token.split(".", 1)[0]
+    try:
+        header = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+    except (ValueError, binascii.Error) as e:
+        raise jwt.exceptions.DecodeError("En-tête du token invalide") from e
+    if not isinstance(header, dict):
+        raise jwt.exceptions.DecodeError("En-tête du token invalide")
+    return header
+
+
+class TokenVerifier:
+    """
+    Vérification des JWT Supabase avec cache des payloads vérifiés
+    
+    L'éditeur envoie le même token à chaque sauvegarde : le payload vérifié est
+    gardé (clé : SHA-256 du token) jusqu'à son exp, plafonné par
+    AUTH_TOKEN_CACHE_MAX_SECONDS. Les tokens HS256 sont vérifiés avec le
+    secret partagé, les tokens asymétriques (RS256, ES256) avec la clé publique
+    du JWKS Supabase, téléchargée une fois puis gardée en cache par kid.
+    """
+    
+    def __init__(self):
+        self._payloads = TLRUCache(
+            maxsize=max(settings.auth_token_cache_size, 1),
+            ttu=self._expires_at,
+            timer=time.time
+        )
+        self._signing_keys = TTLCache(maxsize=16, ttl=settings.supabase_jwks_cache_seconds)
+        self._jwks_client: Optional[jwt.PyJWKClient] = None
+        self._hmac_secret = None
+        self._hmac_key = b""
+        self._algorithms = frozenset()
+        self._algorithms_source = None
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _expires_at(key, payload: dict, now: float) -> float:
+        limit = now + settings.auth_token_cache_max_seconds
+        exp = payload.get("exp")
+        return min(exp, limit) if isinstance(exp, (int, float)) else limit
+    
+    def _allowed_algorithms(self) -> frozenset:
+        if settings.supabase_jwt_algorithms != self._algorithms_source:
+            self._algorithms_source = settings.supabase_jwt_algorithms
+            self._algorithms = frozenset(
+                alg.strip() for alg in settings.supabase_jwt_algorithms.split(",") if alg.strip()
+            )
+        return self._algorithms
+    
+    def _secret_key(self) -> bytes:
+        # Encodé une seule fois (recalculé si le secret change)
+        if not settings.supabase_jwt_secret:
+            raise jwt.exceptions.InvalidTokenError("SUPABASE_JWT_SECRET non configuré")
+        if settings.supabase_jwt_secret != self._hmac_secret:
+            self._hmac_secret = settings.supabase_jwt_secret
+            self._hmac_key = settings.supabase_jwt_secret.encode("utf-8")
+        return self._hmac_key
+    
+    def _jwks(self) -> jwt.PyJWKClient:
+        if self._jwks_client is None:
+            url = settings.supabase_jwks_url
+            if not url and settings.supabase_url:
+                url = f"{settings.supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+            if not url:
+                raise jwt.exceptions.InvalidTokenError("JWKS non configuré")
+            self._jwks_client = jwt.PyJWKClient(
+                url,
+                cache_keys=True,
+                lifespan=settings.supabase_jwks_cache_seconds
+            )
+        return self._jwks_client
+    
+    async def _public_key(self, kid: Optional[str]):
+        if not kid:
+            raise jwt.exceptions.InvalidTokenError("kid manquant")
+        key = self._signing_keys.get(kid)
+        if key is None:
+            # PyJWKClient est bloquant (urllib) : seulement quand le kid est inconnu
+            try:
+                signing_key = await asyncio.to_thread(self._jwks().get_signing_key, kid)
+            except jwt.exceptions.PyJWKClientError as e:
+                raise jwt.exceptions.InvalidTokenError(str(e)) from e
+            key = self._signing_keys[kid] = signing_key.key
+        return key
+    
+    async def verify(self, token: str) -> dict:
+        """
+        Retourne le payload vérifié du token
+        
+        Raises:
+            jwt.exceptions.InvalidTokenError: Token invalide, expiré ou algorithme refusé
+        """
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        if settings.auth_token_cache_size:
+            payload = self._payloads.get(digest)
+            if payload is not None:
+                self.hits += 1
+                return payload
+        self.misses += 1
+        
+        header = _unverified_header(token)
+        algorithm = header.get("alg")
+        if algorithm not in self._allowed_algorithms():
+            raise jwt.exceptions.InvalidAlgorithmError("Algorithme non autorisé")
+        
+        if algorithm.startswith("HS"):
+            key = self._secret_key()
+        else:
+            key = await self._public_key(header.get("kid"))
+        
+        payload = jwt.decode(token, key, algorithms=[algorithm], audience=AUDIENCE)
+        if settings.auth_token_cache_size:
+            self._payloads[digest] = payload
+        return payload
+    
+    def stats(self) -> Dict[str, object]:
+        total = self.hits + self.misses
+        return {
+            "enabled": settings.auth_token_cache_size > 0,
+            "size": len(self._payloads),
+            "max_size": settings.auth_token_cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "jwks_keys": len(self._signing_keys),
+        }
+
+
+# Instance globale
+token_verifier = TokenVerifier()
+
 async def verify_token(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
@@ -29,14 +175,8 @@ async def verify_token(
         )
     
     try:
-        # Décoder le JWT token avec le secret Supabase
-        payload = jwt.decode(
-            credentials.credentials,
-            settings.supabase_jwt_secret,
-            algorithms=["HS256"],
-            audience="authenticated"
-        )
-        return payload
+        # Vérifier le JWT (secret Supabase ou JWKS), payload en cache jusqu'à exp
+        return await token_verifier.verify(credentials.credentials)
     
     except jwt.exceptions.ExpiredSignatureError:
         raise HTTPException(
@@ -0,0 +1,92 @@
+"""
+Benchmark du coût d'authentification par requête
+
+Compare jwt.decode à chaque requête (comportement initial de verify_token) au
+TokenVerifier avec cache des payloads vérifiés, pour HS256 (secret partagé)
+et ES256 (clé JWKS déjà en cache).
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_auth [--iterations 20000] [--tokens 10]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from auth.supabase_auth import TokenVerifier
+from config import settings
+
+SECRET = "benchmark-secret-" + "x" * 32
+
+
+def make_tokens(count: int, key, algorithm: str, kid=None):
+    exp = int(time.time()) + 3600
+    headers = {"kid": kid} if kid else None
+    return [
+        jwt.encode({"sub": f"user-{i}", "aud": "authenticated", "exp": exp}, key, algorithm=algorithm, headers=headers)
+        for i in range(count)
+    ]
+
+
+def legacy_decode(token: str, key, algorithm: str) -> dict:
+    """Vérification telle qu'elle était faite dans verify_token"""
+    return jwt.decode(token, key, algorithms=[algorithm], audience="authenticated")
+
+
+async def time_verifier(verifier: TokenVerifier, tokens, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        await verifier.verify(tokens[i % len(tokens)])
+    return time.perf_counter() - start
+
+
+def time_legacy(tokens, key, algorithm: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        legacy_decode(tokens[i % len(tokens)], key, algorithm)
+    return time.perf_counter() - start
+
+
+async def run(iterations: int, token_count: int) -> dict:
+    settings.supabase_jwt_secret = SECRET
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    public_key = private_key.public_key()
+
+    cases = {
+        "HS256": (make_tokens(token_count, SECRET, "HS256"), SECRET),
+        "ES256": (make_tokens(token_count, private_key, "ES256", kid="bench"), public_key),
+    }
+
+    report = {"iterations": iterations, "tokens": token_count, "algorithms": {}}
+    for algorithm, (tokens, verify_key) in cases.items():
+        results = {"legacy_us": round(time_legacy(tokens, verify_key, algorithm, iterations) / iterations * 1e6, 2)}
+
+        for label, cache_size in (("uncached_us", 0), ("cached_us", 10000)):
+            settings.auth_token_cache_size = cache_size
+            verifier = TokenVerifier()
+            # Clé publique déjà récupérée : on mesure la vérification, pas le réseau
+            verifier._signing_keys["bench"] = public_key
+            results[label] = round(await time_verifier(verifier, tokens, iterations) / iterations * 1e6, 2)
+            if cache_size:
+                results["hit_rate"] = verifier.stats()["hit_rate"]
+
+        results["speedup"] = round(results["legacy_us"] / results["cached_us"], 1)
+        report["algorithms"][algorithm] = results
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=10, help="Tokens distincts (utilisateurs actifs)")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args.iterations, args.tokens)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Benchmark de l'ingestion des images produits
+
+Sert des photos JPEG synthétiques depuis un serveur HTTP local (latence
+fournisseur simulée), puis ingère les images d'un catalogue : certaines URLs
+sont partagées entre produits, d'autres URLs différentes servent le même
+contenu. Les variantes sont écrites sur le disque local (dossier temporaire
+par défaut). Mesures :
+- ingestion à froid : durée, images/s, téléchargements, déduplications,
+  octets source et variantes par format
+- latence de la boucle asyncio pendant l'ingestion (l'encodage tourne dans
+  le pool de processus) et, pour comparaison, durée d'un encodage qui
+  bloquerait la boucle s'il y était exécuté
+- réingestion des mêmes produits (variantes effacées) : aucun téléchargement
+
+MongoDB : --mongo-url pour une instance locale (base dédiée, vidée au début),
+sinon mongomock-motor en mémoire.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_image_pipeline [--products 60] [--sources 30]
+        [--workers 2] [--latency-ms 50] [--output-dir /tmp/variants] [--mongo-url mongodb://localhost:27017]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "easyshop_bench")
+
+from PIL import Image, ImageFilter  # noqa: E402
+
+from config import settings  # noqa: E402
+from indexes import INDEXES  # noqa: E402
+from services.image_pipeline import (  # noqa: E402
+    ImagePipeline, LocalImageStorage, parse_formats, parse_widths, render_variants
+)
+
+
+def make_photo(rnd: random.Random, width: int, height: int) -> bytes:
+    """JPEG au contenu proche d'une photo produit : dégradé, formes et grain"""
+    base = Image.linear_gradient("L").resize((width, height))
+    channels = [
+        Image.eval(base, lambda value, k=rnd.uniform(0.3, 1.0), o=rnd.randrange(80): int(value * k) + o)
+        for _ in range(3)
+    ]
+    image = Image.merge("RGB", channels)
+    noise = Image.effect_noise((width, height), rnd.uniform(20, 40)).convert("RGB")
+    image = Image.blend(image, noise, 0.25)
+    for _ in range(12):
+        x, y = rnd.randrange(width), rnd.randrange(height)
+        size = rnd.randrange(width // 10, width // 3)
+        color = tuple(rnd.randrange(256) for _ in range(3))
+        image.paste(color, (x, y, min(width, x + size), min(height, y + size)))
+    image = image.filter(ImageFilter.GaussianBlur(1.2))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def start_stub_server(images: List[bytes], latency: float) -> ThreadingHTTPServer:
+    """Serveur fournisseur local : /img/{n}.jpg, quelle que soit la query string"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.path.split("?")[0].rsplit("/", 1)[-1]
+            try:
+                body = images[int(name.split(".")[0])]
+            except (ValueError, IndexError):
+                self.send_error(404)
+                return
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_products(rnd: random.Random, count: int, sources: int, base_url: str) -> List[Dict[str, Any]]:
+    """
+    Produits de 1 à 4 images
+
+    20 % des images sont un autre lien vers un contenu déjà servi (même
+    fichier, query string différente, comme les CDN fournisseurs).
+    """
+    products = []
+    for number in range(count):
+        images = []
+        for order in range(rnd.randint(1, 4)):
+            url = f"{base_url}/img/{rnd.randrange(sources)}.jpg"
+            if rnd.random() < 0.2:
+                url += f"?w={rnd.randrange(10**6)}"
+            images.append({"url": url, "alt": None, "order": order})
+        products.append({
+            "id": f"bench-product-{number}",
+            "user_id": "bench-user",
+            "store_id": "bench-store",
+            "name": f"Produit {number}",
+            "price": 10000,
+            "images": images,
+            "version": 1,
+        })
+    return products
+
+
+async def open_database(mongo_url):
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(mongo_url)
+        db = client[os.environ["DB_NAME"]]
+        await client.drop_database(db.name)
+        return client, db
+
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("mongomock-motor requis sans --mongo-url : pip install mongomock-motor")
+    client = AsyncMongoMockClient()
+    return client, client[os.environ["DB_NAME"]]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentile au rang le plus proche"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> List[float]:
+    """Retard de réveil d'une tâche périodique : temps pendant lequel la boucle était bloquée"""
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+    return lags
+
+
+async def ingest(pipeline: ImagePipeline, products: List[Dict[str, Any]]) -> Dict[str, Any]:
+    before = dict(pipeline.stats())
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+
+    start = time.perf_counter()
+    result = await pipeline.ingest_products([product["id"] for product in products])
+    seconds = time.perf_counter() - start
+
+    stop.set()
+    lags = sorted(await lag_task)
+    after = pipeline.stats()
+    images = sum(len(product["images"]) for product in products)
+    return {
+        "seconds": round(seconds, 3),
+        "images": images,
+        "images_per_second": round(images / seconds, 1),
+        "failed": len(result["failed"]),
+        **{
+            field: after[field] - before[field]
+            for field in ("downloads", "url_hits", "hash_hits", "encoded", "source_bytes", "variant_bytes")
+        },
+        "loop_lag_ms": {
+            "p50": round(percentile(lags, 50) * 1000, 2),
+            "p99": round(percentile(lags, 99) * 1000, 2),
+            "max": round(lags[-1] * 1000, 2) if lags else 0.0,
+        },
+    }
+
+
+async def verify(db, products: List[Dict[str, Any]], output_dir: Path) -> Dict[str, Any]:
+    """Chaque image a ses variantes et chaque variante existe sur le disque ; octets par format"""
+    missing_variants = missing_files = 0
+    async for product in db.products.find({"id": {"$in": [product["id"] for product in products]}}):
+        for image in product["images"]:
+            if not image.get("variants"):
+                missing_variants += 1
+            for variant in image.get("variants", []):
+                key = variant["url"].split("/media/images/", 1)[1]
+                if not (output_dir / key).is_file():
+                    missing_files += 1
+
+    source_bytes = 0
+    bytes_by_format: Dict[str, int] = {}
+    async for asset in db.image_assets.find({}):
+        source_bytes += asset["bytes"]
+        for variant in asset["variants"]:
+            bytes_by_format[variant["format"]] = bytes_by_format.get(variant["format"], 0) + variant["bytes"]
+    return {
+        "images_without_variants": missing_variants,
+        "missing_files": missing_files,
+        "assets_source_bytes": source_bytes,
+        "assets_variant_bytes": bytes_by_format,
+    }
+
+
+async def run(args, output_dir: Path) -> Dict[str, Any]:
+    rnd = random.Random(args.seed)
+    photos = [make_photo(rnd, *rnd.choice([(1600, 1200), (1200, 1600), (2000, 2000), (800, 600)])) for _ in range(args.sources)]
+    server = start_stub_server(photos, args.latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    products = make_products(rnd, args.products, args.sources, base_url)
+
+    widths = parse_widths(settings.image_variant_widths)
+    formats = parse_formats(settings.image_variant_formats)
+    quality = {"webp": settings.image_webp_quality, "avif": settings.image_avif_quality}
+
+    # Ce qu'un encodage coûterait à la boucle s'il y était exécuté directement
+    inline_times = []
+    for data in photos[:5]:
+        start = time.perf_counter()
+        render_variants(data, widths, formats, quality, settings.image_max_pixels)
+        inline_times.append(time.perf_counter() - start)
+    inline_times.sort()
+
+    client, db = await open_database(args.mongo_url)
+    pipeline = ImagePipeline(
+        LocalImageStorage(str(output_dir), "/media/images"),
+        widths=widths,
+        formats=formats,
+        quality=quality,
+        process_workers=args.workers,
+        download_concurrency=args.concurrency,
+        max_bytes=settings.image_max_bytes,
+        max_pixels=settings.image_max_pixels,
+        allow_private_hosts=True
+    )
+    try:
+        await db.products.insert_many([dict(product) for product in products])
+        await db.image_assets.create_indexes(INDEXES[settings.image_asset_collection])
+        await pipeline.attach_collections(db.image_assets, db.products)
+        await pipeline.start()
+
+        report = {
+            "products": len(products),
+            "distinct_sources": args.sources,
+            "source_bytes_avg": round(sum(map(len, photos)) / len(photos)),
+            "widths": widths,
+            "formats": formats,
+            "process_workers": args.workers,
+            "stub_latency_ms": args.latency_ms,
+            "inline_encode_ms": {
+                "p50": round(percentile(inline_times, 50) * 1000, 1),
+                "max": round(inline_times[-1] * 1000, 1),
+            },
+            "cold": await ingest(pipeline, products),
+        }
+        report["verify"] = await verify(db, products, output_dir)
+
+        # Mêmes produits réimportés sans variantes : seul le registre d'assets sert
+        for product in products:
+            await db.products.update_one({"id": product["id"]}, {"$set": {"images": product["images"]}})
+        report["reimport"] = await ingest(pipeline, products)
+    finally:
+        await pipeline.close()
+        server.shutdown()
+        client.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=60)
+    parser.add_argument("--sources", type=int, default=30, help="Images distinctes servies")
+    parser.add_argument("--workers", type=int, default=settings.image_process_workers, help="Processus d'encodage")
+    parser.add_argument("--concurrency", type=int, default=settings.image_download_concurrency)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latence simulée du fournisseur")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default=None, help="Dossier des variantes (sinon temporaire)")
+    parser.add_argument("--mongo-url", default=None, help="MongoDB local (sinon mongomock)")
+    args = parser.parse_args()
+
+    if args.output_dir:
+        report = asyncio.run(run(args, Path(args.output_dir)))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            report = asyncio.run(run(args, Path(directory)))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
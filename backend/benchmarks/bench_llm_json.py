@@ -0,0 +1,87 @@
+"""
+Benchmark du parsing JSON des réponses LLM
+
+Compare l'ancien nettoyage des balises ``` + json.loads avec l'extraction
+équilibrée de services.llm_json, sur un corpus de réponses mal formées.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_llm_json [--iterations 2000]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from services.llm_json import LLMJSONError, parse_section
+
+CORPUS = Path(__file__).parent / "data" / "llm_outputs.json"
+
+
+def legacy_parse(raw_content: str) -> dict:
+    """Parsing tel qu'il était fait dans routes/ai.py"""
+    cleaned = raw_content.strip()
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[7:]
+    if cleaned.startswith("```"):
+        cleaned = cleaned[3:]
+    if cleaned.endswith("```"):
+        cleaned = cleaned[:-3]
+    return json.loads(cleaned.strip())
+
+
+def new_parse(section: str, raw_content: str) -> dict:
+    return parse_section(section, raw_content)
+
+
+def run(iterations: int) -> dict:
+    samples = json.loads(CORPUS.read_text(encoding="utf-8"))
+    report = {"samples": len(samples), "iterations": iterations, "cases": [], "parsers": {}}
+
+    parsers = {
+        "legacy": lambda sample: legacy_parse(sample["raw"]),
+        "llm_json": lambda sample: new_parse(sample["section"], sample["raw"]),
+    }
+
+    for name, parser in parsers.items():
+        succeeded = 0
+        for sample in samples:
+            try:
+                parser(sample)
+                ok = True
+                succeeded += 1
+            except (ValueError, LLMJSONError):
+                ok = False
+            report["cases"].append({"parser": name, "case": f'{sample["section"]}/{sample["case"]}', "ok": ok})
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for sample in samples:
+                try:
+                    parser(sample)
+                except (ValueError, LLMJSONError):
+                    pass
+        elapsed = time.perf_counter() - start
+
+        report["parsers"][name] = {
+            "parsed": succeeded,
+            "success_rate": round(succeeded / len(samples), 3),
+            "us_per_parse": round(elapsed / (iterations * len(samples)) * 1e6, 2),
+        }
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--verbose", action="store_true", help="Afficher le résultat de chaque cas")
+    args = parser.parse_args()
+
+    report = run(args.iterations)
+    if not args.verbose:
+        report.pop("cases")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Benchmark de la recherche de produits (index inversé en mémoire)
+
+Génère un catalogue synthétique (une boutique, 100 000 produits par défaut :
+noms, descriptions, catégories, tags, variantes, prix), construit l'index
+puis mesure la latence par type de requête (p50/p95/max) :
+- parcours sans texte (tri par date, facettes)
+- un ou plusieurs termes, terme rare, filtres catégorie/tags/prix, tris
+- typeahead par préfixe de 1 à 4 lettres
+- recherche juste après une écriture (ordres de tri mis à jour par insertion)
+
+Référence : filtre regex sur tous les produits en Python, ce que ferait un
+find() avec $regex sans index (scan de collection), hors réseau.
+
+Avec --mongo-url, mesure aussi le chargement de l'index depuis MongoDB
+(base dédiée, vidée au début).
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_product_search [--products 100000] [--repeat 50]
+        [--mongo-url mongodb://localhost:27017]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import string
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "easyshop_bench")
+
+from services.product_search import StoreIndex, parse_price_buckets, product_search  # noqa: E402
+from config import settings  # noqa: E402
+
+CATEGORIES = [
+    "Mode femme", "Mode homme", "Enfants", "Chaussures", "Sacs", "Bijoux", "Beauté", "Cosmétiques",
+    "Maison", "Cuisine", "Décoration", "Électronique", "Téléphones", "Informatique", "Épicerie",
+    "Boissons", "Artisanat", "Textile", "Wax", "Sport", "Santé", "Bébé", "Jouets", "Librairie",
+    "Bureau", "Jardin", "Auto", "Outillage", "Animaux", "Musique",
+]
+NOUNS = [
+    "robe", "chemise", "pagne", "boubou", "sandale", "basket", "sac", "collier", "bracelet", "savon",
+    "beurre", "huile", "crème", "panier", "nappe", "coussin", "lampe", "téléphone", "chargeur", "écouteurs",
+    "café", "thé", "bissap", "gingembre", "sculpture", "masque", "tabouret", "ballon", "maillot", "montre",
+]
+ADJECTIVES = [
+    "élégant", "traditionnel", "moderne", "artisanal", "naturel", "bio", "léger", "robuste", "coloré",
+    "brodé", "tressé", "imprimé", "premium", "classique", "confortable", "durable", "original", "authentique",
+]
+COLORS = ["rouge", "bleu", "vert", "jaune", "noir", "blanc", "orange", "violet", "doré", "indigo", "ocre", "beige"]
+MATERIALS = ["coton", "wax", "bazin", "cuir", "raphia", "bois", "karité", "bogolan", "kente", "perles", "argent"]
+
+
+def make_vocabulary(rnd: random.Random, size: int) -> List[str]:
+    """Mots de description inventés : un vocabulaire réaliste de termes rares"""
+    return ["".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(4, 10))) for _ in range(size)]
+
+
+def make_product(rnd: random.Random, vocabulary: List[str], tags: List[str], now: datetime) -> Dict[str, Any]:
+    noun = rnd.choice(NOUNS)
+    color = rnd.choice(COLORS)
+    material = rnd.choice(MATERIALS)
+    name = f"{noun.capitalize()} {rnd.choice(ADJECTIVES)} {material} {color}"
+    description = " ".join(
+        [f"{noun} en {material}", rnd.choice(ADJECTIVES), "fabriqué en Afrique de l'Ouest"]
+        + rnd.sample(vocabulary, 12)
+    )
+    price = round(min(500000, max(500, rnd.lognormvariate(9.5, 0.9))), -2)
+    return {
+        "id": str(uuid.uuid4()),
+        "store_id": "bench-store",
+        "user_id": "bench-user",
+        "name": name,
+        "description": description,
+        "category": rnd.choice(CATEGORIES),
+        "tags": rnd.sample(tags, rnd.randint(1, 5)),
+        "price": price,
+        "compare_at_price": round(price * 1.2, -2) if rnd.random() < 0.3 else None,
+        "images": [{"url": f"https://cdn.example.com/p/{rnd.randrange(10**9)}.webp", "order": 0}],
+        "variants": [
+            {"id": str(uuid.uuid4()), "name": f"{size} / {color}", "price": price, "sku": f"SKU-{rnd.randrange(10**7)}"}
+            for size in rnd.sample(["XS", "S", "M", "L", "XL", "XXL"], rnd.randint(0, 3))
+        ],
+        "is_active": rnd.random() < 0.9,
+        "version": 1,
+        "created_at": now - timedelta(minutes=rnd.randrange(10**6)),
+    }
+
+
+def make_catalog(count: int, seed: int) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    vocabulary = make_vocabulary(rnd, 20000)
+    tags = [f"{rnd.choice(ADJECTIVES)}-{rnd.choice(COLORS)}" for _ in range(150)] + [
+        "promo", "nouveauté", "fait-main", "livraison-gratuite", "best-seller",
+    ] + rnd.sample(vocabulary, 145)
+    tags = list(dict.fromkeys(tags))
+    now = datetime.utcnow()
+    return [make_product(rnd, vocabulary, tags, now) for _ in range(count)]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentile au rang le plus proche"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def timings(fn: Callable[[], Any], repeat: int, before: Callable[[], None] = None) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "p50_ms": round(percentile(times, 50) * 1000, 3),
+        "p95_ms": round(percentile(times, 95) * 1000, 3),
+        "max_ms": round(times[-1] * 1000, 3),
+    }
+
+
+def measure(fn: Callable[[], Any], repeat: int, index: StoreIndex = None) -> Dict[str, Any]:
+    """
+    Latences d'une requête
+
+    Avec index : facettes recalculées à chaque exécution (requêtes toutes
+    différentes), et p50 avec les facettes mémorisées (pages suivantes, autre tri).
+    """
+    result = fn()  # ordres de tri et termes triés calculés à la première requête
+    if index is None:
+        summary = timings(fn, repeat)
+    else:
+        summary = timings(fn, repeat, before=index._facet_cache.clear)
+        summary["cached_facets_p50_ms"] = timings(fn, repeat)["p50_ms"]
+    if isinstance(result, dict) and "total" in result:
+        summary["total"] = result["total"]
+    elif isinstance(result, dict) and "completions" in result:
+        summary["completions"] = len(result["completions"])
+    elif isinstance(result, list):
+        summary["total"] = len(result)
+    return summary
+
+
+def scenarios(index: StoreIndex, catalog: List[Dict[str, Any]], rnd: random.Random) -> Dict[str, Callable[[], Any]]:
+    sample = rnd.choice(catalog)
+    rare_term = sample["description"].split()[-1]
+    category = sample["category"]
+    tag = sample["tags"][0]
+    return {
+        "browse_newest": lambda: index.search(),
+        "browse_active_price_asc": lambda: index.search(is_active=True, sort="price_asc"),
+        "one_term": lambda: index.search("robe"),
+        "two_terms": lambda: index.search("robe wax"),
+        "three_terms_accents": lambda: index.search("Crème karité naturel"),
+        "rare_term": lambda: index.search(rare_term),
+        "term_category_price": lambda: index.search("sac", categories=[category], min_price=5000, max_price=50000),
+        "category_only": lambda: index.search(categories=[category]),
+        "tag_and_price_desc": lambda: index.search(tags=[tag], sort="price_desc"),
+        "term_price_sort_no_facets": lambda: index.search("bleu", sort="price_asc", facets=False),
+        "typeahead_1": lambda: index.suggest("b"),
+        "typeahead_2": lambda: index.suggest("ro"),
+        "typeahead_4": lambda: index.suggest("robe bro"),
+        "typeahead_rare": lambda: index.suggest(rare_term[:4]),
+    }
+
+
+def baseline_regex(catalog: List[Dict[str, Any]], term: str) -> Callable[[], List[Dict[str, Any]]]:
+    pattern = re.compile(term, re.IGNORECASE)
+    return lambda: [
+        product for product in catalog
+        if pattern.search(product["name"]) or pattern.search(product["description"] or "")
+    ]
+
+
+def after_write(index: StoreIndex, catalog: List[Dict[str, Any]], rnd: random.Random) -> Callable[[], Any]:
+    """Une écriture (prix modifié) puis une recherche triée par prix"""
+    def run():
+        product = rnd.choice(catalog)
+        product["version"] += 1
+        product["price"] = round(rnd.uniform(500, 100000), -2)
+        index.upsert(product)
+        return index.search("robe", sort="price_asc")
+    return run
+
+
+async def load_from_mongo(mongo_url: str, catalog: List[Dict[str, Any]]) -> Dict[str, Any]:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ["DB_NAME"]]
+    try:
+        await client.drop_database(db.name)
+        await db.products.create_index("store_id")
+        for start in range(0, len(catalog), 5000):
+            await db.products.insert_many([dict(product) for product in catalog[start:start + 5000]])
+        start = time.perf_counter()
+        index = await product_search.get_index(db.products, "bench-store")
+        return {"products": len(index), "seconds": round(time.perf_counter() - start, 3)}
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50, help="Exécutions par type de requête")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-url", default=None, help="MongoDB local pour mesurer le chargement")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    catalog = make_catalog(args.products, args.seed)
+
+    start = time.perf_counter()
+    index = StoreIndex("bench-store", parse_price_buckets(settings.product_search_price_buckets))
+    for product in catalog:
+        index.upsert(product)
+    build_seconds = time.perf_counter() - start
+
+    report = {
+        "products": len(index),
+        "terms": index.term_count,
+        "build_seconds": round(build_seconds, 3),
+        "queries": {
+            name: measure(fn, args.repeat, index)
+            for name, fn in scenarios(index, catalog, rnd).items()
+        },
+    }
+    report["queries"]["after_write_price_sort"] = measure(after_write(index, catalog, rnd), args.repeat)
+    report["baseline_regex_scan"] = {
+        "one_term": measure(baseline_regex(catalog, "robe"), max(3, args.repeat // 10)),
+        "rare_term": measure(baseline_regex(catalog, catalog[0]["description"].split()[-1]), max(3, args.repeat // 10)),
+    }
+    if args.mongo_url:
+        report["mongo_load"] = asyncio.run(load_from_mongo(args.mongo_url, catalog))
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
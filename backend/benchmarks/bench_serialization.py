@@ -0,0 +1,142 @@
+"""
+Benchmark de la sérialisation des réponses
+
+Compare, sur une grande liste de boutiques et de status checks :
+- legacy : response_model=dict (validation) + jsonable_encoder + json stdlib,
+  et pour /api/status la conversion des timestamps texte en Python
+- default_class : jsonable_encoder + FastJSONResponse (réponse par défaut)
+- direct : json_response (sérialisation directe, sans passe intermédiaire)
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_serialization [--stores 200] [--status 1000] [--iterations 50]
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from responses import FastJSONResponse, json_response
+
+DICT_ADAPTER = TypeAdapter(dict)
+LIST_ADAPTER = TypeAdapter(list)
+
+
+def make_stores(count: int) -> dict:
+    now = datetime.utcnow()
+    stores = []
+    for i in range(count):
+        stores.append({
+            "id": str(uuid.uuid4()),
+            "user_id": "user-1",
+            "name": f"Boutique {i}",
+            "description": "Mode africaine contemporaine, wax et bogolan " * 3,
+            "industry": "fashion",
+            "logo_url": f"https://cdn.example.com/logos/{i}.png",
+            "domain": None,
+            "settings": {
+                "theme": {"primary": "#c2410c", "secondary": "#1f2937", "font": "Inter"},
+                "currency": "XOF",
+                "payment_methods": ["orange_money", "wave", "card"],
+                "shipping_zones": [{"country": c, "fee": 1500 + i} for c in ("SN", "CI", "ML", "BF")],
+            },
+            "is_active": True,
+            "version": 3,
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now,
+        })
+    return {"stores": stores, "count": len(stores), "next_cursor": None}
+
+
+def make_status_checks(count: int, as_strings: bool) -> list:
+    now = datetime.now(timezone.utc)
+    checks = []
+    for i in range(count):
+        timestamp = now - timedelta(seconds=i)
+        checks.append({
+            "id": str(uuid.uuid4()),
+            "client_name": f"client-{i % 20}",
+            "timestamp": timestamp.isoformat() if as_strings else timestamp.replace(tzinfo=None),
+        })
+    return checks
+
+
+def legacy_stores(payload: dict) -> bytes:
+    validated = DICT_ADAPTER.validate_python(payload)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def legacy_status(checks: list) -> bytes:
+    # Ancien GET /api/status : conversion des timestamps texte document par document
+    converted = []
+    for check in checks:
+        check = dict(check)
+        if isinstance(check["timestamp"], str):
+            check["timestamp"] = datetime.fromisoformat(check["timestamp"])
+        converted.append(check)
+    validated = LIST_ADAPTER.validate_python(converted)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def default_class(payload) -> bytes:
+    return FastJSONResponse(jsonable_encoder(payload)).body
+
+
+def direct(payload) -> bytes:
+    return json_response(payload).body
+
+
+def measure(fn, payload, iterations: int) -> float:
+    fn(payload)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(payload)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def run(stores: int, status: int, iterations: int) -> dict:
+    store_payload = make_stores(stores)
+    legacy_checks = make_status_checks(status, as_strings=True)
+    native_checks = make_status_checks(status, as_strings=False)
+
+    cases = {
+        f"stores_{stores}": {
+            "legacy": measure(legacy_stores, store_payload, iterations),
+            "default_class": measure(default_class, store_payload, iterations),
+            "direct": measure(direct, store_payload, iterations),
+            "bytes": len(direct(store_payload)),
+        },
+        f"status_{status}": {
+            "legacy": measure(legacy_status, legacy_checks, iterations),
+            "default_class": measure(default_class, native_checks, iterations),
+            "direct": measure(direct, native_checks, iterations),
+            "bytes": len(direct(native_checks)),
+        },
+    }
+
+    report = {"iterations": iterations, "payloads": {}}
+    for name, timings in cases.items():
+        report["payloads"][name] = {
+            **{f"{key}_ms": round(value, 3) for key, value in timings.items() if key != "bytes"},
+            "bytes": timings["bytes"],
+            "speedup_direct": round(timings["legacy"] / timings["direct"], 1),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", type=int, default=200)
+    parser.add_argument("--status", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.stores, args.status, args.iterations), indent=2))
+
+
+if __name__ == "__main__":
+    main()
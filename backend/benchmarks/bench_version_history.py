@@ -0,0 +1,243 @@
+"""
+Benchmark de l'historique des versions (snapshots + deltas)
+
+Simule une série d'autosaves sur une page (une valeur de section modifiée,
+parfois une section ajoutée ou retirée) et mesure, par intervalle de
+snapshot :
+- le stockage pour 1 000 versions, comparé à un snapshot complet par version
+- le stockage restant après élagage/compaction (politique par défaut)
+- la latence d'enregistrement et de reconstruction d'une version (p50/p95/max)
+
+MongoDB : --mongo-url pour une instance locale (base dédiée, vidée au début),
+sinon mongomock-motor en mémoire (les latences ne mesurent alors que le
+calcul des deltas et leur application).
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_version_history [--edits 1000] [--sections 20]
+        [--intervals 10,25,50] [--restores 200] [--mongo-url mongodb://localhost:27017]
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List
+
+import bson
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "easyshop_bench")
+
+from config import settings  # noqa: E402
+from indexes import INDEXES  # noqa: E402
+from services.version_history import VersionHistory  # noqa: E402
+
+SECTION_TYPES = ("hero", "features", "about", "cta", "testimonials", "gallery")
+
+
+def make_section(rnd: random.Random, order: int) -> Dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "type": rnd.choice(SECTION_TYPES),
+        "order": order,
+        "settings": {
+            "heading": f"Titre de section {order}",
+            "subheading": "Des produits authentiques, livrés partout en Afrique de l'Ouest",
+            "text": "Paragraphe de présentation de la boutique. " * 6,
+            "background": {"color": "#1f2937", "image": f"https://cdn.example.com/bg/{order}.webp"},
+            "items": [{"title": f"Élément {i}", "icon": "star"} for i in range(4)],
+        },
+    }
+
+
+def _bson_now() -> datetime:
+    # Précision des dates BSON (ms), comme un document relu depuis MongoDB
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def make_page(rnd: random.Random, sections: int) -> Dict[str, Any]:
+    now = _bson_now()
+    return {
+        "id": "bench-page",
+        "user_id": "bench-user",
+        "store_id": "bench-store",
+        "title": "Accueil",
+        "slug": "accueil",
+        "sections": [make_section(rnd, i) for i in range(sections)],
+        "is_published": True,
+        "seo_title": None,
+        "seo_description": None,
+        "version": 1,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def edit(page: Dict[str, Any], rnd: random.Random, sections: int) -> Dict[str, Any]:
+    """Une sauvegarde de l'éditeur : surtout des modifications de texte"""
+    page = copy.deepcopy(page)
+    roll = rnd.random()
+    if roll < 0.10 and len(page["sections"]) <= sections:
+        # Ajouts et retraits alternent autour du nombre de sections demandé
+        page["sections"].append(make_section(rnd, len(page["sections"])))
+    elif roll < 0.10:
+        page["sections"].pop(rnd.randrange(len(page["sections"])))
+    else:
+        section = rnd.choice(page["sections"])
+        field = rnd.choice(("heading", "subheading", "text"))
+        section["settings"][field] = f"{field} modifié {rnd.random():.6f}"
+    page["version"] += 1
+    page["updated_at"] = _bson_now()
+    return page
+
+
+class _Collection:
+    """Nom de la collection versionnée, seul attribut lu par record()"""
+    name = "pages"
+
+
+async def open_database(mongo_url):
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(mongo_url)
+        db = client[os.environ["DB_NAME"]]
+        await client.drop_database(db.name)
+        return client, db
+
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("mongomock-motor requis sans --mongo-url : pip install mongomock-motor")
+    client = AsyncMongoMockClient()
+    return client, client[os.environ["DB_NAME"]]
+
+
+async def storage(collection) -> Dict[str, int]:
+    entries = await collection.find({}).to_list(length=None)
+    return {
+        "entries": len(entries),
+        "snapshots": sum(1 for entry in entries if entry["kind"] == "snapshot"),
+        "bytes": sum(len(bson.encode(entry)) for entry in entries),
+    }
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentile au rang le plus proche (load_test importe le fournisseur LLM)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+async def run_interval(db, interval: int, versions: List[Dict[str, Any]], restores: int, seed: int) -> Dict[str, Any]:
+    collection = db[f"versions_{interval}"]
+    # Rétention désactivée pendant les écritures : le stockage brut est mesuré d'abord
+    history = VersionHistory(
+        snapshot_interval=interval,
+        detailed_versions=len(versions),
+        max_versions=len(versions),
+        max_age_days=0
+    )
+    await collection.create_indexes(INDEXES[settings.version_history_collection])
+    await history.attach_collection(collection)
+
+    record_times = []
+    for page in versions:
+        start = time.perf_counter()
+        await history.record(_Collection, page)
+        record_times.append(time.perf_counter() - start)
+
+    raw = await storage(collection)
+
+    rnd = random.Random(seed)
+    restore_times = []
+    for _ in range(restores):
+        expected = rnd.choice(versions)
+        start = time.perf_counter()
+        rebuilt = await history.get_version("pages", expected["id"], expected["user_id"], expected["version"])
+        restore_times.append(time.perf_counter() - start)
+        if rebuilt != expected:
+            raise RuntimeError(f"Version {expected['version']} mal reconstruite (intervalle {interval})")
+
+    # Politique de rétention par défaut appliquée à la dernière version
+    history.detailed_versions = settings.version_history_detailed_versions
+    history.max_versions = settings.version_history_max_versions
+    await history.prune("pages", versions[-1]["id"], versions[-1]["version"])
+    pruned = await storage(collection)
+
+    return {
+        "entries": raw["entries"],
+        "snapshots": raw["snapshots"],
+        "bytes": raw["bytes"],
+        "bytes_per_1000_edits": round(raw["bytes"] / len(versions) * 1000),
+        "after_retention": pruned,
+        "record": latency_summary(record_times),
+        "restore": latency_summary(restore_times),
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    rnd = random.Random(args.seed)
+    versions = [make_page(rnd, args.sections)]
+    for _ in range(args.edits - 1):
+        versions.append(edit(versions[-1], rnd, args.sections))
+
+    full_bytes = sum(len(bson.encode(page)) for page in versions)
+    client, db = await open_database(args.mongo_url)
+    try:
+        report = {
+            "edits": args.edits,
+            "sections": args.sections,
+            "mongo": "local" if args.mongo_url else "mongomock",
+            "page_bytes_last": len(bson.encode(versions[-1])),
+            "full_snapshots": {
+                "bytes": full_bytes,
+                "bytes_per_1000_edits": round(full_bytes / len(versions) * 1000),
+            },
+            "intervals": {},
+        }
+        for interval in args.intervals:
+            result = await run_interval(db, interval, versions, args.restores, args.seed)
+            result["ratio_vs_full"] = round(result["bytes"] / full_bytes, 4)
+            report["intervals"][str(interval)] = result
+    finally:
+        client.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--edits", type=int, default=1000)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument(
+        "--intervals",
+        type=lambda value: [int(part) for part in value.split(",")],
+        default=[10, 25, 50],
+        help="Intervalles de snapshot à comparer"
+    )
+    parser.add_argument("--restores", type=int, default=200, help="Versions reconstruites (tirées au hasard)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-url", default=None, help="MongoDB local (sinon mongomock)")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
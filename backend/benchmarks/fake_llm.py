@@ -0,0 +1,116 @@
+"""
+Faux fournisseur LLM pour les benchmarks
+
+Remplace LlmChat (emergentintegrations) dans le pool de clients : aucun appel
+payant, latence, gigue et taux d'erreur configurables, réponses JSON valides
+pour chaque type de section.
+"""
+import asyncio
+import json
+import random
+from typing import Dict, Optional, Tuple
+
+import services.llm_pool
+
+# Réponse par type de contenu, reconnu à un mot du prompt
+RESPONSES = {
+    "Hero": {
+        "heading": "Le meilleur de l'Afrique",
+        "subheading": "Des produits authentiques livrés chez vous",
+        "cta_primary": "Acheter",
+        "cta_secondary": "Découvrir",
+    },
+    "fonctionnalités": {
+        "heading": "Pourquoi nous choisir",
+        "subheading": "Qualité et service",
+        "features": [
+            {"title": "Livraison rapide", "description": "En 48h", "icon": "truck"},
+            {"title": "Paiement sécurisé", "description": "Mobile money", "icon": "shield"},
+        ],
+    },
+    "À Propos": {
+        "heading": "Notre histoire",
+        "paragraphs": ["Fondée à Dakar.", "Artisans locaux.", "Clients satisfaits."],
+    },
+    "Call-to-Action": {
+        "heading": "Rejoignez-nous",
+        "text": "Commandez dès aujourd'hui",
+        "button_text": "Commander",
+    },
+    "description de produit": {
+        "title": "Produit artisanal",
+        "short_description": "Fabriqué à la main.",
+        "long_description": "Un produit de qualité, fabriqué localement.",
+        "seo_keywords": ["artisanal", "afrique", "qualité"],
+    },
+}
+
+
+class FakeLLMError(Exception):
+    """Erreur injectée par le faux fournisseur"""
+
+
+class FakeLLMConfig:
+    """
+    Comportement du faux fournisseur
+
+    Args:
+        latency: Latence moyenne d'un appel (secondes)
+        jitter: Écart maximal autour de la latence (secondes, uniforme)
+        error_rate: Proportion d'appels en erreur (0 à 1)
+        model_overrides: (provider, model) -> (latency, error_rate) pour un modèle
+        seed: Graine aléatoire pour des runs reproductibles
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.1,
+        error_rate: float = 0.0,
+        model_overrides: Optional[Dict[Tuple[str, str], Tuple[float, float]]] = None,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.model_overrides = model_overrides or {}
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+
+class FakeLlmChat:
+    """Même interface que LlmChat : with_model() puis send_message()"""
+
+    config = FakeLLMConfig()
+
+    def __init__(self, api_key: str, session_id: str, system_message: str):
+        self.session_id = session_id
+        self.system_message = system_message
+        self.model = ("openai", "gpt-5")
+
+    def with_model(self, provider: str, model: str) -> "FakeLlmChat":
+        self.model = (provider, model)
+        return self
+
+    async def send_message(self, message) -> str:
+        config = self.config
+        latency, error_rate = config.model_overrides.get(self.model, (config.latency, config.error_rate))
+        config.calls += 1
+
+        await asyncio.sleep(max(0.0, latency + config.random.uniform(-config.jitter, config.jitter)))
+        if config.random.random() < error_rate:
+            config.errors += 1
+            raise FakeLLMError(f"Erreur simulée ({self.model[0]}/{self.model[1]})")
+
+        for marker, response in RESPONSES.items():
+            if marker in message.text:
+                return json.dumps(response, ensure_ascii=False)
+        return "Bonjour depuis le faux LLM"
+
+
+def install(config: FakeLLMConfig) -> FakeLLMConfig:
+    """Remplace LlmChat par le faux fournisseur pour tout le process"""
+    FakeLlmChat.config = config
+    services.llm_pool.LlmChat = FakeLlmChat
+    return config
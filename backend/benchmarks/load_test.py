@@ -0,0 +1,314 @@
+"""
+Test de charge de l'API avec un faux fournisseur LLM
+
+Lance l'application dans le process (transport ASGI, sans réseau), remplace
+LlmChat par benchmarks.fake_llm et envoie chaque scénario à concurrence
+fixe. Le rapport JSON (p50/p95/p99, requêtes/s, erreurs) est comparable
+d'un run à l'autre avec --compare.
+
+MongoDB : --mongo-url pour une instance locale (base dédiée, vidée au début),
+sinon mongomock-motor en mémoire (pip install mongomock-motor).
+
+Usage (depuis backend/):
+    python -m benchmarks.load_test [--scenarios stores_list,ai_product]
+        [--requests 500] [--concurrency 50] [--llm-latency 0.5] [--llm-jitter 0.1]
+        [--llm-error-rate 0.0] [--mongo-url mongodb://localhost:27017]
+        [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import jwt
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "easyshop_bench")
+
+from benchmarks import fake_llm  # noqa: E402
+from config import settings  # noqa: E402
+
+BENCH_SECRET = "load-test-secret-" + "x" * 32
+STORES_PER_USER = 50
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+class Context:
+    """Utilisateurs, tokens et boutiques créés pour le run"""
+
+    def __init__(self, users: int):
+        self.user_ids = [f"bench-user-{i}" for i in range(users)]
+        exp = int(time.time()) + 3600
+        self.headers = [
+            {"Authorization": "Bearer " + jwt.encode(
+                {"sub": user_id, "aud": "authenticated", "exp": exp}, BENCH_SECRET, algorithm="HS256"
+            )}
+            for user_id in self.user_ids
+        ]
+        self.store_ids: Dict[str, List[str]] = {}
+
+    def user(self, i: int) -> int:
+        return i % len(self.user_ids)
+
+    def store_id(self, i: int) -> str:
+        stores = self.store_ids[self.user_ids[self.user(i)]]
+        return stores[i % len(stores)]
+
+
+def build_scenarios(ctx: Context, use_cache: bool) -> Dict[str, Request]:
+    """Scénarios : une fonction (client, numéro de requête) -> réponse"""
+
+    def stores_list(client, i):
+        return client.get("/api/stores", params={"limit": 20}, headers=ctx.headers[ctx.user(i)])
+
+    def store_get(client, i):
+        return client.get(f"/api/stores/{ctx.store_id(i)}", headers=ctx.headers[ctx.user(i)])
+
+    def store_update(client, i):
+        return client.put(
+            f"/api/stores/{ctx.store_id(i)}",
+            json={"description": f"Mise à jour {i}"},
+            headers=ctx.headers[ctx.user(i)]
+        )
+
+    def ai_product(client, i):
+        return client.post(
+            "/api/ai/generate-product-description",
+            json={
+                # Noms distincts : chaque requête appelle le faux LLM sauf avec --cache
+                "product_name": f"Produit {i}",
+                "category": "artisanat",
+                "features": ["fait main", "coton"],
+                "use_cache": use_cache,
+            },
+            headers=ctx.headers[ctx.user(i)]
+        )
+
+    def ai_store(client, i):
+        return client.post(
+            "/api/ai/generate-store-content",
+            json={"business_type": "mode", "brand_name": f"Marque {i}", "use_cache": use_cache},
+            headers=ctx.headers[ctx.user(i)]
+        )
+
+    return {
+        "stores_list": stores_list,
+        "store_get": store_get,
+        "store_update": store_update,
+        "ai_product": ai_product,
+        "ai_store": ai_store,
+    }
+
+
+async def open_database(mongo_url: Optional[str]):
+    """Base du benchmark : MongoDB local (avec les index déclarés) ou mongomock"""
+    if mongo_url:
+        from database import create_client
+        from indexes import ensure_indexes
+
+        client = create_client(mongo_url)
+        db = client[os.environ["DB_NAME"]]
+        await client.drop_database(db.name)
+        await ensure_indexes(db)
+        return client, db
+
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("mongomock-motor requis sans --mongo-url : pip install mongomock-motor")
+    client = AsyncMongoMockClient()
+    return client, client[os.environ["DB_NAME"]]
+
+
+async def seed(db, ctx: Context) -> None:
+    now = time.time()
+    for user_id in ctx.user_ids:
+        stores = []
+        for n in range(STORES_PER_USER):
+            created_at = datetime.utcfromtimestamp(now - n)
+            stores.append({
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "name": f"Boutique {n}",
+                "industry": "mode",
+                "settings": {},
+                "is_active": True,
+                "version": 1,
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+        await db.stores.insert_many(stores)
+        ctx.store_ids[user_id] = [store["id"] for store in stores]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentile au rang le plus proche"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    request: Request,
+    total: int,
+    concurrency: int
+) -> Dict[str, Any]:
+    """Boucle fermée : concurrency workers envoient total requêtes au plus vite"""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await request(client, i)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "error_rate": round(1 - ok / total, 4) if total else 0.0,
+        "statuses": statuses,
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Écarts relatifs (%) de p50/p95/p99 et rps par rapport à un run de référence"""
+    deltas = {}
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        deltas[name] = {
+            metric: round((result[metric] - before[metric]) / before[metric] * 100, 1) if before[metric] else None
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "rps")
+        }
+    return deltas
+
+
+async def run(args) -> Dict[str, Any]:
+    settings.supabase_jwt_secret = BENCH_SECRET
+    settings.rate_limit_enabled = False
+    llm = fake_llm.install(fake_llm.FakeLLMConfig(
+        latency=args.llm_latency,
+        jitter=args.llm_jitter,
+        error_rate=args.llm_error_rate,
+        seed=args.seed
+    ))
+
+    from server import app
+    from services.ai_service import ai_generator
+
+    if not args.verbose:
+        # Les erreurs LLM injectées sont attendues : ne pas noyer le rapport
+        logging.disable(logging.CRITICAL)
+
+    mongo_client, db = await open_database(args.mongo_url)
+    app.state.db = db
+    ctx = Context(args.users)
+    await seed(db, ctx)
+    await ai_generator.pool.start()
+
+    scenarios = build_scenarios(ctx, args.cache)
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(selected) - set(scenarios)
+    if unknown:
+        sys.exit(f"Scénarios inconnus: {', '.join(sorted(unknown))} (disponibles: {', '.join(scenarios)})")
+
+    report = {
+        "meta": {
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "mongo": "local" if args.mongo_url else "mongomock",
+            "users": args.users,
+            "llm": {"latency_s": args.llm_latency, "jitter_s": args.llm_jitter, "error_rate": args.llm_error_rate},
+            "cache": args.cache,
+        },
+        "scenarios": {},
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name in selected:
+                if args.warmup:
+                    await run_scenario(client, scenarios[name], args.warmup, min(args.concurrency, args.warmup))
+                calls_before = llm.calls
+                result = await run_scenario(client, scenarios[name], args.requests, args.concurrency)
+                result["llm_calls"] = llm.calls - calls_before
+                report["scenarios"][name] = result
+    finally:
+        await ai_generator.pool.close()
+        mongo_client.close()
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="stores_list,store_get,store_update,ai_product,ai_store")
+    parser.add_argument("--requests", type=int, default=500, help="Requêtes par scénario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=20, help="Requêtes non mesurées avant chaque scénario")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="Laisser le cache LLM actif")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-url", default=None, help="MongoDB local (sinon mongomock)")
+    parser.add_argument("--verbose", action="store_true", help="Garder les logs de l'application")
+    parser.add_argument("--output", help="Écrire le rapport JSON dans ce fichier")
+    parser.add_argument("--compare", help="Rapport JSON de référence à comparer")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["delta_pct"] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,135 @@ class Settings(BaseSettings):
     # MongoDB
     mongo_url: str = os.getenv("MONGO_URL", "")
     db_name: str = os.getenv("DB_NAME", "easyshop")
+    mongo_max_pool_size: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    mongo_min_pool_size: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    mongo_max_idle_time_ms: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+    mongo_server_selection_timeout_ms: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    mongo_compressors: str = os.getenv("MONGO_COMPRESSORS", "")  # ex: "zstd,snappy,zlib"
+    pagination_max_limit: int = int(os.getenv("PAGINATION_MAX_LIMIT", "200"))  # taille de page max
+    bulk_write_chunk_size: int = int(os.getenv("BULK_WRITE_CHUNK_SIZE", "500"))  # opérations par bulk_write
+    bulk_max_items: int = int(os.getenv("BULK_MAX_ITEMS", "5000"))  # éléments par requête d'import
+    page_patch_max_operations: int = int(os.getenv("PAGE_PATCH_MAX_OPERATIONS", "1000"))  # par PATCH de page
+    mongo_ensure_indexes: bool = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true"
     
     # Supabase
     supabase_url: str = os.getenv("SUPABASE_URL", "")
     supabase_key: str = os.getenv("SUPABASE_KEY", "")
     supabase_jwt_secret: str = os.getenv("SUPABASE_JWT_SECRET", "")
+    supabase_jwt_algorithms: str = os.getenv("SUPABASE_JWT_ALGORITHMS", "HS256,RS256,ES256")
+    supabase_jwks_url: str = os.getenv("SUPABASE_JWKS_URL", "")  # vide : {SUPABASE_URL}/auth/v1/.well-known/jwks.json
+    supabase_jwks_cache_seconds: int = int(os.getenv("SUPABASE_JWKS_CACHE_SECONDS", "600"))
+    auth_token_cache_size: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))  # 0 : pas de cache
+    auth_token_cache_max_seconds: int = int(os.getenv("AUTH_TOKEN_CACHE_MAX_SECONDS", "300"))
     
     # Emergent LLM Key (gratuit)
     emergent_llm_key: str = os.getenv("EMERGENT_LLM_KEY", "sk-emergent-990E10e8eB875B9A0C")
     
+    # Génération IA concurrente
+    ai_section_concurrency: int = int(os.getenv("AI_SECTION_CONCURRENCY", "4"))  # par requête
+    ai_global_concurrency: int = int(os.getenv("AI_GLOBAL_CONCURRENCY", "16"))  # toutes requêtes confondues
+    ai_batch_concurrency: int = int(os.getenv("AI_BATCH_CONCURRENCY", "8"))  # workers par lot de produits
+    ai_batch_max_items: int = int(os.getenv("AI_BATCH_MAX_ITEMS", "1000"))
+    llm_pool_size: int = int(os.getenv("LLM_POOL_SIZE", "10"))  # sessions simultanées par (provider, model)
+    llm_pool_keepalive_seconds: float = float(os.getenv("LLM_POOL_KEEPALIVE_SECONDS", "60"))
+    llm_stream_api_base: str = os.getenv("LLM_STREAM_API_BASE", "")  # vide : pas de streaming token par token
+    ai_json_repair_enabled: bool = os.getenv("AI_JSON_REPAIR_ENABLED", "true").lower() == "true"
+    ai_json_repair_max_chars: int = int(os.getenv("AI_JSON_REPAIR_MAX_CHARS", "4000"))
+    ai_prompt_ab_enabled: bool = os.getenv("AI_PROMPT_AB_ENABLED", "false").lower() == "true"  # variantes des prompts
+    
+    # Jobs de génération en arrière-plan
+    ai_job_collection: str = os.getenv("AI_JOB_COLLECTION", "ai_jobs")
+    ai_job_inline_workers: int = int(os.getenv("AI_JOB_INLINE_WORKERS", "1"))  # 0 : seulement via worker.py
+    ai_job_lease_seconds: int = int(os.getenv("AI_JOB_LEASE_SECONDS", "120"))
+    ai_job_max_attempts: int = int(os.getenv("AI_JOB_MAX_ATTEMPTS", "3"))
+    ai_job_retry_base_seconds: float = float(os.getenv("AI_JOB_RETRY_BASE_SECONDS", "5"))
+    ai_job_poll_interval_seconds: float = float(os.getenv("AI_JOB_POLL_INTERVAL_SECONDS", "1"))
+    ai_job_webhook_secret: str = os.getenv("AI_JOB_WEBHOOK_SECRET", "")
+    ai_job_webhook_allow_private_hosts: bool = os.getenv("AI_JOB_WEBHOOK_ALLOW_PRIVATE_HOSTS", "false").lower() == "true"  # tests sur serveur local
+    
+    # Routage primary/fallback
+    llm_router_window: int = int(os.getenv("LLM_ROUTER_WINDOW", "50"))  # derniers appels pris en compte
+    llm_breaker_error_rate: float = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+    llm_breaker_min_requests: int = int(os.getenv("LLM_BREAKER_MIN_REQUESTS", "10"))
+    llm_breaker_cooldown_seconds: float = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+    llm_hedge_enabled: bool = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    llm_hedge_min_delay_seconds: float = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "2"))
+    
+    # Limites de débit des routes IA
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "mongo" : partagé entre workers
+    rate_limit_collection: str = os.getenv("RATE_LIMIT_COLLECTION", "rate_limits")
+    ai_rate_limit_requests: int = int(os.getenv("AI_RATE_LIMIT_REQUESTS", "30"))  # requêtes par utilisateur
+    ai_rate_limit_window_seconds: int = int(os.getenv("AI_RATE_LIMIT_WINDOW_SECONDS", "60"))
+    # Tokens LLM estimés par utilisateur ; par défaut un lot de AI_BATCH_MAX_ITEMS produits (~850 tokens chacun) y tient
+    ai_token_budget: int = int(os.getenv("AI_TOKEN_BUDGET", str(max(200000, ai_batch_max_items * 1000))))
+    ai_token_budget_window_seconds: int = int(os.getenv("AI_TOKEN_BUDGET_WINDOW_SECONDS", "3600"))
+    ai_output_tokens_estimate: int = int(os.getenv("AI_OUTPUT_TOKENS_ESTIMATE", "800"))  # par appel LLM
+    public_rate_limit_requests: int = int(os.getenv("PUBLIC_RATE_LIMIT_REQUESTS", "5"))  # par IP, sans auth
+    public_rate_limit_window_seconds: int = int(os.getenv("PUBLIC_RATE_LIMIT_WINDOW_SECONDS", "60"))
+    # Proxys de confiance devant l'API qui ajoutent chacun une adresse à X-Forwarded-For (0 : l'en-tête est ignoré)
+    trusted_proxy_hops: int = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+    
+    # Observabilité
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # /metrics et instrumentation
+    otel_enabled: bool = os.getenv("OTEL_ENABLED", "false").lower() == "true"  # spans (opentelemetry-api requis)
+    
+    # Endpoints internes (/api/internal) : token exigé, sauf ouverture explicite (développement local)
+    internal_api_token: str = os.getenv("INTERNAL_API_TOKEN", "")
+    internal_api_open: bool = os.getenv("INTERNAL_API_OPEN", "false").lower() == "true"
+    
+    # Cache des réponses LLM
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    llm_cache_max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+    llm_cache_ttl_seconds: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+    llm_cache_persistent: bool = os.getenv("LLM_CACHE_PERSISTENT", "false").lower() == "true"
+    llm_cache_collection: str = os.getenv("LLM_CACHE_COLLECTION", "llm_cache")
+    llm_singleflight_enabled: bool = os.getenv("LLM_SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+    
+    # Cache des documents lus (boutiques) : TTL court, borne la fraîcheur sans change stream
+    document_cache_enabled: bool = os.getenv("DOCUMENT_CACHE_ENABLED", "true").lower() == "true"
+    document_cache_max_entries: int = int(os.getenv("DOCUMENT_CACHE_MAX_ENTRIES", "10000"))
+    document_cache_ttl_seconds: int = int(os.getenv("DOCUMENT_CACHE_TTL_SECONDS", "30"))
+    document_cache_change_stream: bool = os.getenv("DOCUMENT_CACHE_CHANGE_STREAM", "true").lower() == "true"
+    
+    # Historique des versions (boutiques, pages) : snapshots périodiques + deltas
+    version_history_enabled: bool = os.getenv("VERSION_HISTORY_ENABLED", "true").lower() == "true"
+    version_history_collection: str = os.getenv("VERSION_HISTORY_COLLECTION", "document_versions")
+    version_snapshot_interval: int = int(os.getenv("VERSION_SNAPSHOT_INTERVAL", "25"))  # deltas max entre deux snapshots
+    version_history_detailed_versions: int = int(os.getenv("VERSION_HISTORY_DETAILED_VERSIONS", "100"))  # au-delà : snapshots seulement
+    version_history_max_versions: int = int(os.getenv("VERSION_HISTORY_MAX_VERSIONS", "1000"))
+    version_history_max_age_days: int = int(os.getenv("VERSION_HISTORY_MAX_AGE_DAYS", "90"))  # 0 : sans limite d'âge
+    
+    # Recherche de produits : index en mémoire par boutique, tenu à jour par les écritures et le change stream
+    product_search_enabled: bool = os.getenv("PRODUCT_SEARCH_ENABLED", "true").lower() == "true"
+    product_search_max_products: int = int(os.getenv("PRODUCT_SEARCH_MAX_PRODUCTS", "500000"))  # tous index confondus
+    product_search_ttl_seconds: int = int(os.getenv("PRODUCT_SEARCH_TTL_SECONDS", "300"))  # reconstruction en arrière-plan
+    product_search_price_buckets: str = os.getenv("PRODUCT_SEARCH_PRICE_BUCKETS", "5000,10000,25000,50000,100000")  # bornes des tranches de prix
+    
+    # Images des produits : téléchargement, déduplication et variantes WebP/AVIF (jobs product_images)
+    image_pipeline_enabled: bool = os.getenv("IMAGE_PIPELINE_ENABLED", "true").lower() == "true"
+    image_auto_ingest: bool = os.getenv("IMAGE_AUTO_INGEST", "true").lower() == "true"  # job créé à l'écriture des produits
+    image_asset_collection: str = os.getenv("IMAGE_ASSET_COLLECTION", "image_assets")  # hash → variantes, partagé entre workers
+    image_storage_backend: str = os.getenv("IMAGE_STORAGE_BACKEND", "local")  # "s3" : bucket S3 compatible
+    image_storage_dir: str = os.getenv("IMAGE_STORAGE_DIR", "media/images")
+    image_local_url_path: str = os.getenv("IMAGE_LOCAL_URL_PATH", "/media/images")  # servi par l'API en stockage local
+    image_public_base_url: str = os.getenv("IMAGE_PUBLIC_BASE_URL", "")  # CDN devant le stockage ; vide : URL du stockage
+    image_s3_bucket: str = os.getenv("IMAGE_S3_BUCKET", "")
+    image_s3_prefix: str = os.getenv("IMAGE_S3_PREFIX", "images")
+    image_s3_endpoint_url: str = os.getenv("IMAGE_S3_ENDPOINT_URL", "")  # vide : AWS ; sinon R2, MinIO...
+    image_s3_region: str = os.getenv("IMAGE_S3_REGION", "")
+    image_variant_widths: str = os.getenv("IMAGE_VARIANT_WIDTHS", "1024,640,320")  # jamais d'agrandissement
+    image_variant_formats: str = os.getenv("IMAGE_VARIANT_FORMATS", "webp,avif")
+    image_webp_quality: int = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+    image_avif_quality: int = int(os.getenv("IMAGE_AVIF_QUALITY", "50"))  # échelle AVIF : 50 ≈ WebP 80
+    image_process_workers: int = int(os.getenv("IMAGE_PROCESS_WORKERS", "2"))  # processus d'encodage
+    image_download_concurrency: int = int(os.getenv("IMAGE_DOWNLOAD_CONCURRENCY", "16"))
+    image_download_timeout_seconds: float = float(os.getenv("IMAGE_DOWNLOAD_TIMEOUT_SECONDS", "20"))
+    image_max_bytes: int = int(os.getenv("IMAGE_MAX_BYTES", "15000000"))  # par image téléchargée
+    image_max_pixels: int = int(os.getenv("IMAGE_MAX_PIXELS", "40000000"))  # protection contre les images bombes
+    image_allow_private_hosts: bool = os.getenv("IMAGE_ALLOW_PRIVATE_HOSTS", "false").lower() == "true"  # tests sur serveur local
+    image_memory_assets: int = int(os.getenv("IMAGE_MEMORY_ASSETS", "10000"))  # assets et URLs gardés en mémoire
+    
     # App config
     app_name: str = "EasyShop Africa API"
     debug: bool = True
@@ -0,0 +1,115 @@
+"""Connexion MongoDB partagée : un seul client Motor et son pool pour toute l'application"""
+import threading
+from typing import Dict, Optional
+
+from fastapi import Request
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+
+from config import settings
+from services.metrics import mongo_command_metrics
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Compteurs d'utilisation du pool de connexions MongoDB
+
+    Les événements arrivent depuis les threads du driver : les compteurs sont
+    protégés par un verrou.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "connections_open": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checked_out": 0,
+            "max_checked_out": 0,
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "pool_clears": 0,
+        }
+
+    def _inc(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += value
+            if name == "checked_out" and self._stats["checked_out"] > self._stats["max_checked_out"]:
+                self._stats["max_checked_out"] = self._stats["checked_out"]
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._inc("pool_clears")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._inc("connections_created")
+        self._inc("connections_open")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._inc("connections_closed")
+        self._inc("connections_open", -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._inc("checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._inc("checkouts")
+        self._inc("checked_out")
+
+    def connection_checked_in(self, event):
+        self._inc("checked_out", -1)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+pool_monitor = PoolMonitor()
+
+
+def create_client(mongo_url: Optional[str] = None) -> AsyncIOMotorClient:
+    """Crée le client Motor avec la configuration du pool définie dans Settings"""
+    options = {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+        "maxIdleTimeMS": settings.mongo_max_idle_time_ms,
+        "serverSelectionTimeoutMS": settings.mongo_server_selection_timeout_ms,
+        "event_listeners": [pool_monitor],
+    }
+    if settings.metrics_enabled:
+        options["event_listeners"].append(mongo_command_metrics)
+    if settings.mongo_compressors:
+        options["compressors"] = settings.mongo_compressors
+
+    return AsyncIOMotorClient(mongo_url or settings.mongo_url, **options)
+
+
+def pool_stats() -> Dict[str, object]:
+    """Utilisation du pool et configuration effective"""
+    return {
+        **pool_monitor.stats(),
+        "max_pool_size": settings.mongo_max_pool_size,
+        "min_pool_size": settings.mongo_min_pool_size,
+        "max_idle_time_ms": settings.mongo_max_idle_time_ms,
+        "server_selection_timeout_ms": settings.mongo_server_selection_timeout_ms,
+        "compressors": settings.mongo_compressors or None,
+    }
+
+
+async def get_database(request: Request) -> AsyncIOMotorDatabase:
+    """Dépendance FastAPI : base de données ouverte par le lifespan de l'application"""
+    return request.app.state.db
@@ -0,0 +1,243 @@
+"""
+Index MongoDB déclarés dans le code
+
+Les index sont créés au démarrage (MONGO_ENSURE_INDEXES). Le rapport compare
+les index déclarés aux index existants, signale ceux qui ne servent pas
+($indexStats) et vérifie par explain() que les requêtes des routes n'ont pas
+besoin d'un scan de collection.
+
+Usage (depuis backend/):
+    python indexes.py  # crée les index et affiche le rapport
+"""
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from config import settings
+from database import create_client
+
+logger = logging.getLogger(__name__)
+
+# Index par collection (modèles de backend/models/)
+INDEXES: Dict[str, List[IndexModel]] = {
+    "stores": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel(
+            [("user_id", ASCENDING), ("is_active", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="user_active_created"
+        ),
+    ],
+    "status_checks": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="timestamp_id_desc"),
+    ],
+    "pages": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("store_id", ASCENDING), ("slug", ASCENDING)], unique=True, name="store_slug_unique"),
+    ],
+    "products": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("store_id", ASCENDING), ("is_active", ASCENDING)], name="store_active"),
+        IndexModel([("store_id", ASCENDING), ("category", ASCENDING)], name="store_category"),
+    ],
+    # Collections des services : noms configurables, index nommés comme
+    # create_index les nommait quand chaque service les créait lui-même
+    settings.ai_job_collection: [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_1"),
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING)], name="status_1_available_at_1"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_1_lease_expires_at_1"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_1_created_at_-1"),
+    ],
+    # TTL : MongoDB supprime lui-même les documents dont expires_at est passé
+    settings.rate_limit_collection: [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_1"),
+    ],
+    settings.llm_cache_collection: [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_1"),
+    ],
+    settings.version_history_collection: [
+        IndexModel(
+            [("collection", ASCENDING), ("document_id", ASCENDING), ("version", DESCENDING)],
+            name="document_version"
+        ),
+    ],
+    settings.image_asset_collection: [
+        IndexModel([("source_urls", ASCENDING)], name="source_urls_1"),
+    ],
+}
+
+# Formes de requêtes des routes, vérifiées par explain()
+QUERY_SHAPES: List[Dict[str, Any]] = [
+    {
+        "collection": "stores",
+        "filter": {"user_id": "u", "is_active": True},
+        "sort": [("created_at", DESCENDING), ("id", DESCENDING)],
+    },
+    {"collection": "stores", "filter": {"id": "s", "user_id": "u"}},
+    {"collection": "stores", "filter": {"id": "s"}},
+    {"collection": "status_checks", "filter": {}, "sort": [("timestamp", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "pages", "filter": {"id": "p"}},
+    {"collection": "pages", "filter": {"store_id": "s", "slug": "accueil"}},
+    {"collection": "products", "filter": {"store_id": "s", "is_active": True}},
+    {"collection": "products", "filter": {"store_id": "s"}},
+]
+
+
+async def backfill_ids(db: AsyncIOMotorDatabase, collection: str) -> int:
+    """
+    Donne un id aux documents qui n'en ont pas, avant de créer l'index unique
+
+    L'id attribué est str(_id), la valeur que create_store renvoyait déjà au client.
+    """
+    result = await db[collection].update_many(
+        {"id": {"$exists": False}},
+        [{"$set": {"id": {"$toString": "$_id"}}}]
+    )
+    if result.modified_count:
+        logger.info("%s documents %s sans id complétés", result.modified_count, collection)
+    return result.modified_count
+
+
+async def convert_legacy_timestamps(db: AsyncIOMotorDatabase) -> int:
+    """
+    Convertit en dates BSON les timestamps de status_checks stockés en texte ISO
+
+    Un tri mêlant textes et dates sépare les deux types (BSON les ordonne par
+    type) et casse la pagination par curseur sur timestamp.
+    """
+    result = await db.status_checks.update_many(
+        {"timestamp": {"$type": "string"}},
+        [{"$set": {"timestamp": {"$toDate": "$timestamp"}}}]
+    )
+    if result.modified_count:
+        logger.info("%s timestamps status_checks convertis en dates", result.modified_count)
+    return result.modified_count
+
+
+async def backfill_page_owners(db: AsyncIOMotorDatabase) -> int:
+    """
+    Recopie sur les pages le user_id de leur boutique
+
+    Les écritures des pages filtrent sur user_id, dénormalisé depuis
+    stores.user_id : une page créée sans ce champ serait introuvable pour le
+    propriétaire de sa boutique.
+    """
+    store_ids = await db.pages.distinct("store_id", {"user_id": None})
+    modified = 0
+    async for store in db.stores.find({"id": {"$in": store_ids}}, {"_id": 0, "id": 1, "user_id": 1}):
+        result = await db.pages.update_many(
+            {"store_id": store["id"], "user_id": None},
+            {"$set": {"user_id": store["user_id"]}}
+        )
+        modified += result.modified_count
+    if modified:
+        logger.info("%s pages sans user_id rattachées au propriétaire de leur boutique", modified)
+    return modified
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> Dict[str, List[str]]:
+    """Crée les index déclarés (opération idempotente)"""
+    await convert_legacy_timestamps(db)
+    await backfill_page_owners(db)
+    created = {}
+    for collection, models in INDEXES.items():
+        if any(model.document.get("unique") and list(model.document["key"]) == ["id"] for model in models):
+            await backfill_ids(db, collection)
+        created[collection] = await db[collection].create_indexes(models)
+    return created
+
+
+async def _index_usage(db: AsyncIOMotorDatabase, collection: str) -> Dict[str, int]:
+    """Nombre d'utilisations de chaque index depuis le démarrage du serveur"""
+    usage = {}
+    try:
+        async for row in db[collection].aggregate([{"$indexStats": {}}]):
+            usage[row["name"]] = row["accesses"]["ops"]
+    except Exception as e:
+        logger.warning("$indexStats indisponible pour %s: %s", collection, e)
+    return usage
+
+
+async def index_report(db: AsyncIOMotorDatabase) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Compare les index déclarés et existants
+
+    - missing : déclarés mais absents
+    - undeclared : présents mais non déclarés dans INDEXES
+    - unused : présents mais jamais utilisés depuis le démarrage du serveur
+    """
+    report = {}
+    for collection, models in INDEXES.items():
+        declared = {model.document["name"] for model in models}
+        existing = set(await db[collection].index_information())
+        usage = await _index_usage(db, collection)
+        report[collection] = {
+            "missing": sorted(declared - existing),
+            "undeclared": sorted(existing - declared - {"_id_"}),
+            "unused": sorted(name for name, ops in usage.items() if ops == 0 and name != "_id_"),
+        }
+    return report
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Liste à plat des étapes d'un plan d'exécution"""
+    stages = [plan.get("stage", "")]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+async def explain_query(
+    db: AsyncIOMotorDatabase,
+    collection: str,
+    filter: Dict[str, Any],
+    sort: Optional[List] = None
+) -> Dict[str, Any]:
+    """Plan gagnant d'une requête : étapes et index utilisé"""
+    cursor = db[collection].find(filter)
+    if sort:
+        cursor = cursor.sort(sort)
+    explanation = await cursor.explain()
+    winning = explanation["queryPlanner"]["winningPlan"]
+    stages = _plan_stages(winning.get("queryPlan", winning))
+    return {
+        "collection": collection,
+        "filter": filter,
+        "stages": stages,
+        "collection_scan": "COLLSCAN" in stages,
+    }
+
+
+async def check_query_plans(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """Explain de chaque forme de requête déclarée dans QUERY_SHAPES"""
+    return [
+        await explain_query(db, shape["collection"], shape["filter"], shape.get("sort"))
+        for shape in QUERY_SHAPES
+    ]
+
+
+async def _main():
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        await ensure_indexes(db)
+        print(json.dumps({
+            "indexes": await index_report(db),
+            "query_plans": await check_query_plans(db),
+        }, indent=2, ensure_ascii=False))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
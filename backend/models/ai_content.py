@@ -0,0 +1,47 @@
+"""Modèles Pydantic du contenu généré par l'IA"""
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+
+class GeneratedContent(BaseModel):
+    # Les champs supplémentaires renvoyés par le modèle sont conservés
+    model_config = ConfigDict(extra="allow")
+
+class HeroContent(GeneratedContent):
+    heading: str
+    subheading: str
+    cta_primary: str
+    cta_secondary: Optional[str] = None
+
+class FeatureItem(GeneratedContent):
+    title: str
+    description: str
+    icon: Optional[str] = None
+
+class FeaturesContent(GeneratedContent):
+    heading: str
+    subheading: Optional[str] = None
+    features: List[FeatureItem]
+
+class AboutContent(GeneratedContent):
+    heading: str
+    paragraphs: List[str]
+
+class CTAContent(GeneratedContent):
+    heading: str
+    text: str
+    button_text: str
+
+class ProductDescriptionContent(GeneratedContent):
+    title: str
+    short_description: str
+    long_description: str
+    seo_keywords: List[str] = []
+
+# Schéma attendu pour chaque type de contenu généré
+SECTION_SCHEMAS = {
+    "hero": HeroContent,
+    "features": FeaturesContent,
+    "about": AboutContent,
+    "cta": CTAContent,
+    "product": ProductDescriptionContent,
+}
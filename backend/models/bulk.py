@@ -0,0 +1,15 @@
+"""Modèles Pydantic des réponses d'import en lot"""
+from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional
+
+class BulkItemResult(BaseModel):
+    index: int  # position de l'élément dans la requête
+    id: Optional[str] = None
+    status: Literal["created", "updated", "unchanged", "not_found", "error"]
+    error: Optional[str] = None
+
+class BulkWriteResponse(BaseModel):
+    success: bool
+    counts: Dict[str, int]
+    results: List[BulkItemResult]
+    version: Optional[int] = None  # nouvelle version de la page (sections)
@@ -1,6 +1,6 @@
 """Modèles Pydantic pour les pages"""
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Any, Optional, List, Literal
 from datetime import datetime
 
 class PageSection(BaseModel):
@@ -28,11 +28,42 @@ class PageUpdate(BaseModel):
     is_published: Optional[bool] = None
     seo_title: Optional[str] = None
     seo_description: Optional[str] = None
+    expected_version: Optional[int] = None  # version lue par le client (contrôle de concurrence)
+
+class PageSectionsBulkRequest(BaseModel):
+    # create : n'écrase pas l'existant ; update : existantes seulement ; upsert : les deux
+    mode: Literal["create", "update", "upsert"] = "upsert"
+    sections: List[PageSection] = Field(..., min_length=1)
+    expected_version: Optional[int] = None
+
+class PagePatchOperation(BaseModel):
+    # Sous-ensemble de RFC 6902, sections adressées par id (voir services/page_patch.py)
+    op: Literal["add", "remove", "replace"]
+    path: str
+    value: Any = None
+
+class PagePatchRequest(BaseModel):
+    operations: List[PagePatchOperation] = Field(..., min_length=1)
+    expected_version: Optional[int] = None
 
 class PageInDB(PageBase):
     id: str
+    user_id: str  # stores.user_id recopié pour les filtres d'écriture (voir indexes.backfill_page_owners)
+    version: int = 0
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
+
+class PageResponse(BaseModel):
+    page: PageInDB
+
+class PageWriteResponse(BaseModel):
+    success: bool = True
+    page: PageInDB
+
+class PagePatchResponse(BaseModel):
+    success: bool = True
+    version: int
+    updated_at: datetime
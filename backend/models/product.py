@@ -1,12 +1,24 @@
 """Modèles Pydantic pour les produits"""
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
 from datetime import datetime
 
-class ProductImage(BaseModel):
+class ImageVariant(BaseModel):
     url: str
+    format: Literal["webp", "avif"]
+    width: int
+    height: int
+    bytes: int
+
+class ProductImage(BaseModel):
+    url: str  # image source (fournisseur)
     alt: Optional[str] = None
     order: int = 0
+    # Renseignés par l'ingestion des images (job product_images)
+    content_hash: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    variants: List[ImageVariant] = []
 
 class ProductVariant(BaseModel):
     id: str
@@ -41,11 +53,64 @@ class ProductUpdate(BaseModel):
     category: Optional[str] = None
     tags: Optional[List[str]] = None
     is_active: Optional[bool] = None
+    expected_version: Optional[int] = None  # version lue par le client (contrôle de concurrence)
+
+class ProductBulkItem(ProductBase):
+    id: str  # fourni par le client : rejouer un import ne crée pas de doublon
+
+class ProductBulkRequest(BaseModel):
+    # create : n'écrase pas l'existant ; update : existants seulement ; upsert : les deux
+    mode: Literal["create", "update", "upsert"] = "upsert"
+    products: List[ProductBulkItem] = Field(..., min_length=1)
 
 class ProductInDB(ProductBase):
     id: str
+    user_id: str  # propriétaire de la boutique, dénormalisé pour les filtres d'écriture
+    version: int = 0
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
+
+class ProductWriteResponse(BaseModel):
+    success: bool = True
+    product: ProductInDB
+
+class ProductSearchHit(BaseModel):
+    id: str
+    name: str
+    price: float
+    compare_at_price: Optional[float] = None
+    category: Optional[str] = None
+    tags: List[str] = []
+    image: Optional[str] = None  # première image
+    is_active: bool = True
+    score: Optional[float] = None  # tri par pertinence seulement
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class PriceRangeCount(BaseModel):
+    min: Optional[float] = None  # inclus ; None : pas de borne
+    max: Optional[float] = None  # exclu
+    count: int
+
+class ProductSearchFacets(BaseModel):
+    categories: List[FacetCount] = []
+    tags: List[FacetCount] = []
+    price_ranges: List[PriceRangeCount] = []
+
+class ProductSearchResponse(BaseModel):
+    total: int
+    products: List[ProductSearchHit]
+    facets: Optional[ProductSearchFacets] = None
+
+class ProductCompletion(BaseModel):
+    text: str
+    count: int
+
+class ProductSuggestResponse(BaseModel):
+    completions: List[ProductCompletion]
+    products: List[ProductSearchHit]
@@ -21,6 +21,7 @@ class StoreUpdate(BaseModel):
     logo_url: Optional[str] = None
     domain: Optional[str] = None
     settings: Optional[dict] = None
+    expected_version: Optional[int] = None  # version lue par le client (contrôle de concurrence)
 
 class StoreInDB(StoreBase):
     id: str
@@ -28,6 +29,18 @@ class StoreInDB(StoreBase):
     created_at: datetime
     updated_at: datetime
     is_active: bool = True
+    version: int = 0
 
     class Config:
         from_attributes = True
+
+class StoreResponse(BaseModel):
+    store: StoreInDB
+
+class StoreWriteResponse(StoreResponse):
+    success: bool = True
+
+class StoreListResponse(BaseModel):
+    stores: List[StoreInDB]  # seulement les champs demandés si fields est fourni
+    count: int
+    next_cursor: Optional[str] = None
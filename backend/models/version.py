@@ -0,0 +1,13 @@
+"""Modèles Pydantic de l'historique des versions"""
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+from datetime import datetime
+
+class VersionInfo(BaseModel):
+    version: int
+    kind: Literal["snapshot", "delta"]
+    created_at: datetime
+
+class VersionListResponse(BaseModel):
+    versions: List[VersionInfo]
+    next_before: Optional[int] = None  # à passer dans before pour les versions plus anciennes
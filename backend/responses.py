@@ -0,0 +1,103 @@
+"""
+Sérialisation JSON des réponses (orjson si disponible)
+
+Les dates sont stockées en UTC naïf dans MongoDB : elles sont sérialisées
+avec leur fuseau (+00:00) pour que les clients ne les lisent pas en heure locale.
+"""
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+
+    _OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+    def _default(value: Any) -> Any:
+        # Types hors JSON (ObjectId, Decimal128...) : représentation texte
+        return str(value)
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+except ImportError:  # orjson est optionnel
+    import json
+
+    def _default(value: Any) -> Any:
+        if isinstance(value, datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return value.isoformat()
+        return str(value)
+
+    def dumps(content: Any) -> bytes:
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """Réponse JSON par défaut de l'application, sérialisée par dumps()"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(
+    content: Any,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None
+) -> FastJSONResponse:
+    """
+    Réponse sérialisée directement, sans passe de validation ni jsonable_encoder
+
+    Le response_model de la route reste utilisé pour la documentation OpenAPI.
+    """
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+def make_etag(*parts: Any) -> str:
+    """ETag fort (entre guillemets) calculé à partir des valeurs données"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return f'"{digest.hexdigest()}"'
+
+
+def document_etag(document: Dict[str, Any]) -> str:
+    """ETag d'un document versionné : change à chaque écriture (version, updated_at)"""
+    updated_at = document.get("updated_at")
+    if isinstance(updated_at, datetime):
+        # Précision de MongoDB (ms) : même ETag avant et après l'aller-retour en base
+        updated_at = updated_at.replace(microsecond=updated_at.microsecond // 1000 * 1000).isoformat()
+    return make_etag(document.get("id"), document.get("version", 0), updated_at)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparaison faible de If-None-Match (RFC 9110), seule admise pour ce header"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def conditional_json_response(
+    content: Any,
+    etag: str,
+    if_none_match: Optional[str],
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    json_response avec ETag, ou 304 sans corps si le client a déjà cette version
+
+    Cache-Control no-cache : le client garde la réponse mais la revalide à
+    chaque fois, ce qui ne coûte qu'un 304 tant qu'elle n'a pas changé.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", **(headers or {})}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return json_response(content, headers=headers)
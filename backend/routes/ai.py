@@ -1,10 +1,16 @@
 """Routes API pour la génération de contenu IA"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, HttpUrl, ValidationError
+from typing import List, Literal, Optional
+import asyncio
 import json
 
+from config import settings
 from services.ai_service import ai_generator
+from services.job_queue import job_queue
+from services.outbound import UnsafeURL, check_public_url
+from services.rate_limit import RateLimitExceeded, rate_limiter
 from auth.supabase_auth import get_current_user
 
 router = APIRouter(prefix="/api/ai", tags=["ai-generation"])
@@ -15,11 +21,80 @@ class StoreGenerationRequest(BaseModel):
     product_url: Optional[str] = None
     target_audience: str = "clients africains"
     sections: List[str] = ["hero", "features", "about", "cta"]
+    max_concurrency: Optional[int] = Field(None, ge=1)  # plafonné par AI_SECTION_CONCURRENCY
+    allow_partial: bool = True  # retourner les sections réussies si d'autres échouent
+    use_cache: bool = True  # False : ne pas lire ni écrire le cache LLM
+    refresh_cache: bool = False  # True : forcer une nouvelle génération et remplacer le cache
 
 class ProductDescriptionRequest(BaseModel):
     product_name: str
     category: str
     features: List[str] = []
+    use_cache: bool = True
+    refresh_cache: bool = False
+
+class ProductDescriptionBatchRequest(BaseModel):
+    items: List[ProductDescriptionRequest] = Field(..., min_length=1)
+    max_concurrency: Optional[int] = Field(None, ge=1)  # plafonné par AI_BATCH_CONCURRENCY
+    use_cache: bool = True
+    refresh_cache: bool = False
+
+class JobSubmitRequest(BaseModel):
+    kind: Literal["store_content", "product_description"]
+    params: dict  # corps de StoreGenerationRequest ou ProductDescriptionRequest selon kind
+    webhook_url: Optional[HttpUrl] = None  # notifié en POST à la fin du job
+
+# Modèle de paramètres et champs transmis au générateur pour chaque type de job
+JOB_PARAMS = {
+    "store_content": (
+        StoreGenerationRequest,
+        {"business_type", "brand_name", "target_audience", "sections",
+         "max_concurrency", "allow_partial", "use_cache", "refresh_cache"}
+    ),
+    "product_description": (
+        ProductDescriptionRequest,
+        {"product_name", "category", "features", "use_cache", "refresh_cache"}
+    ),
+}
+
+async def _enforce_rate_limits(rules) -> None:
+    """Applique les limites de débit ; 429 avec Retry-After si l'une est atteinte"""
+    if not settings.rate_limit_enabled:
+        return
+    try:
+        await rate_limiter.acquire(rules)
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Trop de requêtes de génération, réessayez plus tard",
+            headers={"Retry-After": str(e.retry_after), "X-RateLimit-Limit": str(e.limit)}
+        )
+
+async def enforce_ai_limits(user_id: str, estimated_tokens: int) -> None:
+    """Limite par utilisateur : nombre de requêtes et budget de tokens LLM estimés"""
+    if settings.rate_limit_enabled and estimated_tokens > settings.ai_token_budget:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Requête estimée à {estimated_tokens} tokens, budget de {settings.ai_token_budget}"
+        )
+    await _enforce_rate_limits([
+        (f"ai:requests:{user_id}", settings.ai_rate_limit_requests, settings.ai_rate_limit_window_seconds, 1),
+        (f"ai:tokens:{user_id}", settings.ai_token_budget, settings.ai_token_budget_window_seconds, estimated_tokens),
+    ])
+
+def _store_content_tokens(request: StoreGenerationRequest) -> int:
+    return ai_generator.estimate_store_content_tokens(
+        request.business_type, request.brand_name, request.target_audience, request.sections
+    )
+
+def _product_description_tokens(request: ProductDescriptionRequest) -> int:
+    return ai_generator.estimate_product_description_tokens(
+        request.product_name, request.category, request.features
+    )
+
+def _format_sse(event: str, data: dict) -> str:
+    """Formate un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 @router.post("/generate-store-content")
 async def generate_store_content(
@@ -30,35 +105,33 @@ async def generate_store_content(
     Générer du contenu complet pour une boutique e-commerce
     Utilise GPT-5 (primary) et Claude Sonnet (fallback) via Emergent LLM Key GRATUIT
     """
+    await enforce_ai_limits(current_user["user_id"], _store_content_tokens(request))
+    
     try:
-        # Générer le contenu avec l'IA
-        content = await ai_generator.generate_store_content(
+        # Générer le contenu avec l'IA (sections en parallèle)
+        result = await ai_generator.generate_store_content(
             business_type=request.business_type,
             brand_name=request.brand_name,
             target_audience=request.target_audience,
-            sections=request.sections
+            sections=request.sections,
+            max_concurrency=request.max_concurrency,
+            allow_partial=request.allow_partial,
+            use_cache=request.use_cache,
+            refresh_cache=request.refresh_cache
         )
         
-        # Parser les réponses JSON (l'IA retourne du JSON)
-        parsed_content = {}
-        for section, raw_content in content.items():
-            try:
-                # Nettoyer et parser le JSON
-                cleaned = raw_content.strip()
-                if cleaned.startswith("```json"):
-                    cleaned = cleaned[7:]
-                if cleaned.startswith("```"):
-                    cleaned = cleaned[3:]
-                if cleaned.endswith("```"):
-                    cleaned = cleaned[:-3]
-                parsed_content[section] = json.loads(cleaned.strip())
-            except json.JSONDecodeError:
-                # Si le parsing échoue, retourner le contenu brut
-                parsed_content[section] = {"raw": raw_content}
+        # Parser et valider les réponses JSON (réparation ciblée des sections invalides)
+        parsed = await asyncio.gather(*(
+            ai_generator.parse_section_content(section, raw_content)
+            for section, raw_content in result["content"].items()
+        ))
+        parsed_content = dict(zip(result["content"], parsed))
         
         return {
             "success": True,
             "content": parsed_content,
+            "failed_sections": result["errors"],
+            "partial": bool(result["errors"]),
             "model_used": "gpt-5"
         }
     
@@ -68,6 +141,51 @@ async def generate_store_content(
             detail=f"Erreur lors de la génération: {str(e)}"
         )
 
+@router.post("/generate-store-content/stream")
+async def stream_store_content(
+    request: StoreGenerationRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Générer le contenu d'une boutique en streaming (Server-Sent Events)
+    
+    Événements émis :
+    - delta : morceau de texte d'une section ({"section", "text"})
+    - section_complete : section terminée avec son JSON parsé ({"section", "content"})
+    - section_error : échec d'une section ({"section", "error"})
+    - done : fin du flux ({"completed", "failed"})
+    """
+    await enforce_ai_limits(current_user["user_id"], _store_content_tokens(request))
+    
+    async def event_stream():
+        completed = []
+        failed = {}
+        async for event in ai_generator.stream_store_content(
+            business_type=request.business_type,
+            brand_name=request.brand_name,
+            target_audience=request.target_audience,
+            sections=request.sections,
+            max_concurrency=request.max_concurrency,
+            use_cache=request.use_cache,
+            refresh_cache=request.refresh_cache
+        ):
+            name = event.pop("event")
+            if name == "section_complete":
+                completed.append(event["section"])
+                content = await ai_generator.parse_section_content(event["section"], event["raw"])
+                event = {"section": event["section"], "content": content}
+            elif name == "section_error":
+                failed[event["section"]] = event["error"]
+            yield _format_sse(name, event)
+        
+        yield _format_sse("done", {"completed": completed, "failed": failed})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/generate-product-description")
 async def generate_product_description(
     request: ProductDescriptionRequest,
@@ -76,29 +194,20 @@ async def generate_product_description(
     """
     Générer une description de produit optimisée SEO
     """
+    await enforce_ai_limits(current_user["user_id"], _product_description_tokens(request))
+    
     try:
         description = await ai_generator.generate_product_description(
             product_name=request.product_name,
             category=request.category,
-            features=request.features
+            features=request.features,
+            use_cache=request.use_cache,
+            refresh_cache=request.refresh_cache
         )
         
-        # Parser le JSON
-        try:
-            cleaned = description.strip()
-            if cleaned.startswith("```json"):
-                cleaned = cleaned[7:]
-            if cleaned.startswith("```"):
-                cleaned = cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            parsed_description = json.loads(cleaned.strip())
-        except json.JSONDecodeError:
-            parsed_description = {"raw": description}
-        
         return {
             "success": True,
-            "description": parsed_description
+            "description": await ai_generator.parse_section_content("product", description)
         }
     
     except Exception as e:
@@ -107,11 +216,159 @@ async def generate_product_description(
             detail=f"Erreur lors de la génération: {str(e)}"
         )
 
+@router.post("/generate-product-descriptions/batch")
+async def generate_product_descriptions_batch(
+    request: ProductDescriptionBatchRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Générer les descriptions d'un catalogue de produits en lot
+    
+    Les résultats sont streamés en NDJSON (une ligne JSON par produit) dès
+    qu'ils sont prêts, dans l'ordre de fin de génération. Chaque ligne porte
+    l'index du produit dans la requête. Une dernière ligne résume le lot.
+    """
+    if len(request.items) > settings.ai_batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Maximum {settings.ai_batch_max_items} produits par lot"
+        )
+    
+    estimated_tokens = sum(_product_description_tokens(item) for item in request.items)
+    if settings.rate_limit_enabled and estimated_tokens > settings.ai_token_budget:
+        fitting = settings.ai_token_budget * len(request.items) // estimated_tokens
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Lot estimé à {estimated_tokens} tokens, budget de {settings.ai_token_budget} : "
+                   f"découper en lots d'environ {fitting} produits"
+        )
+    await enforce_ai_limits(current_user["user_id"], estimated_tokens)
+    
+    products = [item.model_dump(include={"product_name", "category", "features"}) for item in request.items]
+    
+    async def stream_results():
+        succeeded = 0
+        async for index, result in ai_generator.iter_product_descriptions(
+            products,
+            max_concurrency=request.max_concurrency,
+            use_cache=request.use_cache,
+            refresh_cache=request.refresh_cache
+        ):
+            line = {"index": index, "product_name": products[index]["product_name"]}
+            if isinstance(result, Exception):
+                line.update({"success": False, "error": str(result)})
+            else:
+                succeeded += 1
+                description = await ai_generator.parse_section_content("product", result)
+                line.update({"success": True, "description": description})
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        
+        yield json.dumps({
+            "done": True,
+            "total": len(products),
+            "succeeded": succeeded,
+            "failed": len(products) - succeeded
+        }) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_generation_job(
+    request: JobSubmitRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Soumettre une génération en arrière-plan
+    
+    Retourne immédiatement un job_id. Le résultat s'obtient en interrogeant
+    GET /api/ai/jobs/{job_id} ou via le webhook_url fourni.
+    """
+    params_model, fields = JOB_PARAMS[request.kind]
+    try:
+        params = params_model(**request.params)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False)
+        )
+    
+    webhook_url = str(request.webhook_url) if request.webhook_url else None
+    if webhook_url:
+        try:
+            await check_public_url(webhook_url, settings.ai_job_webhook_allow_private_hosts)
+        except UnsafeURL as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"webhook_url refusé: {e}"
+            )
+    
+    # Le budget est consommé à la soumission : un job accepté sera exécuté
+    estimate = _store_content_tokens if request.kind == "store_content" else _product_description_tokens
+    await enforce_ai_limits(current_user["user_id"], estimate(params))
+    
+    job = await job_queue.submit(
+        user_id=current_user["user_id"],
+        kind=request.kind,
+        payload=params.model_dump(include=fields),
+        webhook_url=webhook_url
+    )
+    
+    return {"job_id": job["id"], "status": job["status"]}
+
+@router.get("/jobs/{job_id}")
+async def get_generation_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Récupérer le statut et le résultat d'un job de génération
+    """
+    job = await job_queue.get(job_id, current_user["user_id"])
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job non trouvé"
+        )
+    
+    return job
+
+def client_ip(http_request: Request) -> str:
+    """
+    Adresse du client pour les limites par IP
+    
+    Derrière TRUSTED_PROXY_HOPS proxys, chacun ajoute à droite de
+    X-Forwarded-For l'adresse qui lui a parlé : le client est l'entrée à
+    cette distance de la fin. Les entrées plus à gauche viennent du client
+    et peuvent être forgées. Sans proxy déclaré, l'en-tête est ignoré et
+    l'adresse de connexion fait foi ; c'est aussi le réglage à garder si
+    uvicorn réécrit déjà cette adresse (--proxy-headers --forwarded-allow-ips).
+    """
+    peer = http_request.client.host if http_request.client else "unknown"
+    hops = settings.trusted_proxy_hops
+    if hops <= 0:
+        return peer
+    forwarded = [
+        address.strip()
+        for header in http_request.headers.getlist("x-forwarded-for")
+        for address in header.split(",")
+        if address.strip()
+    ]
+    # En-tête plus court que la chaîne déclarée : un proxy ne l'a pas renseigné
+    return forwarded[-hops] if len(forwarded) >= hops else peer
+
 @router.post("/test-generation")
-async def test_ai_generation():
+async def test_ai_generation(http_request: Request):
     """
     Endpoint de test pour vérifier que l'IA fonctionne (pas d'auth requise)
+    
+    Limité par adresse IP (PUBLIC_RATE_LIMIT_REQUESTS, voir client_ip).
     """
+    await _enforce_rate_limits([
+        (f"public:test-generation:{client_ip(http_request)}", settings.public_rate_limit_requests,
+         settings.public_rate_limit_window_seconds, 1),
+    ])
+    
     try:
         test_prompt = "Dis 'Bonjour depuis GPT-5!' et rien d'autre."
         response = await ai_generator.generate_content(
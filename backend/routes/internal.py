@@ -0,0 +1,203 @@
+"""Routes API internes (santé et diagnostic)"""
+import hmac
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Optional
+
+from auth.supabase_auth import token_verifier
+from config import settings
+from database import get_database, pool_stats
+from indexes import check_query_plans, index_report
+from services.ai_service import ai_generator
+from services.document_cache import document_cache
+from services.image_pipeline import image_pipeline
+from services.metrics import REGISTRY, stats_collector
+from services.product_search import product_search
+from services.prompts import prompt_registry
+from services.rate_limit import rate_limiter
+from services.version_history import version_history
+
+async def require_internal_token(
+    x_internal_token: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+) -> None:
+    """
+    Protège les endpoints internes par le header X-Internal-Token
+    
+    Le token est aussi accepté en "Authorization: Bearer" (configuration
+    bearer_token d'un scrape Prometheus). Sans INTERNAL_API_TOKEN configuré,
+    l'accès est refusé, sauf si INTERNAL_API_OPEN=true l'ouvre explicitement.
+    """
+    if settings.internal_api_open:
+        return
+    if settings.internal_api_token:
+        token = x_internal_token
+        if not token and authorization and authorization.startswith("Bearer "):
+            token = authorization[len("Bearer "):]
+        if token and hmac.compare_digest(token, settings.internal_api_token):
+            return
+    
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Accès interne refusé"
+    )
+
+# Statistiques déjà tenues par les services, lues au moment du scrape
+REGISTRY.add_collector(stats_collector(
+    "llm_cache_requests_total", "Requêtes au cache des réponses LLM",
+    ai_generator.cache.stats, ("memory_hits", "persistent_hits", "misses", "bypassed"), kind="counter", label="result"
+))
+REGISTRY.add_collector(stats_collector(
+    "auth_token_cache_requests_total", "Vérifications JWT servies par le cache",
+    token_verifier.stats, ("hits", "misses"), kind="counter", label="result"
+))
+REGISTRY.add_collector(stats_collector(
+    "llm_singleflight", "Coalescence des générations identiques",
+    ai_generator.inflight.stats, ("in_flight", "executions", "coalesced")
+))
+REGISTRY.add_collector(stats_collector(
+    "document_cache_requests_total", "Lectures de documents servies par le cache",
+    document_cache.stats, ("hits", "misses"), kind="counter", label="result"
+))
+REGISTRY.add_collector(stats_collector(
+    "document_cache", "Invalidations du cache des documents",
+    document_cache.stats, ("invalidations", "clears"), kind="counter"
+))
+REGISTRY.add_collector(stats_collector(
+    "version_history_events_total", "Historique des versions (entrées écrites, désordre, échecs, élagages)",
+    version_history.stats, ("snapshots", "deltas", "out_of_order", "failures", "prunes"), kind="counter", label="event"
+))
+REGISTRY.add_collector(stats_collector(
+    "product_search", "Index de recherche des produits (boutiques et produits indexés)",
+    product_search.stats, ("stores", "products", "terms")
+))
+REGISTRY.add_collector(stats_collector(
+    "product_search_events_total", "Recherches, chargements et mises à jour des index de produits",
+    product_search.stats, ("queries", "loads", "refreshes", "updates", "evictions", "clears"), kind="counter", label="event"
+))
+REGISTRY.add_collector(stats_collector(
+    "image_pipeline_events_total", "Images téléchargées, dédupliquées (URL, contenu), encodées et refusées",
+    image_pipeline.stats, ("downloads", "url_hits", "hash_hits", "encoded", "rejected", "products_updated"),
+    kind="counter", label="event"
+))
+REGISTRY.add_collector(stats_collector(
+    "image_pipeline_bytes_total", "Octets des images sources téléchargées et des variantes produites",
+    image_pipeline.stats, ("source_bytes", "variant_bytes"), kind="counter", label="kind"
+))
+REGISTRY.add_collector(stats_collector(
+    "mongo_pool", "Pool de connexions MongoDB",
+    pool_stats, ("connections_open", "checked_out", "max_checked_out", "checkout_failures")
+))
+REGISTRY.add_collector(stats_collector(
+    "rate_limit", "Requêtes refusées par les limites de débit",
+    rate_limiter.stats, ("rejected",), kind="counter"
+))
+
+router = APIRouter(
+    prefix="/api/internal",
+    tags=["internal"],
+    dependencies=[Depends(require_internal_token)]
+)
+
+@router.get("/llm-health")
+async def get_llm_health():
+    """
+    Santé des modèles LLM : disjoncteurs, taux d'erreur, latences p50/p95, routage
+    """
+    return ai_generator.router.snapshot()
+
+@router.get("/llm-cache")
+async def get_llm_cache_stats():
+    """
+    Statistiques du cache des réponses LLM (hits, misses, taux de hit)
+    """
+    return ai_generator.cache.stats()
+
+@router.get("/llm-inflight")
+async def get_llm_inflight_stats():
+    """
+    Statistiques de coalescence des générations identiques en cours
+    """
+    return ai_generator.inflight.stats()
+
+@router.get("/llm-pool")
+async def get_llm_pool_stats():
+    """
+    Occupation du pool de clients LLM par modèle
+    """
+    return ai_generator.pool.stats()
+
+@router.get("/db-pool")
+async def get_db_pool_stats():
+    """
+    Utilisation du pool de connexions MongoDB et configuration effective
+    """
+    return pool_stats()
+
+@router.get("/auth-cache")
+async def get_auth_cache_stats():
+    """
+    Cache des tokens JWT vérifiés : taille, hits/misses, clés JWKS en cache
+    """
+    return token_verifier.stats()
+
+@router.get("/prompts")
+async def get_prompts():
+    """
+    Gabarits de prompts enregistrés : versions, variantes A/B, tokens estimés
+    """
+    return {"ab_enabled": settings.ai_prompt_ab_enabled, "prompts": prompt_registry.describe()}
+
+@router.get("/document-cache")
+async def get_document_cache_stats():
+    """
+    Cache des documents (boutiques) : taille, hits/misses, invalidations
+    """
+    return document_cache.stats()
+
+@router.get("/product-search")
+async def get_product_search_stats():
+    """
+    Index de recherche des produits : boutiques chargées, produits et termes indexés
+    """
+    return product_search.stats()
+
+@router.get("/image-pipeline")
+async def get_image_pipeline_stats():
+    """
+    Ingestion des images : téléchargements, déduplication, encodages, octets produits
+    """
+    return image_pipeline.stats()
+
+@router.get("/indexes")
+async def get_index_report(
+    database: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Index manquants, non déclarés ou inutilisés, et plans des requêtes des routes
+    
+    query_plans signale (collection_scan) toute requête qui scanne la collection.
+    """
+    return {
+        "indexes": await index_report(database),
+        "query_plans": await check_query_plans(database),
+    }
+
+# /metrics à la racine, comme l'attend la configuration par défaut de Prometheus
+metrics_router = APIRouter(
+    tags=["internal"],
+    dependencies=[Depends(require_internal_token)]
+)
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Métriques au format d'exposition Prometheus
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Métriques désactivées"
+        )
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,364 @@
+"""Routes API pour les pages des boutiques"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Any, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from config import settings
+from database import get_database
+from models.bulk import BulkWriteResponse
+from models.page import (
+    PagePatchRequest, PagePatchResponse, PageResponse, PageSectionsBulkRequest, PageUpdate, PageWriteResponse
+)
+from models.version import VersionListResponse
+from responses import json_response
+from auth.supabase_auth import get_current_user
+from services.bulk import CREATED, ERROR, NOT_FOUND, UNCHANGED, UPDATED, item_result, summarize
+from services.documents import VersionConflict, update_owned_document
+from services.page_patch import build_patch_plan
+from services.version_history import restorable_fields, version_history
+
+router = APIRouter(prefix="/api/pages", tags=["pages"])
+
+async def _claim_page(database: AsyncIOMotorDatabase, page_id: str, user_id: str) -> bool:
+    """
+    Rattache à user_id une page sans propriétaire si sa boutique lui appartient
+    
+    Les écritures filtrent sur pages.user_id, recopié de stores.user_id
+    (backfill_page_owners au démarrage) ; ceci couvre les pages créées
+    depuis sans ce champ.
+    """
+    page = await database.pages.find_one({"id": page_id, "user_id": None}, {"_id": 0, "store_id": 1})
+    if not page or not await database.stores.find_one(
+        {"id": page.get("store_id"), "user_id": user_id}, {"_id": 0, "id": 1}
+    ):
+        return False
+    await database.pages.update_one(
+        {"id": page_id, "store_id": page["store_id"], "user_id": None},
+        {"$set": {"user_id": user_id}}
+    )
+    return True
+
+async def _update_page(
+    database: AsyncIOMotorDatabase, page_id: str, user_id: str, update_data: Dict[str, Any], **options
+):
+    """update_owned_document sur une page, en la rattachant d'abord à sa boutique si besoin"""
+    page = await update_owned_document(database.pages, page_id, user_id, update_data, **options)
+    # Chemin d'échec seulement : une page sans user_id n'a pu être trouvée
+    if page is None and await _claim_page(database, page_id, user_id):
+        page = await update_owned_document(database.pages, page_id, user_id, update_data, **options)
+    return page
+
+@router.put("/{page_id}", response_model=PageWriteResponse)
+async def update_page(
+    page_id: str,
+    page_update: PageUpdate,
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Mettre à jour une page (sauvegarde de l'éditeur)
+    
+    Passer expected_version pour qu'une sauvegarde concurrente renvoie 409
+    au lieu d'écraser silencieusement l'autre.
+    """
+    update_data = {
+        k: v for k, v in page_update.model_dump(exclude={"expected_version"}).items()
+        if v is not None
+    }
+    
+    try:
+        updated_page = await _update_page(
+            database,
+            page_id,
+            current_user["user_id"],
+            update_data,
+            expected_version=page_update.expected_version
+        )
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Page modifiée entre-temps", "current_version": e.current_version}
+        )
+    
+    if not updated_page:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Page non trouvée"
+        )
+    
+    await version_history.record(database.pages, updated_page)
+    return json_response({"success": True, "page": updated_page})
+
+@router.patch("/{page_id}", response_model=PagePatchResponse)
+async def patch_page(
+    page_id: str,
+    request: PagePatchRequest,
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Modifier une page par opérations JSON Patch (autosave de l'éditeur)
+    
+    Les sections sont adressées par id (/sections/{id}/settings/heading) et
+    chaque opération devient un $set/$unset ciblé, un $pull ou un $push :
+    seul ce qui change est envoyé et réécrit. Le patch est refusé (409) si
+    une section visée n'existe pas, si une section ajoutée existe déjà ou si
+    expected_version ne correspond plus.
+    
+    Une seule écriture MongoDB. Si le patch combine modifications de sections
+    existantes, suppressions et ajouts (opérateurs refusés ensemble sur le
+    même tableau), elle passe par un pipeline qui recalcule sections.
+    """
+    if len(request.operations) > settings.page_patch_max_operations:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum {settings.page_patch_max_operations} opérations par requête"
+        )
+    
+    try:
+        plan = build_patch_plan(request.operations)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    user_id = current_user["user_id"]
+    if plan.needs_pipeline:
+        update_data = plan.page_set
+        write = {"pipeline": [{"$set": {"sections": plan.sections_expression()}}]}
+    else:
+        operators = {"$unset": plan.unset} if plan.unset else {}
+        if plan.removed:
+            operators["$pull"] = {"sections": {"id": {"$in": plan.removed}}}
+        if plan.added:
+            operators["$push"] = {"sections": {"$each": plan.added}}
+        update_data = plan.set
+        write = {"update_operators": operators, "array_filters": plan.array_filters or None}
+    
+    # Sections visées présentes, sections ajoutées absentes : vérifiés par l'écriture elle-même
+    sections_filter = []
+    if plan.targeted:
+        sections_filter.append({"sections.id": {"$all": plan.targeted}})
+    if plan.added:
+        sections_filter.append({"sections.id": {"$nin": [section["id"] for section in plan.added]}})
+    
+    try:
+        page = await _update_page(
+            database,
+            page_id,
+            user_id,
+            update_data,
+            expected_version=request.expected_version,
+            projection={"_id": 0, "version": 1, "updated_at": 1},
+            extra_filter={"$and": sections_filter} if sections_filter else None,
+            **write
+        )
+    except VersionConflict as e:
+        if e.current_version != request.expected_version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Page modifiée entre-temps", "current_version": e.current_version}
+            )
+        # Bonne version : ce sont les sections qui ne correspondent pas
+        page = None
+    
+    if not page:
+        # Chemin d'échec seulement : page absente ou sections incompatibles avec le patch
+        current = await database.pages.find_one(
+            {"id": page_id, "user_id": user_id},
+            {"_id": 0, "version": 1, "sections.id": 1}
+        )
+        if current is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Page non trouvée"
+            )
+        existing = {section.get("id") for section in current.get("sections", [])}
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Le patch ne s'applique pas à la version actuelle de la page",
+                "current_version": current.get("version", 0),
+                "missing_sections": [section_id for section_id in plan.targeted if section_id not in existing],
+                "existing_sections": [section["id"] for section in plan.added if section["id"] in existing],
+            }
+        )
+    
+    # Le patch ne retourne pas la page complète : relecture pour l'historique seulement
+    await version_history.record_latest(database.pages, page_id)
+    return json_response({"success": True, "version": page["version"], "updated_at": page["updated_at"]})
+
+def _bulk_sections_expression(mode: str, sections: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Nouveau tableau sections : existantes remplacées (sauf mode create), puis
+    nouvelles ajoutées en fin de liste (sauf mode update)
+    """
+    ids = [section["id"] for section in sections]
+    expression: Dict[str, Any] = {"$ifNull": ["$sections", []]}
+    if mode != "create":
+        expression = {"$map": {
+            "input": expression,
+            "as": "section",
+            "in": {"$let": {
+                "vars": {"position": {"$indexOfArray": [{"$literal": ids}, "$$section.id"]}},
+                "in": {"$cond": [
+                    {"$eq": ["$$position", -1]},
+                    "$$section",
+                    {"$arrayElemAt": [{"$literal": sections}, "$$position"]},
+                ]},
+            }},
+        }}
+    if mode != "update":
+        expression = {"$concatArrays": [expression, {"$filter": {
+            "input": {"$literal": sections},
+            "as": "section",
+            "cond": {"$not": [{"$in": ["$$section.id", {"$ifNull": ["$sections.id", []]}]}]},
+        }}]}
+    return expression
+
+@router.post("/{page_id}/sections/bulk", response_model=BulkWriteResponse)
+async def bulk_write_sections(
+    page_id: str,
+    request: PageSectionsBulkRequest,
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Créer, mettre à jour ou upserter des sections d'une page en lot
+    
+    Les sections sont identifiées par leur id client. Toutes les sections
+    sont écrites par une seule mise à jour de la page (pipeline : remplacement
+    des existantes et ajout des nouvelles dans le même tableau), conditionnée
+    à expected_version (409 sinon). Le document d'avant l'écriture indique
+    quelles sections existaient.
+    """
+    if len(request.sections) > settings.bulk_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum {settings.bulk_max_items} sections par requête"
+        )
+    
+    results = {}
+    sections = []
+    seen = set()
+    for index, section in enumerate(request.sections):
+        if section.id in seen:
+            results[index] = item_result(index, section.id, ERROR, "Identifiant en double dans la requête")
+            continue
+        seen.add(section.id)
+        sections.append((index, section.model_dump()))
+    
+    try:
+        previous = await _update_page(
+            database,
+            page_id,
+            current_user["user_id"],
+            {},
+            expected_version=request.expected_version,
+            projection={"_id": 0, "version": 1, "sections.id": 1},
+            pipeline=[{"$set": {"sections": _bulk_sections_expression(request.mode, [s for _, s in sections])}}],
+            return_document=ReturnDocument.BEFORE
+        )
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Page modifiée entre-temps", "current_version": e.current_version}
+        )
+    
+    if not previous:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Page non trouvée"
+        )
+    
+    existing = {section.get("id") for section in previous.get("sections", [])}
+    for index, section in sections:
+        if section["id"] in existing:
+            outcome = UNCHANGED if request.mode == "create" else UPDATED
+        else:
+            outcome = NOT_FOUND if request.mode == "update" else CREATED
+        results[index] = item_result(index, section["id"], outcome)
+    
+    await version_history.record_latest(database.pages, page_id)
+    return json_response({
+        **summarize([results[index] for index in sorted(results)]),
+        "version": (previous.get("version") or 0) + 1,
+    })
+
+@router.get("/{page_id}/versions", response_model=VersionListResponse)
+async def get_page_versions(
+    page_id: str,
+    limit: int = Query(50, ge=1, le=settings.pagination_max_limit),
+    before: Optional[int] = Query(None, description="Versions antérieures à celle-ci (next_before)"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Historique des versions d'une page, plus récentes d'abord
+    """
+    versions = await version_history.list_versions("pages", page_id, current_user["user_id"], limit, before)
+    next_before = versions[-1]["version"] if len(versions) == limit else None
+    return json_response({"versions": versions, "next_before": next_before})
+
+@router.get("/{page_id}/versions/{version}", response_model=PageResponse)
+async def get_page_version(
+    page_id: str,
+    version: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Contenu d'une page à une version donnée
+    """
+    page = await version_history.get_version("pages", page_id, current_user["user_id"], version)
+    
+    if not page:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Version non disponible"
+        )
+    
+    return json_response({"page": page})
+
+@router.post("/{page_id}/versions/{version}/restore", response_model=PageWriteResponse)
+async def restore_page_version(
+    page_id: str,
+    version: int,
+    expected_version: Optional[int] = Query(None, description="Version actuelle lue par le client"),
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Restaurer le contenu d'une ancienne version (nouvelle version, historique conservé)
+    """
+    user_id = current_user["user_id"]
+    page = await version_history.get_version("pages", page_id, user_id, version)
+    
+    if not page:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Version non disponible"
+        )
+    
+    try:
+        restored_page = await _update_page(
+            database,
+            page_id,
+            user_id,
+            restorable_fields(page),
+            expected_version=expected_version
+        )
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Page modifiée entre-temps", "current_version": e.current_version}
+        )
+    
+    if not restored_page:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Page non trouvée"
+        )
+    
+    await version_history.record(database.pages, restored_page)
+    return json_response({"success": True, "page": restored_page})
@@ -0,0 +1,301 @@
+"""Routes API pour les produits des boutiques"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from datetime import datetime
+from typing import List, Literal, Optional
+import logging
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from config import settings
+from database import get_database
+from models.bulk import BulkWriteResponse
+from models.product import (
+    ProductBulkRequest, ProductSearchResponse, ProductSuggestResponse, ProductUpdate, ProductWriteResponse
+)
+from responses import document_etag, json_response
+from auth.supabase_auth import get_current_user
+from services.document_cache import document_cache
+from services.image_pipeline import image_pipeline, needs_ingestion
+from services.job_queue import job_queue
+from services.product_search import product_search
+from services.bulk import (
+    CREATED, ERROR, NOT_FOUND, UNCHANGED, UPDATED, item_result, run_bulk, run_updates, summarize
+)
+from services.documents import VersionConflict, update_owned_document
+
+router = APIRouter(prefix="/api/products", tags=["products"])
+logger = logging.getLogger(__name__)
+
+async def submit_image_ingestion(user_id: str, product_ids: List[str]) -> Optional[str]:
+    """
+    Crée le job d'ingestion des images de produits venant d'être écrits
+    
+    Un échec est journalisé sans remonter : l'écriture a déjà eu lieu et les
+    images restent utilisables par leur URL source.
+    """
+    if not (product_ids and image_pipeline.enabled and settings.image_auto_ingest):
+        return None
+    try:
+        job = await job_queue.submit(user_id, "product_images", {"product_ids": product_ids})
+    except (PyMongoError, RuntimeError) as e:
+        logger.warning("Ingestion des images de %s produits non planifiée: %s", len(product_ids), e)
+        return None
+    return job["id"]
+
+async def get_store_index(store_id: str, user_id: str, database: AsyncIOMotorDatabase):
+    """Index de recherche d'une boutique de l'utilisateur (404 sinon)"""
+    if not product_search.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Recherche désactivée"
+        )
+    
+    # Même entrée de cache (et même forme (boutique, etag)) que GET /api/stores/{id} ;
+    # la propriété est vérifiée ensuite
+    cached = await document_cache.get_document(
+        "stores",
+        store_id,
+        lambda: database.stores.find_one({"id": store_id}, {"_id": 0}),
+        builder=lambda store: (store, document_etag(store))
+    )
+    store = cached[0] if cached else None
+    if not store or store.get("user_id") != user_id or not store.get("is_active", True):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Boutique non trouvée"
+        )
+    
+    return await product_search.get_index(database.products, store_id)
+
+@router.get("/search", response_model=ProductSearchResponse)
+async def search_products(
+    store_id: str,
+    q: Optional[str] = Query(None, max_length=200),
+    category: Optional[List[str]] = Query(None, description="Catégories acceptées (répéter le paramètre)"),
+    tag: Optional[List[str]] = Query(None, description="Tags requis, tous à la fois (répéter le paramètre)"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    is_active: Optional[bool] = None,
+    sort: Optional[Literal["relevance", "newest", "price_asc", "price_desc", "name"]] = None,
+    limit: int = Query(20, ge=1, le=settings.pagination_max_limit),
+    offset: int = Query(0, ge=0, le=10000),
+    facets: bool = True,
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Rechercher dans les produits d'une boutique
+    
+    Tous les termes de q doivent être présents (nom, tags, catégorie,
+    variantes, description ; sans accents ni majuscules). Les facettes
+    comptent les produits par catégorie, tag et tranche de prix.
+    """
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_price supérieur à max_price"
+        )
+    
+    index = await get_store_index(store_id, current_user["user_id"], database)
+    return json_response(index.search(
+        q,
+        categories=category,
+        tags=tag,
+        min_price=min_price,
+        max_price=max_price,
+        is_active=is_active,
+        sort=sort,
+        limit=limit,
+        offset=offset,
+        facets=facets
+    ))
+
+@router.get("/suggest", response_model=ProductSuggestResponse)
+async def suggest_products(
+    store_id: str,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Typeahead : le dernier mot de q est complété pendant la frappe
+    
+    Retourne les compléments les plus fréquents et les meilleurs produits
+    actifs correspondants.
+    """
+    index = await get_store_index(store_id, current_user["user_id"], database)
+    return json_response(index.suggest(q, limit))
+
+@router.post("/bulk", response_model=BulkWriteResponse)
+async def bulk_write_products(
+    request: ProductBulkRequest,
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Importer des produits en lot (création, mise à jour ou upsert)
+    
+    Les produits sont identifiés par leur id client : rejouer le même import
+    ne crée pas de doublon. Les écritures partent par lots de
+    BULK_WRITE_CHUNK_SIZE et chaque produit a son propre statut dans results.
+    En mode update, not_found vient du matched_count de l'écriture du produit.
+    """
+    if len(request.products) > settings.bulk_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum {settings.bulk_max_items} produits par import"
+        )
+    
+    user_id = current_user["user_id"]
+    
+    # Boutiques de l'utilisateur visées par l'import (une seule requête)
+    owned_stores = {
+        store["id"] async for store in database.stores.find(
+            {"id": {"$in": list({product.store_id for product in request.products})}, "user_id": user_id, "is_active": True},
+            {"_id": 0, "id": 1}
+        )
+    }
+    
+    now = datetime.utcnow()
+    results = {}
+    operations = []
+    seen = set()
+    with_new_images = set()
+    
+    for index, product in enumerate(request.products):
+        if product.id in seen:
+            results[index] = item_result(index, product.id, ERROR, "Identifiant en double dans la requête")
+            continue
+        seen.add(product.id)
+        
+        if product.store_id not in owned_stores:
+            results[index] = item_result(index, product.id, ERROR, "Boutique non trouvée")
+            continue
+        
+        owner = {"id": product.id, "user_id": user_id}
+        fields = product.model_dump(exclude={"id"})
+        if needs_ingestion(fields["images"]):
+            with_new_images.add(index)
+        
+        if request.mode == "create":
+            update = {"$setOnInsert": {**fields, "created_at": now, "updated_at": now, "version": 1}}
+        elif request.mode == "update":
+            update = {"$set": {**fields, "updated_at": now}, "$inc": {"version": 1}}
+        else:
+            update = {
+                "$set": {**fields, "updated_at": now},
+                "$setOnInsert": {"created_at": now},
+                "$inc": {"version": 1},
+            }
+        
+        operations.append((index, owner, update))
+    
+    if request.mode == "update":
+        # Existence décidée par l'écriture elle-même (matched_count), pas par une lecture préalable
+        upserted = set()
+        found, errors = await run_updates(database.products, operations, settings.bulk_write_chunk_size)
+    else:
+        upserted, errors = await run_bulk(
+            database.products,
+            [(index, UpdateOne(owner, update, upsert=True)) for index, owner, update in operations],
+            settings.bulk_write_chunk_size
+        )
+        found = {index for index, _, _ in operations}
+    written = [index for index, _, _ in operations if index in found and index not in errors]
+    await product_search.refresh(database.products, [request.products[index].id for index in written])
+    await submit_image_ingestion(
+        user_id,
+        [request.products[index].id for index in written if index in with_new_images]
+    )
+    
+    for index, _, _ in operations:
+        product_id = request.products[index].id
+        if index in errors:
+            results[index] = item_result(index, product_id, ERROR, errors[index])
+        elif index not in found:
+            results[index] = item_result(index, product_id, NOT_FOUND)
+        elif index in upserted:
+            results[index] = item_result(index, product_id, CREATED)
+        else:
+            results[index] = item_result(index, product_id, UNCHANGED if request.mode == "create" else UPDATED)
+    
+    return json_response(summarize([results[index] for index in sorted(results)]))
+
+@router.put("/{product_id}", response_model=ProductWriteResponse)
+async def update_product(
+    product_id: str,
+    product_update: ProductUpdate,
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Mettre à jour un produit
+    
+    Passer expected_version pour qu'une sauvegarde concurrente renvoie 409
+    au lieu d'écraser silencieusement l'autre.
+    """
+    update_data = {
+        k: v for k, v in product_update.model_dump(exclude={"expected_version"}).items()
+        if v is not None
+    }
+    
+    try:
+        updated_product = await update_owned_document(
+            database.products,
+            product_id,
+            current_user["user_id"],
+            update_data,
+            expected_version=product_update.expected_version
+        )
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Produit modifié entre-temps", "current_version": e.current_version}
+        )
+    
+    if not updated_product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Produit non trouvé"
+        )
+    
+    product_search.upsert(updated_product)
+    if "images" in update_data and needs_ingestion(updated_product.get("images")):
+        await submit_image_ingestion(current_user["user_id"], [product_id])
+    
+    return json_response({"success": True, "product": updated_product})
+
+@router.post("/{product_id}/images/ingest", status_code=status.HTTP_202_ACCEPTED)
+async def ingest_product_images(
+    product_id: str,
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Ingérer les images d'un produit en arrière-plan
+    
+    Télécharge les images sans variantes, génère leurs variantes WebP/AVIF
+    redimensionnées et les écrit dans images[].variants. Retourne un job_id
+    à suivre via GET /api/ai/jobs/{job_id} ; les images refusées sont
+    listées dans result.failed.
+    """
+    if not image_pipeline.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ingestion des images désactivée"
+        )
+    
+    product = await database.products.find_one(
+        {"id": product_id, "user_id": current_user["user_id"]},
+        {"_id": 0, "id": 1}
+    )
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Produit non trouvé"
+        )
+    
+    job = await job_queue.submit(current_user["user_id"], "product_images", {"product_ids": [product_id]})
+    return {"job_id": job["id"], "status": job["status"]}
@@ -1,35 +1,38 @@
 """Routes API pour la gestion des boutiques"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+import uuid
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DESCENDING
 
 from config import settings
-from models.store import StoreCreate, StoreUpdate, StoreInDB
+from database import get_database
+from models.store import StoreCreate, StoreUpdate, StoreInDB, StoreListResponse, StoreResponse, StoreWriteResponse
+from models.version import VersionListResponse
+from responses import conditional_json_response, document_etag, dumps, json_response, make_etag
 from auth.supabase_auth import get_current_user
+from services.document_cache import document_cache
+from services.documents import VersionConflict, update_owned_document
+from services.pagination import fetch_page, parse_fields, stream_ndjson
+from services.version_history import restorable_fields, version_history
 
 router = APIRouter(prefix="/api/stores", tags=["stores"])
 
-# MongoDB client (will be injected)
-db = None
+# Tri des listes de boutiques : plus récentes d'abord, id pour départager
+STORE_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+STORE_FIELDS = set(StoreInDB.model_fields)
 
-def get_database():
-    global db
-    if db is None:
-        client = AsyncIOMotorClient(settings.mongo_url)
-        db = client.easyshop
-    return db
-
-@router.post("", response_model=dict, status_code=status.HTTP_201_CREATED)
+@router.post("", response_model=StoreWriteResponse, status_code=status.HTTP_201_CREATED)
 async def create_store(
     store: StoreCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
     Créer une nouvelle boutique pour l'utilisateur connecté
     """
-    database = get_database()
-    
     # Vérifier que l'user_id correspond
     if store.user_id != current_user["user_id"]:
         raise HTTPException(
@@ -39,108 +42,255 @@ async def create_store(
     
     # Créer le document boutique
     store_dict = store.model_dump()
+    store_dict["id"] = str(uuid.uuid4())
     store_dict["created_at"] = datetime.utcnow()
     store_dict["updated_at"] = datetime.utcnow()
     store_dict["is_active"] = True
+    store_dict["version"] = 1
     
-    result = await database.stores.insert_one(store_dict)
-    store_dict["id"] = str(result.inserted_id)
+    # Insérer une copie : insert_one ajoute _id au dict passé
+    await database.stores.insert_one(dict(store_dict))
+    document_cache.invalidate("stores", user_id=store.user_id)
+    await version_history.record(database.stores, store_dict)
     
-    return {"success": True, "store": store_dict}
+    return json_response(
+        {"success": True, "store": store_dict},
+        status_code=status.HTTP_201_CREATED,
+        headers={"ETag": document_etag(store_dict)}
+    )
 
-@router.get("", response_model=dict)
+@router.get("", response_model=StoreListResponse)
 async def get_user_stores(
-    current_user: dict = Depends(get_current_user)
+    limit: int = Query(50, ge=1, le=settings.pagination_max_limit),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Champs à retourner, ex: id,name,updated_at"),
+    stream: bool = Query(False, description="Streamer toutes les boutiques en NDJSON"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
-    Récupérer toutes les boutiques de l'utilisateur connecté
+    Récupérer les boutiques de l'utilisateur connecté, page par page
+    
+    Passer next_cursor dans cursor pour obtenir la page suivante. Les pages
+    sont servies depuis le cache tant qu'aucune boutique de l'utilisateur
+    n'a changé ; If-None-Match avec l'ETag reçu renvoie 304.
     """
-    database = get_database()
+    user_id = current_user["user_id"]
+    query = {"user_id": user_id, "is_active": True}
     
-    stores = await database.stores.find(
-        {"user_id": current_user["user_id"], "is_active": True},
-        {"_id": 0}
-    ).to_list(100)
+    try:
+        projection = parse_fields(fields, STORE_FIELDS, always=("created_at", "id"))
+        
+        if stream:
+            return StreamingResponse(
+                stream_ndjson(database.stores, query, STORE_SORT, projection),
+                media_type="application/x-ndjson"
+            )
+        
+        async def load_page():
+            stores, next_cursor = await fetch_page(
+                database.stores, query, STORE_SORT, limit, cursor, projection
+            )
+            payload = {"stores": stores, "count": len(stores), "next_cursor": next_cursor}
+            # La projection peut exclure version et updated_at : ETag du contenu
+            return payload, make_etag(dumps(payload))
+        
+        payload, etag = await document_cache.get_owner_list(
+            "stores", user_id, (limit, cursor, fields), load_page
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    return {"stores": stores, "count": len(stores)}
+    return conditional_json_response(payload, etag, if_none_match)
 
-@router.get("/{store_id}", response_model=dict)
+@router.get("/{store_id}", response_model=StoreResponse)
 async def get_store(
     store_id: str,
-    current_user: dict = Depends(get_current_user)
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
     Récupérer une boutique spécifique
-    """
-    database = get_database()
     
-    store = await database.stores.find_one(
-        {"id": store_id, "user_id": current_user["user_id"]},
-        {"_id": 0}
+    Servie depuis le cache des documents. L'ETag dépend de la version et de
+    updated_at : If-None-Match avec l'ETag reçu renvoie 304 sans corps.
+    """
+    # Chargée par id seul pour partager l'entrée ; la propriété est vérifiée ensuite
+    cached = await document_cache.get_document(
+        "stores",
+        store_id,
+        lambda: database.stores.find_one({"id": store_id}, {"_id": 0}),
+        builder=lambda store: (store, document_etag(store))
     )
     
-    if not store:
+    if not cached or cached[0].get("user_id") != current_user["user_id"]:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Boutique non trouvée"
         )
     
-    return {"store": store}
+    store, etag = cached
+    return conditional_json_response({"store": store}, etag, if_none_match)
 
-@router.put("/{store_id}", response_model=dict)
+@router.put("/{store_id}", response_model=StoreWriteResponse)
 async def update_store(
     store_id: str,
     store_update: StoreUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
     Mettre à jour une boutique
+    
+    Un seul aller-retour MongoDB : propriété et version attendue sont dans le
+    filtre de l'écriture. Avec expected_version, une modification concurrente
+    renvoie 409 au lieu d'être écrasée.
     """
-    database = get_database()
+    update_data = {
+        k: v for k, v in store_update.model_dump(exclude={"expected_version"}).items()
+        if v is not None
+    }
     
-    # Vérifier que la boutique existe et appartient à l'utilisateur
-    existing_store = await database.stores.find_one(
-        {"id": store_id, "user_id": current_user["user_id"]}
-    )
+    try:
+        updated_store = await update_owned_document(
+            database.stores,
+            store_id,
+            current_user["user_id"],
+            update_data,
+            expected_version=store_update.expected_version
+        )
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Boutique modifiée entre-temps", "current_version": e.current_version}
+        )
     
-    if not existing_store:
+    if not updated_store:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Boutique non trouvée"
         )
     
-    # Mettre à jour
-    update_data = {k: v for k, v in store_update.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.utcnow()
-    
-    await database.stores.update_one(
-        {"id": store_id},
-        {"$set": update_data}
+    document_cache.invalidate("stores", store_id, current_user["user_id"])
+    await version_history.record(database.stores, updated_store)
+    return json_response(
+        {"success": True, "store": updated_store},
+        headers={"ETag": document_etag(updated_store)}
     )
+
+@router.get("/{store_id}/versions", response_model=VersionListResponse)
+async def get_store_versions(
+    store_id: str,
+    limit: int = Query(50, ge=1, le=settings.pagination_max_limit),
+    before: Optional[int] = Query(None, description="Versions antérieures à celle-ci (next_before)"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Historique des versions d'une boutique, plus récentes d'abord
+    """
+    versions = await version_history.list_versions("stores", store_id, current_user["user_id"], limit, before)
+    next_before = versions[-1]["version"] if len(versions) == limit else None
+    return json_response({"versions": versions, "next_before": next_before})
+
+@router.get("/{store_id}/versions/{version}", response_model=StoreResponse)
+async def get_store_version(
+    store_id: str,
+    version: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Contenu d'une boutique à une version donnée
+    """
+    store = await version_history.get_version("stores", store_id, current_user["user_id"], version)
+    
+    if not store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Version non disponible"
+        )
+    
+    return json_response({"store": store})
+
+@router.post("/{store_id}/versions/{version}/restore", response_model=StoreWriteResponse)
+async def restore_store_version(
+    store_id: str,
+    version: int,
+    expected_version: Optional[int] = Query(None, description="Version actuelle lue par le client"),
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Restaurer le contenu d'une ancienne version
+    
+    La restauration est une nouvelle écriture : elle crée une nouvelle
+    version et l'historique est conservé.
+    """
+    user_id = current_user["user_id"]
+    store = await version_history.get_version("stores", store_id, user_id, version)
+    
+    if not store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Version non disponible"
+        )
     
-    updated_store = await database.stores.find_one({"id": store_id}, {"_id": 0})
+    try:
+        restored_store = await update_owned_document(
+            database.stores,
+            store_id,
+            user_id,
+            restorable_fields(store),
+            expected_version=expected_version
+        )
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Boutique modifiée entre-temps", "current_version": e.current_version}
+        )
     
-    return {"success": True, "store": updated_store}
+    if not restored_store:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Boutique non trouvée"
+        )
+    
+    document_cache.invalidate("stores", store_id, user_id)
+    await version_history.record(database.stores, restored_store)
+    return json_response(
+        {"success": True, "store": restored_store},
+        headers={"ETag": document_etag(restored_store)}
+    )
 
 @router.delete("/{store_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_store(
     store_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    database: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
     Supprimer une boutique (soft delete)
-    """
-    database = get_database()
     
-    result = await database.stores.update_one(
-        {"id": store_id, "user_id": current_user["user_id"]},
-        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
+    Une écriture versionnée comme les autres : la nouvelle version entre dans
+    l'historique et change l'ETag.
+    """
+    deleted_store = await update_owned_document(
+        database.stores,
+        store_id,
+        current_user["user_id"],
+        {"is_active": False}
     )
     
-    if result.matched_count == 0:
+    if not deleted_store:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Boutique non trouvée"
         )
     
+    document_cache.invalidate("stores", store_id, current_user["user_id"])
+    await version_history.record(database.stores, deleted_store)
     return None
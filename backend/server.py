@@ -1,34 +1,119 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List
+from pymongo import DESCENDING
+from typing import List, Optional
 import uuid
 from datetime import datetime, timezone
 
 # Import custom routes
 from routes.stores import router as stores_router
+from routes.pages import router as pages_router
+from routes.products import router as products_router
 from routes.ai import router as ai_router
+from routes.internal import router as internal_router, metrics_router
+from services.ai_service import ai_generator
+from services.document_cache import ChangeStreamInvalidator, document_cache
+from services.image_pipeline import image_pipeline
+from services.job_queue import job_queue, JobWorker, DEFAULT_HANDLERS
+from services.metrics import MetricsMiddleware
+from services.product_search import SearchIndexUpdater, product_search
+from services.rate_limit import rate_limiter
+from services.version_history import version_history
+from config import settings
+from database import create_client, get_database
+from indexes import ensure_indexes
+from responses import FastJSONResponse, json_response
+from services.pagination import fetch_page, parse_fields, stream_ndjson
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: client MongoDB unique, partagé par tous les routers via get_database
+    client = create_client(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    app.state.mongo_client = client
+    app.state.db = db
+    if settings.mongo_ensure_indexes:
+        await ensure_indexes(db)
+    
+    # Connexions LLM keep-alive et cache persistant
+    await ai_generator.pool.start()
+    if settings.llm_cache_persistent:
+        await ai_generator.cache.attach_collection(db[settings.llm_cache_collection])
+    
+    # Compteurs de limites de débit partagés entre workers
+    if settings.rate_limit_enabled and settings.rate_limit_backend == "mongo":
+        await rate_limiter.attach_collection(db[settings.rate_limit_collection])
+    
+    # Historique des versions des boutiques et des pages
+    if settings.version_history_enabled:
+        await version_history.attach_collection(db[settings.version_history_collection])
+    
+    # Ingestion des images produits (exécutée par les workers de jobs)
+    if settings.image_pipeline_enabled:
+        await image_pipeline.attach_collections(db[settings.image_asset_collection], db.products)
+        await image_pipeline.start()
+    
+    # File de jobs IA et workers intégrés (les autres tournent via worker.py)
+    await job_queue.attach_collection(db[settings.ai_job_collection])
+    job_worker = None
+    if settings.ai_job_inline_workers > 0:
+        job_worker = JobWorker(
+            job_queue,
+            DEFAULT_HANDLERS,
+            concurrency=settings.ai_job_inline_workers,
+            poll_interval=settings.ai_job_poll_interval_seconds
+        )
+        job_worker.start()
+    
+    # Invalidation du cache des boutiques sur les écritures des autres workers
+    invalidator = None
+    if settings.document_cache_enabled and settings.document_cache_change_stream:
+        invalidator = ChangeStreamInvalidator(document_cache, [db.stores])
+        invalidator.start()
+    
+    # Index de recherche des produits mis à jour par les écritures des autres workers
+    search_updater = None
+    if settings.product_search_enabled and settings.document_cache_change_stream:
+        search_updater = SearchIndexUpdater(product_search, [db.products])
+        search_updater.start()
+    
+    yield
+    
+    # Shutdown
+    if search_updater is not None:
+        await search_updater.stop()
+    if invalidator is not None:
+        await invalidator.stop()
+    if job_worker is not None:
+        await job_worker.stop()
+    await image_pipeline.close()
+    await ai_generator.pool.close()
+    client.close()
 
 # Create the main app without a prefix
 app = FastAPI(
     title="EasyShop Africa API",
     description="API backend pour la plateforme EasyShop Africa avec génération IA",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Métriques HTTP (ajouté avant CORS : mesure sous le middleware CORS)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -59,41 +144,65 @@ async def root():
     return {"message": "Hello World"}
 
 @api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
+async def create_status_check(input: StatusCheckCreate, db=Depends(get_database)):
     status_dict = input.model_dump()
     status_obj = StatusCheck(**status_dict)
     
-    # Convert to dict and serialize datetime to ISO string for MongoDB
+    # Stored as a native BSON date (sortable, comparable in range queries)
     doc = status_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
     
     _ = await db.status_checks.insert_one(doc)
     return status_obj
 
+STATUS_SORT = [("timestamp", DESCENDING), ("id", DESCENDING)]
+
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    # Exclude MongoDB's _id field from the query results
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
+async def get_status_checks(
+    limit: int = Query(100, ge=1, le=settings.pagination_max_limit),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False,
+    db=Depends(get_database)
+):
+    # Keyset pagination: the next page cursor is returned in the X-Next-Cursor header
+    try:
+        projection = parse_fields(fields, StatusCheck.model_fields, always=("timestamp", "id"))
+        
+        if stream:
+            return StreamingResponse(
+                stream_ndjson(db.status_checks, {}, STATUS_SORT, projection),
+                media_type="application/x-ndjson"
+            )
+        
+        status_checks, next_cursor = await fetch_page(
+            db.status_checks, {}, STATUS_SORT, limit, cursor, projection
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Convert ISO string timestamps back to datetime objects
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
-    
-    return status_checks
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_response(status_checks, headers=headers)
+
+# Variantes d'images en stockage local (en S3, servies par le bucket ou le CDN)
+if settings.image_pipeline_enabled and settings.image_storage_backend == "local":
+    app.mount(
+        settings.image_local_url_path,
+        StaticFiles(directory=settings.image_storage_dir, check_dir=False),
+        name="images"
+    )
 
 # Include all routers
 app.include_router(api_router)
 app.include_router(stores_router)
+app.include_router(pages_router)
+app.include_router(products_router)
 app.include_router(ai_router)
+app.include_router(internal_router)
+app.include_router(metrics_router)
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
-logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+logger = logging.getLogger(__name__)
\ No newline at end of file
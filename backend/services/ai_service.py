@@ -1,12 +1,26 @@
 """Service de génération de contenu IA avec Emergent LLM Key"""
 import asyncio
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+from emergentintegrations.llm.chat import UserMessage
 from config import settings
-from typing import Dict, List, Optional
+from services.llm_cache import LLMResponseCache, make_cache_key
+from services.llm_pool import LLMClientPool
+from services.llm_router import LLMRouter
+from services.metrics import LLM_CALL_DURATION, LLM_FALLBACK_CALLS, LLM_JSON_PARSE, LLM_TOKENS
+from services.rate_limit import estimate_tokens
+from services.llm_json import LLMJSONError, parse_section as parse_section_json, section_schema_hint
+from services.prompts import SECTION_PROMPTS, PromptTemplate, RenderedPrompt, prompt_cache_id, prompt_registry
+from services.singleflight import SingleFlight
+from services.tracing import span
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SYSTEM_MESSAGE = "Vous êtes un expert en e-commerce qui crée du contenu marketing professionnel en français."
+DEFAULT_SYSTEM_TOKENS = estimate_tokens(DEFAULT_SYSTEM_MESSAGE)
+REPAIR_SYSTEM_MESSAGE = "Tu corriges du JSON invalide. Tu réponds uniquement avec un objet JSON valide, sans texte autour."
+
 class AIContentGenerator:
     """Générateur de contenu IA utilisant OpenAI GPT-5 (primary) et Claude (fallback)"""
     
@@ -14,12 +28,36 @@ class AIContentGenerator:
         self.api_key = settings.emergent_llm_key
         self.primary_model = ("openai", "gpt-5")
         self.fallback_model = ("anthropic", "claude-sonnet-4-20250514")
+        # Limite globale partagée par toutes les requêtes en cours
+        self._global_semaphore = asyncio.Semaphore(settings.ai_global_concurrency)
+        self.cache = LLMResponseCache(
+            max_entries=settings.llm_cache_max_entries,
+            ttl_seconds=settings.llm_cache_ttl_seconds
+        )
+        self.inflight = SingleFlight()
+        self.pool = LLMClientPool(
+            api_key=self.api_key,
+            pool_size=settings.llm_pool_size,
+            keepalive_expiry=settings.llm_pool_keepalive_seconds
+        )
+        self.router = LLMRouter(
+            primary=self.primary_model,
+            fallback=self.fallback_model,
+            window=settings.llm_router_window,
+            error_rate_threshold=settings.llm_breaker_error_rate,
+            min_requests=settings.llm_breaker_min_requests,
+            cooldown_seconds=settings.llm_breaker_cooldown_seconds,
+            hedge_enabled=settings.llm_hedge_enabled,
+            hedge_min_delay=settings.llm_hedge_min_delay_seconds
+        )
     
     async def generate_content(
         self,
         prompt: str,
-        system_message: str = "Vous êtes un expert en e-commerce qui crée du contenu marketing professionnel en français.",
-        use_fallback: bool = False
+        system_message: str = DEFAULT_SYSTEM_MESSAGE,
+        use_fallback: bool = False,
+        use_cache: bool = True,
+        refresh_cache: bool = False
     ) -> str:
         """
         Génère du contenu avec le modèle IA
@@ -28,133 +66,422 @@ class AIContentGenerator:
             prompt: Le prompt de génération
             system_message: Le message système pour guider le modèle
             use_fallback: Si True, utilise Claude au lieu de GPT-5
+            use_cache: Si False, ignore complètement le cache (ni lecture ni écriture)
+            refresh_cache: Si True, ignore l'entrée en cache et la remplace par une nouvelle génération
             
         Returns:
             str: Le contenu généré
         """
+        with span("llm.generate_content", {"llm.use_fallback": use_fallback, "llm.use_cache": use_cache}):
+            return await self._generate_content(prompt, system_message, use_fallback, use_cache, refresh_cache)
+    
+    async def _generate_content(
+        self,
+        prompt: str,
+        system_message: str,
+        use_fallback: bool,
+        use_cache: bool,
+        refresh_cache: bool
+    ) -> str:
         model_provider, model_name = self.fallback_model if use_fallback else self.primary_model
+        cache_key = make_cache_key(model_provider, model_name, system_message, prompt_cache_id(prompt))
+        caching = settings.llm_cache_enabled and use_cache
+        
+        if not caching:
+            self.cache.record_bypass()
+        elif refresh_cache:
+            self.cache.record_bypass(refresh=True)
+        else:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        async def call_and_store() -> str:
+            response = await self._call_model(prompt, system_message, use_fallback)
+            if caching:
+                await self.cache.set(cache_key, response, model_provider, model_name)
+            return response
+        
+        if not settings.llm_singleflight_enabled:
+            return await call_and_store()
+        
+        # Les appels identiques déjà en cours partagent la même génération
+        return await self.inflight.do(cache_key, call_and_store)
+    
+    async def _call_model(
+        self,
+        prompt: str,
+        system_message: str,
+        use_fallback: bool = False
+    ) -> str:
+        """Appelle le modèle choisi par le routeur (primary, fallback ou les deux en hedging)"""
+        async def send(model) -> str:
+            return await self._send(model, prompt, system_message)
+        
+        if use_fallback:
+            try:
+                return await send(self.fallback_model)
+            except Exception as e:
+                logger.error("Erreur avec %s/%s: %s", *self.fallback_model, e)
+                raise Exception(f"Échec de génération avec tous les modèles: {str(e)}")
         
+        return await self.router.call(send)
+    
+    async def _send(self, model, prompt: str, system_message: str) -> str:
+        """Envoie le prompt à un modèle donné"""
+        model_provider, model_name = model
+        if model == self.fallback_model:
+            LLM_FALLBACK_CALLS.inc(model_provider, model_name)
+        
+        start = time.perf_counter()
+        outcome = "error"
         try:
-            # Créer une nouvelle instance de chat pour chaque requête
-            chat = LlmChat(
+            # Session neuve sur une connexion chaude du pool
+            async with self.pool.lease(model_provider, model_name, system_message) as chat:
+                user_message = UserMessage(text=prompt)
+                response = await chat.send_message(user_message)
+            outcome = "success"
+        except asyncio.CancelledError:
+            # Appel abandonné (hedging, client parti)
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_CALL_DURATION.observe(time.perf_counter() - start, model_provider, model_name, outcome)
+        
+        LLM_TOKENS.inc(model_provider, model_name, "prompt", value=estimate_tokens(system_message) + estimate_tokens(prompt))
+        LLM_TOKENS.inc(model_provider, model_name, "completion", value=estimate_tokens(response))
+        return response
+    
+    async def stream_content(
+        self,
+        prompt: str,
+        system_message: str = DEFAULT_SYSTEM_MESSAGE,
+        use_cache: bool = True,
+        refresh_cache: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Génère du contenu en streamant les tokens au fil de leur arrivée
+        
+        Le streaming token par token passe par litellm (le client utilisé par
+        LlmChat) lorsque LLM_STREAM_API_BASE est configuré. Sinon, ou si le flux
+        échoue avant le premier token, la génération bufferisée (avec cache et
+        fallback) est utilisée et le contenu est émis en un seul morceau.
+        
+        Yields:
+            str: Les morceaux de texte dans l'ordre
+        """
+        model_provider, model_name = self.primary_model
+        cache_key = make_cache_key(model_provider, model_name, system_message, prompt_cache_id(prompt))
+        caching = settings.llm_cache_enabled and use_cache
+        
+        if caching and not refresh_cache:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        chunks = []
+        # Primary disjoncté : pas de flux, le chemin bufferisé passe par le fallback
+        if settings.llm_stream_api_base and self.router.is_available(self.primary_model):
+            try:
+                async for chunk in self._stream_model(prompt, system_message, model_provider, model_name):
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                if chunks:
+                    raise Exception(f"Flux interrompu avec {model_provider}/{model_name}: {str(e)}")
+                logger.warning("Streaming indisponible avec %s/%s: %s", model_provider, model_name, e)
+        
+        if chunks:
+            if caching:
+                await self.cache.set(cache_key, "".join(chunks), model_provider, model_name)
+            return
+        
+        yield await self.generate_content(
+            prompt,
+            system_message,
+            use_cache=use_cache,
+            refresh_cache=refresh_cache
+        )
+    
+    async def _stream_model(
+        self,
+        prompt: str,
+        system_message: str,
+        model_provider: str,
+        model_name: str
+    ) -> AsyncIterator[str]:
+        """Flux de tokens brut depuis le provider via litellm"""
+        import litellm
+        
+        # Le slot du pool reste réservé pendant toute la durée du flux
+        async with self.pool.lease(model_provider, model_name, system_message):
+            response = await litellm.acompletion(
+                model=f"{model_provider}/{model_name}",
+                messages=[
+                    {"role": "system", "content": system_message},
+                    {"role": "user", "content": prompt}
+                ],
                 api_key=self.api_key,
-                session_id=f"content-gen-{asyncio.current_task().get_name()}",
-                system_message=system_message
-            ).with_model(model_provider, model_name)
-            
-            # Envoyer le message
-            user_message = UserMessage(text=prompt)
-            response = await chat.send_message(user_message)
-            
-            return response
+                api_base=settings.llm_stream_api_base,
+                stream=True
+            )
+            async for part in response:
+                delta = part.choices[0].delta.content if part.choices else None
+                if delta:
+                    yield delta
+    
+    def _build_section_prompt(
+        self,
+        section: str,
+        business_type: str,
+        brand_name: str,
+        target_audience: str
+    ) -> Optional[RenderedPrompt]:
+        """
+        Construit le prompt d'une section de boutique
         
-        except Exception as e:
-            logger.error(f"Erreur avec {model_provider}/{model_name}: {str(e)}")
-            
-            # Si c'est le modèle primary qui échoue, essayer le fallback
-            if not use_fallback:
-                logger.info("Tentative avec le modèle fallback...")
-                return await self.generate_content(prompt, system_message, use_fallback=True)
-            
-            raise Exception(f"Échec de génération avec tous les modèles: {str(e)}")
+        Returns:
+            RenderedPrompt: Le prompt, ou None si la section n'est pas supportée
+        """
+        if section not in SECTION_PROMPTS:
+            return None
+        
+        # La marque fixe la variante : une boutique garde toujours le même prompt
+        return prompt_registry.select(section, brand_name).render(
+            business_type=business_type,
+            brand_name=brand_name,
+            target_audience=target_audience
+        )
+    
+    async def _generate_section(
+        self,
+        prompt: str,
+        request_semaphore: asyncio.Semaphore,
+        use_cache: bool = True,
+        refresh_cache: bool = False
+    ) -> str:
+        """Génère une section en respectant la limite par requête puis la limite globale"""
+        async with request_semaphore:
+            async with self._global_semaphore:
+                return await self.generate_content(
+                    prompt,
+                    use_cache=use_cache,
+                    refresh_cache=refresh_cache
+                )
     
     async def generate_store_content(
         self,
         business_type: str,
         brand_name: str,
         target_audience: str = "clients africains",
-        sections: List[str] = None
-    ) -> Dict[str, any]:
+        sections: List[str] = None,
+        max_concurrency: Optional[int] = None,
+        allow_partial: bool = True,
+        use_cache: bool = True,
+        refresh_cache: bool = False
+    ) -> Dict[str, Dict[str, str]]:
         """
         Génère du contenu complet pour une boutique e-commerce
         
+        Les sections sont générées en parallèle : le temps total correspond
+        à peu près à la section la plus lente plutôt qu'à la somme.
+        
         Args:
             business_type: Type de business (fashion, electronics, beauty, etc.)
             brand_name: Nom de la marque
             target_audience: Public cible
             sections: Liste des sections à générer (hero, features, about, etc.)
+            max_concurrency: Nombre max de sections générées simultanément pour cette requête
+            allow_partial: Si True, retourne les sections réussies même si d'autres échouent
+            use_cache: Si False, ignore le cache des réponses LLM
+            refresh_cache: Si True, régénère et remplace les entrées en cache
             
         Returns:
-            Dict contenant le contenu généré pour chaque section
+            Dict avec "content" (contenu brut par section) et "errors" (message d'erreur par section échouée)
+            
+        Raises:
+            Exception: Si toutes les sections échouent, ou si une section échoue sans allow_partial
         """
         if sections is None:
             sections = ["hero", "features", "about", "cta"]
         
+        prompts = {}
+        for section in dict.fromkeys(sections):
+            prompt = self._build_section_prompt(section, business_type, brand_name, target_audience)
+            if prompt is not None:
+                prompts[section] = prompt
+        
+        if not prompts:
+            return {"content": {}, "errors": {}}
+        
+        concurrency = settings.ai_section_concurrency
+        if max_concurrency is not None:
+            concurrency = max(1, min(max_concurrency, concurrency))
+        request_semaphore = asyncio.Semaphore(concurrency)
+        
+        results = await asyncio.gather(
+            *(
+                self._generate_section(prompt, request_semaphore, use_cache, refresh_cache)
+                for prompt in prompts.values()
+            ),
+            return_exceptions=True
+        )
+        
         content = {}
+        errors = {}
+        for section, result in zip(prompts, results):
+            if isinstance(result, Exception):
+                logger.error("Échec de génération de la section %s: %s", section, result)
+                errors[section] = str(result)
+            else:
+                content[section] = result
         
-        # Génération du Hero
-        if "hero" in sections:
-            hero_prompt = f"""
-Crée un contenu de section Hero pour une boutique e-commerce {business_type} nommée "{brand_name}".
-Public cible: {target_audience}
-
-Réponds UNIQUEMENT avec un objet JSON structuré comme ceci:
-{{
-  "heading": "Titre principal accrocheur (max 10 mots)",
-  "subheading": "Sous-titre descriptif (max 20 mots)",
-  "cta_primary": "Texte bouton principal",
-  "cta_secondary": "Texte bouton secondaire"
-}}
-
-Pas de texte supplémentaire, juste le JSON.
-"""
-            content["hero"] = await self.generate_content(hero_prompt)
-        
-        # Génération des Features
-        if "features" in sections:
-            features_prompt = f"""
-Crée 4 fonctionnalités/avantages clés pour une boutique e-commerce {business_type} en Afrique.
-Nom de la marque: {brand_name}
-
-Réponds UNIQUEMENT avec un objet JSON:
-{{
-  "heading": "Titre de la section",
-  "subheading": "Sous-titre",
-  "features": [
-    {{
-      "title": "Titre de la fonctionnalité",
-      "description": "Description courte",
-      "icon": "truck|shield|support|award"
-    }}
-  ]
-}}
-"""
-            content["features"] = await self.generate_content(features_prompt)
-        
-        # Génération About
-        if "about" in sections:
-            about_prompt = f"""
-Crée une section "À Propos" engageante pour {brand_name}, une entreprise {business_type} en Afrique.
-
-Réponds UNIQUEMENT avec un objet JSON:
-{{
-  "heading": "Titre",
-  "paragraphs": ["paragraphe 1", "paragraphe 2", "paragraphe 3"]
-}}
-"""
-            content["about"] = await self.generate_content(about_prompt)
-        
-        # Génération CTA
-        if "cta" in sections:
-            cta_prompt = f"""
-Crée une section Call-to-Action finale pour {brand_name}.
-
-Réponds UNIQUEMENT avec un objet JSON:
-{{
-  "heading": "Titre motivant",
-  "text": "Texte persuasif",
-  "button_text": "Texte du bouton"
-}}
-"""
-            content["cta"] = await self.generate_content(cta_prompt)
+        if errors and (not allow_partial or not content):
+            raise Exception(
+                "Échec de génération des sections: " + ", ".join(errors)
+            )
         
-        return content
+        return {"content": content, "errors": errors}
     
-    async def generate_product_description(
+    async def stream_store_content(
+        self,
+        business_type: str,
+        brand_name: str,
+        target_audience: str = "clients africains",
+        sections: List[str] = None,
+        max_concurrency: Optional[int] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False
+    ) -> AsyncIterator[Dict[str, str]]:
+        """
+        Génère les sections d'une boutique en parallèle et streame les événements
+        
+        Les événements des différentes sections sont entrelacés au fil de l'eau :
+        - {"event": "delta", "section": ..., "text": ...} pour chaque morceau reçu
+        - {"event": "section_complete", "section": ..., "raw": ...} à la fin d'une section
+        - {"event": "section_error", "section": ..., "error": ...} si une section échoue
+        
+        Args:
+            Identiques à generate_store_content
+            
+        Yields:
+            Dict décrivant chaque événement
+        """
+        if sections is None:
+            sections = ["hero", "features", "about", "cta"]
+        
+        prompts = {}
+        for section in dict.fromkeys(sections):
+            prompt = self._build_section_prompt(section, business_type, brand_name, target_audience)
+            if prompt is not None:
+                prompts[section] = prompt
+        
+        if not prompts:
+            return
+        
+        concurrency = settings.ai_section_concurrency
+        if max_concurrency is not None:
+            concurrency = max(1, min(max_concurrency, concurrency))
+        request_semaphore = asyncio.Semaphore(concurrency)
+        events: asyncio.Queue = asyncio.Queue()
+        
+        async def run_section(section: str, prompt: str) -> None:
+            chunks = []
+            try:
+                async with request_semaphore:
+                    async with self._global_semaphore:
+                        async for chunk in self.stream_content(
+                            prompt,
+                            use_cache=use_cache,
+                            refresh_cache=refresh_cache
+                        ):
+                            chunks.append(chunk)
+                            await events.put({"event": "delta", "section": section, "text": chunk})
+                await events.put({"event": "section_complete", "section": section, "raw": "".join(chunks)})
+            except Exception as e:
+                logger.error("Échec de génération de la section %s: %s", section, e)
+                await events.put({"event": "section_error", "section": section, "error": str(e)})
+        
+        tasks = [asyncio.create_task(run_section(section, prompt)) for section, prompt in prompts.items()]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                event = await events.get()
+                if event["event"] != "delta":
+                    remaining -= 1
+                yield event
+        finally:
+            # Client déconnecté : arrêter les générations en cours
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def _build_product_prompt(
+        self,
+        product_name: str,
+        category: str,
+        features: List[str] = None
+    ) -> RenderedPrompt:
+        """Construit le prompt de description d'un produit"""
+        return prompt_registry.select("product", product_name).render(
+            **self._product_prompt_values(product_name, category, features)
+        )
+    
+    def _product_prompt_values(
+        self,
+        product_name: str,
+        category: str,
+        features: Optional[List[str]]
+    ) -> Dict[str, str]:
+        return {
+            "product_name": product_name,
+            "category": category,
+            "features": "\n".join([f"- {f}" for f in (features or [])]),
+        }
+    
+    def estimate_store_content_tokens(
+        self,
+        business_type: str,
+        brand_name: str,
+        target_audience: str,
+        sections: List[str]
+    ) -> int:
+        """Tokens LLM estimés (prompts + sorties) d'une génération de boutique"""
+        values = {"business_type": business_type, "brand_name": brand_name, "target_audience": target_audience}
+        return sum(
+            self._estimate_call_tokens(prompt_registry.select(section, brand_name), values)
+            for section in dict.fromkeys(sections)
+            if section in SECTION_PROMPTS
+        )
+    
+    def estimate_product_description_tokens(
         self,
         product_name: str,
         category: str,
         features: List[str] = None
+    ) -> int:
+        """Tokens LLM estimés (prompt + sortie) d'une description de produit"""
+        return self._estimate_call_tokens(
+            prompt_registry.select("product", product_name),
+            self._product_prompt_values(product_name, category, features)
+        )
+    
+    def _estimate_call_tokens(self, template: PromptTemplate, values: Dict[str, str]) -> int:
+        # Sans rendre le prompt : la taille du texte fixe du gabarit est déjà connue
+        return (
+            DEFAULT_SYSTEM_TOKENS
+            + template.estimate_tokens(**values)
+            + (template.max_output_tokens or settings.ai_output_tokens_estimate)
+        )
+    
+    async def generate_product_description(
+        self,
+        product_name: str,
+        category: str,
+        features: List[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False
     ) -> Dict[str, str]:
         """
         Génère une description de produit optimisée
@@ -163,30 +490,139 @@ Réponds UNIQUEMENT avec un objet JSON:
             product_name: Nom du produit
             category: Catégorie du produit
             features: Liste des caractéristiques principales
+            use_cache: Si False, ignore le cache des réponses LLM
+            refresh_cache: Si True, régénère et remplace l'entrée en cache
             
         Returns:
             Dict avec title, short_description, long_description
         """
-        features_str = "\n".join([f"- {f}" for f in (features or [])])
+        prompt = self._build_product_prompt(product_name, category, features)
         
-        prompt = f"""
-Crée une description de produit e-commerce professionnelle pour:
+        return await self.generate_content(
+            prompt,
+            use_cache=use_cache,
+            refresh_cache=refresh_cache
+        )
 
-Nom: {product_name}
-Catégorie: {category}
-Caractéristiques:
-{features_str}
-
-Réponds UNIQUEMENT avec un objet JSON:
-{{
-  "title": "Titre produit optimisé SEO",
-  "short_description": "Description courte accrocheuse (1-2 phrases)",
-  "long_description": "Description détaillée (3-4 paragraphes)",
-  "seo_keywords": ["mot-clé1", "mot-clé2", "mot-clé3"]
-}}
-"""
-        
-        return await self.generate_content(prompt)
+    async def parse_section_content(
+        self,
+        section: str,
+        raw_content: str,
+        repair: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Extrait et valide le JSON d'une section générée
+        
+        Si le JSON est invalide ou non conforme au schéma de la section, un prompt
+        de réparation court est envoyé pour cette seule section, au lieu de
+        régénérer toute la boutique.
+        
+        Args:
+            section: Type de contenu (hero, features, about, cta, product)
+            raw_content: Réponse brute du modèle
+            repair: Si False, ne tente pas de réparation
+            
+        Returns:
+            Dict du contenu validé, ou {"raw": ..., "error": ...} en cas d'échec
+        """
+        try:
+            parsed = parse_section_json(section, raw_content)
+            LLM_JSON_PARSE.inc(section, "ok")
+            return parsed
+        except LLMJSONError as e:
+            error = e
+        
+        if repair and settings.ai_json_repair_enabled:
+            try:
+                repaired = await self.generate_content(
+                    self._build_repair_prompt(section, raw_content, str(error)),
+                    system_message=REPAIR_SYSTEM_MESSAGE
+                )
+                parsed = parse_section_json(section, repaired)
+                LLM_JSON_PARSE.inc(section, "repaired")
+                return parsed
+            except Exception as e:
+                logger.warning("Réparation du JSON de la section %s impossible: %s", section, e)
+                error = e
+        
+        LLM_JSON_PARSE.inc(section, "failed")
+        return {"raw": raw_content, "error": str(error)}
+    
+    def _build_repair_prompt(self, section: str, raw_content: str, error: str) -> RenderedPrompt:
+        """Prompt de réparation ciblé pour une section au JSON invalide"""
+        schema = section_schema_hint(section)
+        return prompt_registry.get("repair").render(
+            section=section,
+            error=error,
+            schema_line=f"\nSchéma attendu: {schema}\n" if schema else "",
+            raw_content=raw_content[:settings.ai_json_repair_max_chars]
+        )
+    
+    async def iter_product_descriptions(
+        self,
+        products: List[Dict[str, Any]],
+        max_concurrency: Optional[int] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False
+    ) -> AsyncIterator[Tuple[int, Union[str, Exception]]]:
+        """
+        Génère les descriptions d'un lot de produits avec un pool de workers borné
+        
+        Les résultats sont produits dans l'ordre de fin de génération, pas dans
+        l'ordre d'entrée. La file de sortie est bornée : si le consommateur lit
+        lentement, les workers attendent au lieu d'accumuler les résultats.
+        
+        Args:
+            products: Liste de dicts avec product_name, category et features
+            max_concurrency: Nombre de workers (plafonné par AI_BATCH_CONCURRENCY)
+            use_cache: Si False, ignore le cache des réponses LLM
+            refresh_cache: Si True, régénère et remplace les entrées en cache
+            
+        Yields:
+            Tuple (index du produit, contenu brut ou exception)
+        """
+        if not products:
+            return
+        
+        concurrency = settings.ai_batch_concurrency
+        if max_concurrency is not None:
+            concurrency = max(1, min(max_concurrency, concurrency))
+        concurrency = min(concurrency, len(products))
+        
+        pending: asyncio.Queue = asyncio.Queue()
+        for item in enumerate(products):
+            pending.put_nowait(item)
+        results: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        
+        async def worker() -> None:
+            while True:
+                try:
+                    index, product = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    async with self._global_semaphore:
+                        result = await self.generate_product_description(
+                            product_name=product["product_name"],
+                            category=product["category"],
+                            features=product.get("features"),
+                            use_cache=use_cache,
+                            refresh_cache=refresh_cache
+                        )
+                except Exception as e:
+                    logger.error("Échec de génération du produit %s: %s", index, e)
+                    result = e
+                await results.put((index, result))
+        
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for _ in range(len(products)):
+                yield await results.get()
+        finally:
+            # Client déconnecté ou lot terminé : arrêter les workers restants
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
 
 # Instance globale
 ai_generator = AIContentGenerator()
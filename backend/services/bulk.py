@@ -0,0 +1,116 @@
+"""Écritures groupées (bulk_write non ordonné, par lots) avec résultat par élément"""
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+NOT_FOUND = "not_found"
+ERROR = "error"
+
+DUPLICATE_KEY = 11000
+
+
+def _describe_error(error: Dict[str, Any]) -> str:
+    if error.get("code") == DUPLICATE_KEY:
+        return "Identifiant déjà utilisé par un autre propriétaire"
+    return error.get("errmsg", "Erreur d'écriture")
+
+
+async def run_bulk(
+    collection,
+    operations: List[Tuple[int, Any]],
+    chunk_size: int
+) -> Tuple[set, Dict[int, str]]:
+    """
+    Exécute des opérations par lots de chunk_size avec ordered=False
+
+    Un élément en erreur n'interrompt pas les autres : les erreurs d'écriture
+    sont rapportées par élément.
+
+    Args:
+        collection: Collection Motor
+        operations: (index de l'élément dans la requête, opération pymongo)
+        chunk_size: Nombre d'opérations par aller-retour
+
+    Returns:
+        (index des éléments insérés par upsert, {index: message d'erreur})
+    """
+    upserted = set()
+    errors = {}
+
+    for start in range(0, len(operations), chunk_size):
+        chunk = operations[start:start + chunk_size]
+        try:
+            result = await collection.bulk_write([op for _, op in chunk], ordered=False)
+            upserted_positions = list(result.upserted_ids)
+        except BulkWriteError as e:
+            upserted_positions = [row["index"] for row in e.details.get("upserted", [])]
+            for error in e.details.get("writeErrors", []):
+                errors[chunk[error["index"]][0]] = _describe_error(error)
+
+        upserted.update(chunk[position][0] for position in upserted_positions)
+
+    return upserted, errors
+
+
+async def run_updates(
+    collection,
+    updates: List[Tuple[int, Dict[str, Any], Dict[str, Any]]],
+    chunk_size: int
+) -> Tuple[set, Dict[int, str]]:
+    """
+    Exécute des mises à jour sans upsert, concurrentes par lots de chunk_size
+
+    BulkWriteResult ne donne que des totaux : pour savoir quels éléments
+    existaient au moment de l'écriture, sans lecture préalable qu'une écriture
+    concurrente rendrait fausse, chaque élément a son update_one et son
+    matched_count.
+
+    Args:
+        collection: Collection Motor
+        updates: (index de l'élément dans la requête, filtre, mise à jour)
+        chunk_size: Nombre de mises à jour en vol à la fois
+
+    Returns:
+        (index des éléments trouvés et mis à jour, {index: message d'erreur})
+    """
+    matched = set()
+    errors = {}
+
+    for start in range(0, len(updates), chunk_size):
+        chunk = updates[start:start + chunk_size]
+        results = await asyncio.gather(
+            *(collection.update_one(filter, update) for _, filter, update in chunk),
+            return_exceptions=True
+        )
+        for (index, _, _), result in zip(chunk, results):
+            if isinstance(result, PyMongoError):
+                errors[index] = _describe_error(getattr(result, "details", None) or {"errmsg": str(result)})
+            elif isinstance(result, BaseException):
+                raise result
+            elif result.matched_count:
+                matched.add(index)
+
+    return matched, errors
+
+
+def item_result(index: int, item_id: Optional[str], status: str, error: Optional[str] = None) -> Dict[str, Any]:
+    result = {"index": index, "id": item_id, "status": status}
+    if error:
+        result["error"] = error
+    return result
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Réponse commune des routes d'import : résultats par élément et totaux"""
+    counts = {CREATED: 0, UPDATED: 0, UNCHANGED: 0, NOT_FOUND: 0, ERROR: 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return {
+        "success": counts[ERROR] == 0 and counts[NOT_FOUND] == 0,
+        "counts": counts,
+        "results": results,
+    }
@@ -0,0 +1,224 @@
+"""
+Cache read-through des documents lus par les routes (boutiques, puis pages)
+
+Les entrées sont invalidées par les écritures du worker courant et, entre
+workers, par un change stream MongoDB. Sans replica set (pas de change
+stream), la fraîcheur entre workers est bornée par le TTL.
+
+Test local des change streams : replica set à un seul nœud
+    mongod --replSet rs0 --dbpath /tmp/rs0
+    mongosh --eval "rs.initiate()"
+puis MONGO_URL=mongodb://localhost:27017/?replicaSet=rs0
+"""
+import asyncio
+import itertools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from cachetools import TTLCache
+from pymongo.errors import OperationFailure, PyMongoError
+
+from config import settings
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Code renvoyé par un MongoDB standalone : change streams indisponibles
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+
+class DocumentCache:
+    """
+    Documents et listes par clé, avec invalidation par génération
+
+    Chaque document (collection, id) et chaque liste d'un propriétaire
+    (collection, user_id) a un numéro de génération inclus dans la clé des
+    entrées. Invalider attribue une nouvelle génération : les anciennes entrées
+    deviennent inaccessibles, y compris celles d'une lecture commencée avant
+    l'écriture et terminée après (elle est rangée sous l'ancienne génération).
+    Les numéros viennent d'un compteur qui ne fait que croître : une génération
+    n'est jamais réattribuée, même après l'oubli de celle d'un document.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 30, enabled: bool = True):
+        self.enabled = enabled
+        self._entries = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        # Génération oubliée (expirée ou évincée) : remplacée par un nouveau
+        # numéro à la lecture suivante, ce qui coûte seulement un miss
+        self._generations = TTLCache(maxsize=max_entries * 4, ttl=ttl_seconds * 2)
+        self._sequence = itertools.count(1)
+        # Incrémentée par clear() : invalide toutes les entrées d'un coup
+        self._epoch = 0
+        self._inflight = SingleFlight()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "clears": 0}
+
+    def _document_tag(self, collection: str, document_id: str) -> Tuple[str, str]:
+        return (collection, document_id)
+
+    def _owner_tag(self, collection: str, user_id: str) -> Tuple[str, str, str]:
+        return (collection, "owner", user_id)
+
+    def _generation(self, tag: Tuple) -> int:
+        generation = self._generations.get(tag)
+        if generation is None:
+            generation = self._generations[tag] = next(self._sequence)
+        return generation
+
+    async def _read_through(self, key: Tuple, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await loader()
+
+        key = (self._epoch, *key)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._stats["hits"] += 1
+            return entry
+        self._stats["misses"] += 1
+
+        async def load():
+            value = await loader()
+            # Pas de cache négatif : une création doit être visible immédiatement
+            if value is not None:
+                self._entries[key] = value
+            return value
+
+        return await self._inflight.do(repr(key), load)
+
+    async def get_document(
+        self,
+        collection: str,
+        document_id: str,
+        loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+        builder: Callable[[Dict[str, Any]], Any] = None
+    ) -> Any:
+        """
+        Document par id, chargé par loader() en cas d'absence
+
+        Args:
+            builder: Transforme le document avant sa mise en cache (ex: ajout de l'ETag)
+
+        Returns:
+            La valeur en cache (à ne pas modifier), ou None si le document n'existe pas
+        """
+        tag = self._document_tag(collection, document_id)
+
+        async def load():
+            document = await loader()
+            if document is None or builder is None:
+                return document
+            return builder(document)
+
+        return await self._read_through((tag, self._generation(tag)), load)
+
+    async def get_owner_list(
+        self,
+        collection: str,
+        user_id: str,
+        params: Hashable,
+        loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Liste d'un propriétaire pour des paramètres de requête donnés"""
+        tag = self._owner_tag(collection, user_id)
+        return await self._read_through((tag, self._generation(tag), params), loader)
+
+    def invalidate(
+        self,
+        collection: str,
+        document_id: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> None:
+        """Invalide un document et/ou les listes de son propriétaire"""
+        tags = []
+        if document_id is not None:
+            tags.append(self._document_tag(collection, document_id))
+        if user_id is not None:
+            tags.append(self._owner_tag(collection, user_id))
+        for tag in tags:
+            self._generations[tag] = next(self._sequence)
+        self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        """Vide tout le cache (événement sans document, change stream interrompu)"""
+        self._epoch += 1
+        self._entries.clear()
+        self._stats["clears"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self._entries.maxsize,
+            "ttl_seconds": self._entries.ttl,
+        }
+
+
+class ChangeStreamInvalidator:
+    """
+    Invalide le cache à partir du change stream des collections cachées
+
+    Les écritures des autres workers (et des scripts) sont vues ici. Le
+    document complet (fullDocument: updateLookup) donne l'id et le
+    propriétaire à invalider ; un événement sans document vide le cache.
+    Après une coupure, le cache est vidé et le flux reprend au dernier
+    resume token.
+    """
+
+    def __init__(self, cache: DocumentCache, collections: Iterable, retry_seconds: float = 5):
+        self.cache = cache
+        self.collections = list(collections)
+        self.retry_seconds = retry_seconds
+        self._tasks = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._watch(collection)) for collection in self.collections]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def handle(self, collection: str, change: Dict[str, Any]) -> None:
+        document = change.get("fullDocument")
+        if document and document.get("id"):
+            self.cache.invalidate(collection, document["id"], document.get("user_id"))
+        else:
+            # delete, drop, ou document déjà supprimé : pas d'id applicatif
+            self.cache.clear()
+
+    async def _watch(self, collection) -> None:
+        resume_token = None
+        while True:
+            try:
+                async with collection.watch(
+                    full_document="updateLookup",
+                    resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        self.handle(collection.name, change)
+                        resume_token = stream.resume_token
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    logger.warning(
+                        "Change streams indisponibles (replica set requis) : invalidation de %s "
+                        "entre workers limitée au TTL", collection.name
+                    )
+                    return
+                logger.warning("Change stream de %s interrompu: %s", collection.name, e)
+                resume_token = None
+            except PyMongoError as e:
+                logger.warning("Change stream de %s interrompu: %s", collection.name, e)
+            self.cache.clear()
+            await asyncio.sleep(self.retry_seconds)
+
+
+# Instance globale
+document_cache = DocumentCache(
+    max_entries=settings.document_cache_max_entries,
+    ttl_seconds=settings.document_cache_ttl_seconds,
+    enabled=settings.document_cache_enabled
+)
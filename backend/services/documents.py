@@ -0,0 +1,106 @@
+"""Écritures atomiques sur les documents appartenant à un utilisateur"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+
+class VersionConflict(Exception):
+    """Le document a été modifié depuis la version lue par le client"""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Version actuelle: {current_version}")
+        self.current_version = current_version
+
+
+def _version_filter(expected_version: int) -> Any:
+    # Les documents créés avant le versioning n'ont pas de champ version (= 0)
+    if expected_version == 0:
+        return {"$in": [0, None]}
+    return expected_version
+
+
+async def update_owned_document(
+    collection,
+    document_id: str,
+    user_id: str,
+    update_data: Dict[str, Any],
+    expected_version: Optional[int] = None,
+    projection: Optional[Dict[str, int]] = None,
+    extra_filter: Optional[Dict[str, Any]] = None,
+    update_operators: Optional[Dict[str, Any]] = None,
+    array_filters: Optional[List[Dict[str, Any]]] = None,
+    pipeline: Optional[List[Dict[str, Any]]] = None,
+    return_document: ReturnDocument = ReturnDocument.AFTER
+) -> Optional[Dict[str, Any]]:
+    """
+    Met à jour un document en un seul aller-retour MongoDB
+
+    La propriété (user_id) et la version attendue font partie du filtre de
+    find_one_and_update : il n'y a pas de fenêtre entre la vérification et
+    l'écriture. Chaque écriture incrémente version.
+
+    Args:
+        collection: Collection Motor
+        document_id: Valeur du champ id
+        user_id: Propriétaire attendu
+        update_data: Champs à $set (updated_at est ajouté)
+        expected_version: Si fourni, l'écriture n'a lieu que sur cette version
+        projection: Champs du document retourné (par défaut tout sauf _id)
+        extra_filter: Conditions supplémentaires sur le document
+        update_operators: Opérateurs de mise à jour supplémentaires ($push, $pull...)
+        array_filters: Filtres des identifiants $[x] utilisés dans update_data
+        pipeline: Étapes d'une mise à jour par pipeline d'agrégation, quand les
+            opérateurs ne suffisent pas (plusieurs modifications d'un même tableau).
+            Exclut update_operators et array_filters ; update_data reste littéral.
+        return_document: ReturnDocument.BEFORE pour le document avant mise à jour
+
+    Returns:
+        Le document après (ou avant) mise à jour, ou None s'il n'existe pas pour cet utilisateur
+
+    Raises:
+        VersionConflict: Si le document existe mais n'est plus à la version attendue
+    """
+    query = {"id": document_id, "user_id": user_id, **(extra_filter or {})}
+    if expected_version is not None:
+        query["version"] = _version_filter(expected_version)
+
+    if pipeline is not None:
+        if update_operators or array_filters:
+            raise ValueError("pipeline exclut update_operators et array_filters")
+        update = [
+            *pipeline,
+            {
+                "$set": {
+                    # Dans un pipeline, une chaîne "$..." serait lue comme un chemin de champ
+                    **{field: {"$literal": value} for field, value in update_data.items()},
+                    "updated_at": datetime.utcnow(),
+                    "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+                }
+            },
+        ]
+    else:
+        update = {
+            **(update_operators or {}),
+            "$set": {**update_data, "updated_at": datetime.utcnow()},
+            "$inc": {"version": 1},
+        }
+
+    document = await collection.find_one_and_update(
+        query,
+        update,
+        projection=projection or {"_id": 0},
+        array_filters=array_filters,
+        return_document=return_document
+    )
+
+    if document is None and expected_version is not None:
+        # Chemin d'échec seulement : distinguer "introuvable" de "conflit de version"
+        current = await collection.find_one(
+            {"id": document_id, "user_id": user_id},
+            {"_id": 0, "version": 1}
+        )
+        if current is not None:
+            raise VersionConflict(current.get("version", 0))
+
+    return document
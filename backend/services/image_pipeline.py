@@ -0,0 +1,660 @@
+"""
+Ingestion des images produits : téléchargement, déduplication, variantes
+
+Les produits importés pointent vers les images pleine taille des
+fournisseurs. Pour chaque image sans variantes :
+- téléchargement par un client httpx partagé, en nombre borné
+  (IMAGE_DOWNLOAD_CONCURRENCY) et en taille bornée (IMAGE_MAX_BYTES)
+- déduplication : une URL déjà ingérée n'est pas retéléchargée, un contenu
+  déjà vu (SHA-256) n'est pas réencodé
+- redimensionnement et encodage WebP/AVIF dans un pool de processus : la
+  boucle asyncio ne décode ni n'encode jamais d'image
+- stockage des variantes (disque local ou S3 compatible) sous une clé
+  dérivée du hash : contenu immuable, cacheable indéfiniment
+
+Les variantes sont ensuite écrites sur le produit (images[].variants) avec
+contrôle de version. Les assets (hash → variantes, URLs sources) sont gardés
+en mémoire et, si une collection est attachée, dans MongoDB pour être
+partagés entre workers.
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urljoin
+
+import httpx
+from cachetools import LRUCache
+from pymongo.errors import PyMongoError
+
+from config import settings
+from services.documents import VersionConflict, update_owned_document
+from services.outbound import UnsafeURL, check_public_url
+from services.product_search import product_search
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+MAX_REDIRECTS = 3
+WRITE_BACK_ATTEMPTS = 3
+
+# Champs d'une image produit renseignés par l'ingestion
+ASSET_FIELDS = ("content_hash", "width", "height", "variants")
+PRODUCT_PROJECTION = {"_id": 0, "id": 1, "user_id": 1, "images": 1, "version": 1}
+
+
+class ImageRejected(ValueError):
+    """Image non ingérable : téléchargement impossible, trop lourde ou illisible"""
+
+
+def parse_widths(value: str) -> List[int]:
+    """Largeurs des variantes, de la plus grande à la plus petite"""
+    return sorted({int(part) for part in value.split(",") if part.strip()}, reverse=True)
+
+
+def parse_formats(value: str) -> List[str]:
+    formats = [part.strip().lower() for part in value.split(",") if part.strip()]
+    unknown = set(formats) - set(CONTENT_TYPES)
+    if unknown:
+        raise ValueError(f"Formats d'image non pris en charge: {', '.join(sorted(unknown))}")
+    return formats
+
+
+def needs_ingestion(images: Optional[List[Dict[str, Any]]]) -> bool:
+    """Au moins une image du produit n'a pas encore de variantes"""
+    return any(not image.get("variants") for image in images or [])
+
+
+def render_variants(
+    data: bytes,
+    widths: Sequence[int],
+    formats: Sequence[str],
+    quality: Dict[str, int],
+    max_pixels: int
+) -> Dict[str, Any]:
+    """
+    Décode une image et encode ses variantes (exécuté dans le pool de processus)
+
+    Pas d'agrandissement : une largeur supérieure à l'original est ramenée à
+    la largeur de l'original. Chaque réduction part de la variante précédente,
+    plus grande, et non de l'original ; les JPEG sont décodés directement à
+    l'échelle utile (draft).
+
+    Returns:
+        {"width", "height", "variants": [{"format", "width", "height", "data"}]}
+
+    Raises:
+        ImageRejected: Image illisible ou trop grande
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        width, height = image.size
+        # Orientation EXIF 5 à 8 : largeur et hauteur échangées à l'affichage
+        rotated = image.getexif().get(0x0112) in (5, 6, 7, 8)
+    except UnidentifiedImageError:
+        raise ImageRejected("Format d'image non reconnu") from None
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageRejected(f"Image illisible: {e}") from None
+    if width * height > max_pixels:
+        raise ImageRejected(f"Image trop grande ({width}x{height})")
+    if rotated:
+        width, height = height, width
+
+    try:
+        target = min(widths[0], width)
+        scaled = (target, max(1, target * height // width))
+        image.draft("RGB", scaled[::-1] if rotated else scaled)
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    except (OSError, SyntaxError, ValueError) as e:
+        raise ImageRejected(f"Image illisible: {e}") from None
+
+    variants = []
+    source = image
+    for target in sorted({min(width_, width) for width_ in widths}, reverse=True):
+        if target < source.width:
+            target_height = max(1, round(height * target / width))
+            source = source.resize((target, target_height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for image_format in formats:
+            buffer = io.BytesIO()
+            if image_format == "webp":
+                source.save(buffer, "WEBP", quality=quality["webp"], method=4)
+            else:
+                source.save(buffer, "AVIF", quality=quality["avif"], speed=8, max_threads=1)
+            variants.append({
+                "format": image_format,
+                "width": source.width,
+                "height": source.height,
+                "data": buffer.getvalue(),
+            })
+    return {"width": width, "height": height, "variants": variants}
+
+
+class LocalImageStorage:
+    """Variantes sur le disque local, servies sous base_url (StaticFiles de l'API ou CDN)"""
+
+    def __init__(self, directory: str, base_url: str):
+        self.directory = Path(directory)
+        self.base_url = base_url.rstrip("/")
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    async def put(self, key: str, data: bytes, content_type: str) -> str:
+        await asyncio.to_thread(self._write, key, data)
+        return self.url(key)
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self.directory / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Écriture puis renommage : un fichier servi n'est jamais partiel
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+
+
+class S3ImageStorage:
+    """
+    Variantes dans un bucket S3 compatible (AWS, Cloudflare R2, MinIO...)
+
+    boto3 est bloquant : les envois passent par un thread. Le client est créé
+    au premier envoi.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        base_url: str = "",
+        endpoint_url: str = "",
+        region: str = ""
+    ):
+        if not bucket:
+            raise ValueError("IMAGE_S3_BUCKET requis pour le stockage S3")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.endpoint_url = endpoint_url or None
+        self.region = region or None
+        if base_url:
+            self.base_url = base_url.rstrip("/")
+        elif endpoint_url:
+            self.base_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.base_url = f"https://{bucket}.s3.amazonaws.com"
+        self._client = None
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{self._key(key)}"
+
+    def _get_client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url, region_name=self.region)
+        return self._client
+
+    async def put(self, key: str, data: bytes, content_type: str) -> str:
+        await asyncio.to_thread(
+            self._get_client().put_object,
+            Bucket=self.bucket,
+            Key=self._key(key),
+            Body=data,
+            ContentType=content_type,
+            CacheControl=CACHE_CONTROL
+        )
+        return self.url(key)
+
+
+def create_storage():
+    """Stockage des variantes selon IMAGE_STORAGE_BACKEND"""
+    if settings.image_storage_backend == "s3":
+        return S3ImageStorage(
+            settings.image_s3_bucket,
+            prefix=settings.image_s3_prefix,
+            base_url=settings.image_public_base_url,
+            endpoint_url=settings.image_s3_endpoint_url,
+            region=settings.image_s3_region
+        )
+    return LocalImageStorage(
+        settings.image_storage_dir,
+        settings.image_public_base_url or settings.image_local_url_path
+    )
+
+
+class ImagePipeline:
+    """
+    Ingestion des images : URL source → asset (hash, dimensions, variantes)
+
+    Les appels concurrents sur la même URL, puis sur le même contenu, sont
+    regroupés (single-flight) : une image partagée par plusieurs produits d'un
+    import n'est téléchargée et encodée qu'une fois.
+    """
+
+    def __init__(
+        self,
+        storage,
+        widths: Sequence[int] = (1024, 640, 320),
+        formats: Sequence[str] = ("webp", "avif"),
+        quality: Optional[Dict[str, int]] = None,
+        process_workers: int = 2,
+        download_concurrency: int = 16,
+        download_timeout: float = 20.0,
+        max_bytes: int = 15_000_000,
+        max_pixels: int = 40_000_000,
+        allow_private_hosts: bool = False,
+        memory_assets: int = 10000,
+        enabled: bool = True
+    ):
+        self.storage = storage
+        self.widths = sorted(set(widths), reverse=True)
+        self.formats = list(formats)
+        self.quality = quality or {"webp": 80, "avif": 50}
+        self.process_workers = max(1, process_workers)
+        self.download_concurrency = max(1, download_concurrency)
+        self.download_timeout = download_timeout
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.allow_private_hosts = allow_private_hosts
+        self.enabled = enabled
+        self._client: Optional[httpx.AsyncClient] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._downloads = asyncio.Semaphore(self.download_concurrency)
+        # Images décodées en attente d'un processus : borne la mémoire des gros imports
+        self._encodes = asyncio.Semaphore(self.process_workers * 2)
+        self._inflight = SingleFlight()
+        self._assets = LRUCache(maxsize=memory_assets)  # hash → asset
+        self._urls = LRUCache(maxsize=memory_assets)  # URL source → hash
+        self._collection = None
+        self._products = None
+        self._stats = {
+            "downloads": 0,
+            "url_hits": 0,
+            "hash_hits": 0,
+            "encoded": 0,
+            "rejected": 0,
+            "products_updated": 0,
+            "source_bytes": 0,
+            "variant_bytes": 0,
+        }
+
+    async def start(self) -> None:
+        """Ouvre le client HTTP et le pool de processus (appelé au démarrage)"""
+        if not self.enabled or self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.download_concurrency,
+                max_keepalive_connections=self.download_concurrency
+            ),
+            timeout=httpx.Timeout(self.download_timeout, connect=10.0),
+            headers={"Accept": "image/avif,image/webp,image/*;q=0.8", "User-Agent": "EasyShopAfrica-ImageIngest/1.0"}
+        )
+        self._executor = self._new_executor()
+
+    async def close(self) -> None:
+        """Ferme les connexions et arrête les processus d'encodage"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn : pas de fork d'un processus qui a des threads (Motor, boto3)
+        return ProcessPoolExecutor(
+            max_workers=self.process_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    async def attach_collections(self, assets, products) -> None:
+        """
+        Active le registre d'assets MongoDB et l'écriture des variantes sur les produits
+
+        Args:
+            assets: Collection des assets ({_id: hash, variantes, source_urls})
+            products: Collection des produits
+
+        L'index sur source_urls est déclaré dans indexes.INDEXES.
+        """
+        self._collection = assets
+        self._products = products
+
+    def _require_products(self):
+        if self._products is None:
+            raise RuntimeError("Pipeline d'images non initialisé")
+        return self._products
+
+    async def ingest(self, url: str) -> Dict[str, Any]:
+        """
+        Asset d'une image source, téléchargée, encodée et stockée si besoin
+
+        Returns:
+            {"content_hash", "width", "height", "bytes", "variants": [{"url", "format", "width", "height", "bytes"}]}
+
+        Raises:
+            ImageRejected: Image non ingérable (l'erreur n'est pas mise en cache)
+        """
+        return await self._shared(f"url:{url}", lambda: self._ingest(url), "url_hits")
+
+    async def _shared(self, key: str, fn, hit: str) -> Dict[str, Any]:
+        """Exécution single-flight ; un appelant regroupé sur l'exécution en cours compte comme hit"""
+        executed = False
+
+        def run():
+            nonlocal executed
+            executed = True
+            return fn()
+
+        result = await self._inflight.do(key, run)
+        if not executed:
+            self._stats[hit] += 1
+        return result
+
+    async def _ingest(self, url: str) -> Dict[str, Any]:
+        asset = await self._find_by_url(url)
+        if asset is not None:
+            self._stats["url_hits"] += 1
+            return asset
+
+        try:
+            data, content_hash = await self._download(url)
+        except ImageRejected:
+            self._stats["rejected"] += 1
+            raise
+
+        asset = await self._find_by_hash(content_hash)
+        if asset is not None:
+            self._stats["hash_hits"] += 1
+        else:
+            asset = await self._shared(f"hash:{content_hash}", lambda: self._encode(content_hash, data), "hash_hits")
+        await self._remember(url, asset)
+        return asset
+
+    async def _find_by_url(self, url: str) -> Optional[Dict[str, Any]]:
+        content_hash = self._urls.get(url)
+        if content_hash is not None and content_hash in self._assets:
+            return self._assets[content_hash]
+        if self._collection is None:
+            return None
+        try:
+            asset = await self._collection.find_one({"source_urls": url}, {"source_urls": 0, "created_at": 0})
+        except PyMongoError as e:
+            logger.warning("Registre d'images indisponible: %s", e)
+            return None
+        if asset is None:
+            return None
+        asset.pop("_id", None)
+        self._urls[url] = asset["content_hash"]
+        self._assets[asset["content_hash"]] = asset
+        return asset
+
+    async def _find_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        asset = self._assets.get(content_hash)
+        if asset is not None or self._collection is None:
+            return asset
+        try:
+            asset = await self._collection.find_one(
+                {"_id": content_hash},
+                {"_id": 0, "source_urls": 0, "created_at": 0}
+            )
+        except PyMongoError as e:
+            logger.warning("Registre d'images indisponible: %s", e)
+            return None
+        if asset is not None:
+            self._assets[content_hash] = asset
+        return asset
+
+    async def _remember(self, url: str, asset: Dict[str, Any]) -> None:
+        content_hash = asset["content_hash"]
+        self._urls[url] = content_hash
+        self._assets[content_hash] = asset
+        if self._collection is None:
+            return
+        try:
+            await self._collection.update_one(
+                {"_id": content_hash},
+                {
+                    "$setOnInsert": {**asset, "created_at": datetime.utcnow()},
+                    "$addToSet": {"source_urls": url},
+                },
+                upsert=True
+            )
+        except PyMongoError as e:
+            # Variantes déjà stockées : seule la déduplication entre workers est perdue
+            logger.warning("Asset %s non enregistré: %s", content_hash[:12], e)
+
+    async def _check_host(self, url: str) -> None:
+        try:
+            await check_public_url(url, self.allow_private_hosts)
+        except UnsafeURL as e:
+            raise ImageRejected(str(e)) from None
+
+    async def _download(self, url: str) -> Tuple[bytes, str]:
+        if self._client is None:
+            raise RuntimeError("Pipeline d'images non démarré")
+
+        async with self._downloads:
+            try:
+                for _ in range(MAX_REDIRECTS + 1):
+                    # Redirections suivies à la main : chaque hôte est vérifié
+                    await self._check_host(url)
+                    async with self._client.stream("GET", url) as response:
+                        if response.is_redirect:
+                            url = urljoin(url, response.headers["location"])
+                            continue
+                        return await self._read_image(response)
+            except httpx.HTTPError as e:
+                raise ImageRejected(f"Téléchargement impossible: {e}") from None
+        raise ImageRejected("Trop de redirections")
+
+    async def _read_image(self, response: httpx.Response) -> Tuple[bytes, str]:
+        if response.status_code != 200:
+            raise ImageRejected(f"Réponse HTTP {response.status_code}")
+        content_type = response.headers.get("content-type", "")
+        if content_type.startswith(("text/", "application/json")):
+            raise ImageRejected(f"Contenu non image: {content_type}")
+        length = response.headers.get("content-length", "")
+        if length.isdigit() and int(length) > self.max_bytes:
+            raise ImageRejected(f"Image trop lourde ({length} octets)")
+
+        digest = hashlib.sha256()
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise ImageRejected(f"Image trop lourde (plus de {self.max_bytes} octets)")
+            digest.update(chunk)
+            chunks.append(chunk)
+
+        self._stats["downloads"] += 1
+        self._stats["source_bytes"] += size
+        return b"".join(chunks), digest.hexdigest()
+
+    async def _encode(self, content_hash: str, data: bytes) -> Dict[str, Any]:
+        if self._executor is None:
+            raise RuntimeError("Pipeline d'images non démarré")
+
+        async with self._encodes:
+            try:
+                rendered = await asyncio.get_running_loop().run_in_executor(
+                    self._executor,
+                    render_variants,
+                    data,
+                    self.widths,
+                    self.formats,
+                    self.quality,
+                    self.max_pixels
+                )
+            except ImageRejected:
+                self._stats["rejected"] += 1
+                raise
+            except BrokenProcessPool:
+                # Processus mort (mémoire, décodeur) : pool recréé pour les images suivantes
+                logger.error("Pool d'encodage interrompu pendant l'image %s", content_hash[:12])
+                self._executor = self._new_executor()
+                self._stats["rejected"] += 1
+                raise ImageRejected("Encodage interrompu") from None
+
+        variants = await asyncio.gather(*(
+            self._store(content_hash, variant) for variant in rendered["variants"]
+        ))
+        self._stats["encoded"] += 1
+        self._stats["variant_bytes"] += sum(variant["bytes"] for variant in variants)
+        return {
+            "content_hash": content_hash,
+            "width": rendered["width"],
+            "height": rendered["height"],
+            "bytes": len(data),
+            "variants": variants,
+        }
+
+    async def _store(self, content_hash: str, variant: Dict[str, Any]) -> Dict[str, Any]:
+        # Clé dérivée du contenu : deux écritures concurrentes produisent le même fichier
+        key = f"{content_hash[:2]}/{content_hash}/{variant['width']}.{variant['format']}"
+        url = await self.storage.put(key, variant["data"], CONTENT_TYPES[variant["format"]])
+        return {
+            "url": url,
+            "format": variant["format"],
+            "width": variant["width"],
+            "height": variant["height"],
+            "bytes": len(variant["data"]),
+        }
+
+    async def ingest_product(self, product_id: str) -> Dict[str, Any]:
+        """
+        Ingère les images sans variantes d'un produit et écrit leurs variantes
+
+        Une image refusée est signalée dans failed sans bloquer les autres ;
+        elle sera retentée par le prochain job du produit.
+
+        Returns:
+            {"product_id", "ingested", "failed": {url: raison}, "version"}
+        """
+        products = self._require_products()
+        product = await products.find_one({"id": product_id}, PRODUCT_PROJECTION)
+        if product is None:
+            return {"product_id": product_id, "ingested": 0, "failed": {}, "version": None}
+
+        urls = list(dict.fromkeys(
+            image["url"] for image in product.get("images") or [] if not image.get("variants")
+        ))
+        results = await asyncio.gather(*(self.ingest(url) for url in urls), return_exceptions=True)
+
+        assets = {}
+        failed = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, ImageRejected):
+                failed[url] = str(result)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                assets[url] = result
+
+        version = product.get("version", 0)
+        if assets:
+            updated = await self._write_back(product, assets)
+            if updated is not None:
+                version = updated["version"]
+        return {"product_id": product_id, "ingested": len(assets), "failed": failed, "version": version}
+
+    async def _write_back(self, product: Dict[str, Any], assets: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Écrit les variantes sur les images du produit, en relisant le produit sur conflit de version"""
+        products = self._require_products()
+        for _ in range(WRITE_BACK_ATTEMPTS):
+            images = []
+            changed = False
+            for image in product.get("images") or []:
+                asset = assets.get(image.get("url"))
+                if asset is not None and not image.get("variants"):
+                    image = {**image, **{field: asset[field] for field in ASSET_FIELDS}}
+                    changed = True
+                images.append(image)
+            if not changed:
+                return None
+
+            try:
+                updated = await update_owned_document(
+                    products,
+                    product["id"],
+                    product["user_id"],
+                    {"images": images},
+                    expected_version=product.get("version", 0)
+                )
+            except VersionConflict:
+                # Produit modifié pendant l'ingestion : les images actuelles sont reprises
+                product = await products.find_one({"id": product["id"]}, PRODUCT_PROJECTION)
+                if product is None:
+                    return None
+                continue
+
+            if updated is not None:
+                self._stats["products_updated"] += 1
+                product_search.upsert(updated)
+            return updated
+
+        raise RuntimeError(f"Produit {product['id']} modifié pendant l'ingestion des images")
+
+    async def ingest_products(self, product_ids: List[str]) -> Dict[str, Any]:
+        """
+        Ingère les images de plusieurs produits (job product_images)
+
+        Les produits sont traités par IMAGE_DOWNLOAD_CONCURRENCY à la fois ; les
+        téléchargements et encodages restent bornés globalement.
+        """
+        queue = list(dict.fromkeys(product_ids))
+        results = []
+
+        async def worker():
+            while queue:
+                results.append(await self.ingest_product(queue.pop()))
+
+        await asyncio.gather(*(worker() for _ in range(min(self.download_concurrency, len(queue)))))
+        return {
+            "products": len(results),
+            "images_ingested": sum(result["ingested"] for result in results),
+            "failed": {result["product_id"]: result["failed"] for result in results if result["failed"]},
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "memory_assets": len(self._assets),
+            "encoding_workers": self.process_workers if self._executor is not None else 0,
+            "widths": self.widths,
+            "formats": self.formats,
+        }
+
+
+# Instance globale
+image_pipeline = ImagePipeline(
+    create_storage(),
+    widths=parse_widths(settings.image_variant_widths),
+    formats=parse_formats(settings.image_variant_formats),
+    quality={"webp": settings.image_webp_quality, "avif": settings.image_avif_quality},
+    process_workers=settings.image_process_workers,
+    download_concurrency=settings.image_download_concurrency,
+    download_timeout=settings.image_download_timeout_seconds,
+    max_bytes=settings.image_max_bytes,
+    max_pixels=settings.image_max_pixels,
+    allow_private_hosts=settings.image_allow_private_hosts,
+    memory_assets=settings.image_memory_assets,
+    enabled=settings.image_pipeline_enabled
+)
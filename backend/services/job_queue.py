@@ -0,0 +1,358 @@
+"""File de jobs en arrière-plan (génération IA, images produits) adossée à MongoDB (bail, reprises, webhooks)"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+from pymongo import ASCENDING, ReturnDocument
+
+from config import settings
+from services.ai_service import ai_generator
+from services.image_pipeline import image_pipeline
+from services.outbound import UnsafeURL, check_public_url
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class JobQueue:
+    """
+    File de jobs persistante
+
+    Un worker prend un job en posant un bail (lease) daté : si le worker meurt,
+    le bail expire et le job redevient disponible pour un autre worker. Les
+    échecs sont repris avec un délai exponentiel jusqu'à max_attempts.
+    """
+
+    def __init__(self):
+        self._collection = None
+
+    @property
+    def is_attached(self) -> bool:
+        return self._collection is not None
+
+    async def attach_collection(self, collection) -> None:
+        """Active la file sur une collection MongoDB (index dans indexes.INDEXES)"""
+        self._collection = collection
+
+    def _require_collection(self):
+        if self._collection is None:
+            raise RuntimeError("File de jobs non initialisée")
+        return self._collection
+
+    async def submit(
+        self,
+        user_id: str,
+        kind: str,
+        payload: Dict[str, Any],
+        webhook_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Crée un job en attente et le retourne"""
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "kind": kind,
+            "payload": payload,
+            "status": QUEUED,
+            "attempts": 0,
+            "max_attempts": settings.ai_job_max_attempts,
+            "webhook_url": webhook_url,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "available_at": now,
+            "lease_owner": None,
+            "lease_expires_at": None,
+        }
+        await self._require_collection().insert_one(dict(job))
+        return job
+
+    async def get(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne un job de l'utilisateur"""
+        return await self._require_collection().find_one(
+            {"id": job_id, "user_id": user_id},
+            {"_id": 0, "payload": 0, "lease_owner": 0}
+        )
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Prend atomiquement le prochain job disponible
+
+        Un job est disponible s'il est en attente et que son délai de reprise est
+        écoulé, ou s'il est en cours mais que le bail de son worker a expiré et
+        qu'il lui reste des essais (sinon abandon_expired le marque échoué).
+        """
+        now = datetime.now(timezone.utc)
+        return await self._require_collection().find_one_and_update(
+            {
+                "$or": [
+                    {"status": QUEUED, "available_at": {"$lte": now}},
+                    {
+                        "status": RUNNING,
+                        "lease_expires_at": {"$lt": now},
+                        "$expr": {"$lt": ["$attempts", "$max_attempts"]},
+                    },
+                ]
+            },
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "lease_owner": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=settings.ai_job_lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", ASCENDING)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def abandon_expired(self) -> Optional[Dict[str, Any]]:
+        """
+        Marque échoué un job dont le bail a expiré au dernier essai
+
+        Un worker mort pendant le dernier essai ne laisse aucun échec à
+        replanifier : le job est clos ici, une seule fois (mise à jour atomique).
+        """
+        now = datetime.now(timezone.utc)
+        return await self._require_collection().find_one_and_update(
+            {
+                "status": RUNNING,
+                "lease_expires_at": {"$lt": now},
+                "$expr": {"$gte": ["$attempts", "$max_attempts"]},
+            },
+            {
+                "$set": {
+                    "status": FAILED,
+                    "error": "Bail expiré au dernier essai",
+                    "lease_owner": None,
+                    "lease_expires_at": None,
+                    "updated_at": now,
+                }
+            },
+            projection={"_id": 0, "payload": 0, "lease_owner": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def extend_lease(self, job: Dict[str, Any], worker_id: str) -> bool:
+        """Prolonge le bail d'un job en cours ; False si le bail a été perdu"""
+        now = datetime.now(timezone.utc)
+        result = await self._require_collection().update_one(
+            {"id": job["id"], "status": RUNNING, "lease_owner": worker_id},
+            {"$set": {"lease_expires_at": now + timedelta(seconds=settings.ai_job_lease_seconds)}}
+        )
+        return result.modified_count == 1
+
+    async def complete(self, job: Dict[str, Any], worker_id: str, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Marque le job réussi (seulement si le worker détient encore le bail)"""
+        return await self._finish(job, worker_id, {"status": SUCCEEDED, "result": result, "error": None})
+
+    async def fail(self, job: Dict[str, Any], worker_id: str, error: str) -> Optional[Dict[str, Any]]:
+        """Replanifie le job avec un délai exponentiel, ou le marque échoué au dernier essai"""
+        if job["attempts"] < job["max_attempts"]:
+            delay = settings.ai_job_retry_base_seconds * (2 ** (job["attempts"] - 1))
+            update = {
+                "status": QUEUED,
+                "error": error,
+                "available_at": datetime.now(timezone.utc) + timedelta(seconds=delay),
+            }
+        else:
+            update = {"status": FAILED, "error": error}
+        return await self._finish(job, worker_id, update)
+
+    async def _finish(self, job: Dict[str, Any], worker_id: str, update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        update.update({
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "updated_at": datetime.now(timezone.utc),
+        })
+        return await self._require_collection().find_one_and_update(
+            {"id": job["id"], "status": RUNNING, "lease_owner": worker_id},
+            {"$set": update},
+            projection={"_id": 0, "payload": 0, "lease_owner": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def counts(self) -> Dict[str, int]:
+        """Nombre de jobs par statut"""
+        pipeline = [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        async for row in self._require_collection().aggregate(pipeline):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+
+class JobWorker:
+    """
+    Worker qui consomme la file de jobs
+
+    Peut tourner dans le process de l'API (AI_JOB_INLINE_WORKERS) ou dans un
+    process dédié (python worker.py) pour dimensionner séparément API et génération.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: Dict[str, JobHandler],
+        concurrency: int = 1,
+        poll_interval: float = 1.0
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self._tasks = []
+        self._stopping = asyncio.Event()
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Arrête les boucles ; les jobs interrompus seront repris à l'expiration du bail"""
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                while (abandoned := await self.queue.abandon_expired()) is not None:
+                    logger.error("Job %s abandonné: bail expiré au dernier essai", abandoned["id"])
+                    if abandoned.get("webhook_url"):
+                        await send_webhook(abandoned["webhook_url"], abandoned)
+                job = await self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error("Impossible de prendre un job: %s", e)
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self.process(job)
+
+    async def process(self, job: Dict[str, Any]) -> None:
+        """Exécute un job en gardant son bail à jour"""
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            handler = self.handlers.get(job["kind"])
+            if handler is None:
+                raise ValueError(f"Type de job inconnu: {job['kind']}")
+            result = await handler(job["payload"])
+        except Exception as e:
+            logger.error("Job %s échoué (essai %s): %s", job["id"], job["attempts"], e)
+            finished = await self.queue.fail(job, self.worker_id, str(e))
+        else:
+            finished = await self.queue.complete(job, self.worker_id, result)
+        finally:
+            heartbeat.cancel()
+
+        if finished is None:
+            logger.warning("Bail du job %s perdu, résultat ignoré", job["id"])
+        elif finished["status"] in (SUCCEEDED, FAILED) and job.get("webhook_url"):
+            await send_webhook(job["webhook_url"], finished)
+
+    async def _heartbeat(self, job: Dict[str, Any]) -> None:
+        interval = settings.ai_job_lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            if not await self.queue.extend_lease(job, self.worker_id):
+                return
+
+
+async def send_webhook(url: str, job: Dict[str, Any]) -> bool:
+    """
+    Notifie la fin d'un job par POST JSON
+
+    Si AI_JOB_WEBHOOK_SECRET est configuré, le corps est signé en HMAC-SHA256
+    dans le header X-Webhook-Signature. L'URL est revérifiée à l'envoi (le DNS
+    a pu changer depuis la soumission) et les redirections ne sont pas suivies.
+    """
+    try:
+        await check_public_url(url, settings.ai_job_webhook_allow_private_hosts)
+    except UnsafeURL as e:
+        logger.warning("Webhook %s refusé: %s", url, e)
+        return False
+
+    body = json.dumps(
+        {
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "result": job.get("result"),
+            "error": job.get("error"),
+        },
+        ensure_ascii=False,
+        default=str
+    ).encode("utf-8")
+
+    headers = {"Content-Type": "application/json"}
+    if settings.ai_job_webhook_secret:
+        signature = hmac.new(settings.ai_job_webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+        headers["X-Webhook-Signature"] = f"sha256={signature}"
+
+    async with httpx.AsyncClient(timeout=10.0, follow_redirects=False) as client:
+        for attempt in range(3):
+            try:
+                response = await client.post(url, content=body, headers=headers)
+                if response.status_code < 500:
+                    return response.is_success
+            except httpx.HTTPError as e:
+                logger.warning("Webhook %s en échec (essai %s): %s", url, attempt + 1, e)
+            await asyncio.sleep(2 ** attempt)
+    return False
+
+
+async def _run_store_content(payload: Dict[str, Any]) -> Dict[str, Any]:
+    result = await ai_generator.generate_store_content(**payload)
+    parsed = await asyncio.gather(*(
+        ai_generator.parse_section_content(section, raw_content)
+        for section, raw_content in result["content"].items()
+    ))
+    return {
+        "content": dict(zip(result["content"], parsed)),
+        "failed_sections": result["errors"],
+        "partial": bool(result["errors"]),
+    }
+
+
+async def _run_product_description(payload: Dict[str, Any]) -> Dict[str, Any]:
+    description = await ai_generator.generate_product_description(**payload)
+    return {"description": await ai_generator.parse_section_content("product", description)}
+
+
+async def _run_product_images(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await image_pipeline.ingest_products(payload["product_ids"])
+
+
+# Handlers par type de job
+DEFAULT_HANDLERS: Dict[str, JobHandler] = {
+    "store_content": _run_store_content,
+    "product_description": _run_product_description,
+    "product_images": _run_product_images,
+}
+
+# Instance globale
+job_queue = JobQueue()
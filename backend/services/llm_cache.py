@@ -0,0 +1,134 @@
+"""Cache des réponses LLM adressé par contenu (mémoire LRU + MongoDB optionnel)"""
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(provider: str, model: str, system_message: str, prompt: str) -> str:
+    """
+    Calcule la clé de cache d'une génération
+
+    La clé est un hash SHA-256 de (provider, model, system_message, prompt) :
+    deux requêtes identiques partagent la même entrée quel que soit l'appelant.
+    """
+    digest = hashlib.sha256()
+    for part in (provider, model, system_message, prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Cache à deux niveaux pour les réponses LLM
+
+    - Niveau 1 : LRU en mémoire avec taille max et TTL
+    - Niveau 2 (optionnel) : collection MongoDB avec index TTL, partagée entre workers
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._memory = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self._collection = None
+        self._stats = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "bypassed": 0,
+            "refreshed": 0,
+            "errors": 0,
+        }
+
+    async def attach_collection(self, collection) -> None:
+        """
+        Active le niveau persistant sur une collection MongoDB
+
+        Son index TTL sur expires_at est déclaré dans indexes.INDEXES : MongoDB
+        supprime lui-même les entrées expirées.
+        """
+        self._collection = collection
+
+    def detach_collection(self) -> None:
+        """Désactive le niveau persistant"""
+        self._collection = None
+
+    def record_bypass(self, refresh: bool = False) -> None:
+        """Comptabilise une requête qui n'a pas lu le cache"""
+        self._stats["refreshed" if refresh else "bypassed"] += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Retourne la réponse en cache ou None
+
+        Un hit persistant est recopié dans le niveau mémoire.
+        """
+        response = self._memory.get(key)
+        if response is not None:
+            self._stats["memory_hits"] += 1
+            return response
+
+        if self._collection is not None:
+            try:
+                doc = await self._collection.find_one(
+                    {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                    {"response": 1}
+                )
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning("Lecture du cache LLM persistant impossible: %s", e)
+                doc = None
+
+            if doc is not None:
+                self._stats["persistent_hits"] += 1
+                self._memory[key] = doc["response"]
+                return doc["response"]
+
+        self._stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, response: str, provider: str, model: str) -> None:
+        """Enregistre une réponse dans les deux niveaux"""
+        self._memory[key] = response
+        self._stats["writes"] += 1
+
+        if self._collection is not None:
+            now = datetime.now(timezone.utc)
+            try:
+                await self._collection.replace_one(
+                    {"_id": key},
+                    {
+                        "_id": key,
+                        "response": response,
+                        "provider": provider,
+                        "model": model,
+                        "created_at": now,
+                        "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                    },
+                    upsert=True
+                )
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning("Écriture du cache LLM persistant impossible: %s", e)
+
+    def clear(self) -> None:
+        """Vide le niveau mémoire"""
+        self._memory.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Compteurs hit/miss et taux de hit"""
+        hits = self._stats["memory_hits"] + self._stats["persistent_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_max_entries": self._memory.maxsize,
+            "persistent": self._collection is not None,
+        }
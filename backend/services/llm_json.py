@@ -0,0 +1,126 @@
+"""Extraction et validation du JSON retourné par les modèles LLM"""
+import json
+import re
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import ValidationError
+
+from models.ai_content import SECTION_SCHEMAS
+
+try:
+    import orjson
+
+    def _loads(text: str) -> Any:
+        return orjson.loads(text)
+
+    _DECODE_ERRORS = (orjson.JSONDecodeError, json.JSONDecodeError)
+except ImportError:  # orjson est optionnel
+    _loads = json.loads
+    _DECODE_ERRORS = (json.JSONDecodeError,)
+
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+class LLMJSONError(ValueError):
+    """Aucun objet JSON valide n'a pu être extrait de la réponse"""
+
+
+def find_json_object(text: str, start: int = 0) -> Optional[Tuple[int, int]]:
+    """
+    Trouve le premier objet JSON équilibré à partir de start, en une seule passe
+
+    Les accolades à l'intérieur des chaînes (et les guillemets échappés) sont
+    ignorées. Le texte autour (prose, balises ```json, commentaires) est ignoré.
+
+    Returns:
+        (début, fin) de l'objet dans text, ou None si aucun objet n'est fermé
+    """
+    begin = text.find("{", start)
+    if begin < 0:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(begin, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return begin, index + 1
+    return None
+
+
+def extract_json(text: str) -> Dict[str, Any]:
+    """
+    Extrait le premier objet JSON valide d'une réponse LLM
+
+    Cas courant (balises ```, prose avant ou après sans accolades) : un seul
+    appel au décodeur entre la première { et la dernière }. Sinon, chaque objet
+    équilibré est essayé dans l'ordre ; une virgule finale avant } ou ] est tolérée.
+
+    Raises:
+        LLMJSONError: Si aucun objet JSON valide n'est trouvé
+    """
+    begin = text.find("{")
+    end = text.rfind("}")
+    if 0 <= begin < end:
+        try:
+            return _loads(text[begin:end + 1])
+        except _DECODE_ERRORS:
+            pass
+
+    position = 0
+    while True:
+        span = find_json_object(text, position)
+        if span is None:
+            raise LLMJSONError("Aucun objet JSON complet dans la réponse")
+
+        candidate = text[span[0]:span[1]]
+        try:
+            return _loads(candidate)
+        except _DECODE_ERRORS:
+            try:
+                return _loads(_TRAILING_COMMA.sub(r"\1", candidate))
+            except _DECODE_ERRORS:
+                position = span[0] + 1
+
+
+def parse_section(section: str, raw_content: str) -> Dict[str, Any]:
+    """
+    Extrait le JSON d'une section et le valide contre son schéma
+
+    Les sections sans schéma déclaré sont seulement extraites.
+
+    Raises:
+        LLMJSONError: Si le JSON est absent, invalide ou non conforme au schéma
+    """
+    data = extract_json(raw_content)
+
+    schema = SECTION_SCHEMAS.get(section)
+    if schema is None:
+        return data
+
+    try:
+        return schema.model_validate(data).model_dump()
+    except ValidationError as e:
+        raise LLMJSONError(f"JSON non conforme au schéma {section}: {e.error_count()} erreur(s)") from e
+
+
+def section_schema_hint(section: str) -> Optional[str]:
+    """Schéma JSON d'une section, utilisé dans le prompt de réparation"""
+    schema = SECTION_SCHEMAS.get(section)
+    if schema is None:
+        return None
+    return json.dumps(schema.model_json_schema(), ensure_ascii=False)
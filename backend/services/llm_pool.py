@@ -0,0 +1,142 @@
+"""Pool de clients LLM partagé, démarré et fermé avec l'application"""
+import asyncio
+import logging
+import urllib.request
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+from emergentintegrations.llm.chat import LlmChat
+
+logger = logging.getLogger(__name__)
+
+# Hôtes des API des providers : chacun a son propre pool de connexions dans le client partagé
+PROVIDER_HOSTS = {
+    "openai": "api.openai.com",
+    "anthropic": "api.anthropic.com",
+    "gemini": "generativelanguage.googleapis.com",
+}
+
+
+class LLMClientPool:
+    """
+    Pool de clients LLM par (provider, model)
+
+    LlmChat conserve l'historique de sa conversation : une instance ne peut donc
+    pas être réutilisée entre deux prompts. Ce qui coûte cher, c'est la connexion
+    HTTP/TLS vers le provider ; le pool garde un client httpx keep-alive partagé,
+    installé dans litellm (le client HTTP utilisé par LlmChat), et borne le nombre
+    de sessions simultanées par modèle à la taille du pool pour rester sur des
+    connexions chaudes.
+
+    litellm n'accepte qu'un client : chaque provider de PROVIDER_HOSTS y a son
+    transport, avec ses propres limites de connexions, pour qu'un provider lent
+    n'occupe pas les connexions des autres. Les autres hôtes (proxy compatible
+    OpenAI) partagent le transport par défaut.
+    """
+
+    def __init__(self, api_key: str, pool_size: int = 10, keepalive_expiry: float = 60.0):
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.keepalive_expiry = keepalive_expiry
+        self._slots: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+        self._in_use: Dict[Tuple[str, str], int] = {}
+        self._sessions_created: Dict[Tuple[str, str], int] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        """Ouvre le client HTTP keep-alive partagé (appelé au démarrage de l'app)"""
+        if self._http_client is not None:
+            return
+
+        self._http_client = httpx.AsyncClient(
+            limits=self._limits(),
+            mounts={f"https://{host}": self._transport(host) for host in PROVIDER_HOSTS.values()},
+            timeout=httpx.Timeout(120.0, connect=10.0)
+        )
+
+        try:
+            import litellm
+            litellm.aclient_session = self._http_client
+        except ImportError:
+            logger.warning("litellm indisponible : connexions LLM non mutualisées")
+
+    def _limits(self) -> httpx.Limits:
+        """Limites de connexions d'un transport (un par provider)"""
+        return httpx.Limits(
+            max_connections=self.pool_size * 2,
+            max_keepalive_connections=self.pool_size,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def _transport(self, host: str) -> httpx.AsyncHTTPTransport:
+        """Transport dédié à un provider ; garde le proxy HTTPS de l'environnement comme le client"""
+        proxy = None if urllib.request.proxy_bypass(host) else urllib.request.getproxies().get("https")
+        return httpx.AsyncHTTPTransport(limits=self._limits(), proxy=proxy)
+
+    async def close(self) -> None:
+        """Ferme les connexions (appelé à l'arrêt de l'app)"""
+        if self._http_client is None:
+            return
+
+        try:
+            import litellm
+            if litellm.aclient_session is self._http_client:
+                litellm.aclient_session = None
+        except ImportError:
+            pass
+
+        await self._http_client.aclose()
+        self._http_client = None
+
+    @staticmethod
+    def new_session_id(prefix: str = "content-gen") -> str:
+        """Identifiant de session unique, indépendant du nom de la tâche asyncio"""
+        return f"{prefix}-{uuid.uuid4().hex}"
+
+    @asynccontextmanager
+    async def lease(
+        self,
+        model_provider: str,
+        model_name: str,
+        system_message: str
+    ) -> AsyncIterator[LlmChat]:
+        """
+        Réserve un slot du pool pour (provider, model) et fournit une session neuve
+
+        Usage:
+            async with pool.lease("openai", "gpt-5", system_message) as chat:
+                response = await chat.send_message(UserMessage(text=prompt))
+        """
+        key = (model_provider, model_name)
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = self._slots[key] = asyncio.Semaphore(self.pool_size)
+
+        async with slots:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+            self._sessions_created[key] = self._sessions_created.get(key, 0) + 1
+            try:
+                yield LlmChat(
+                    api_key=self.api_key,
+                    session_id=self.new_session_id(),
+                    system_message=system_message
+                ).with_model(model_provider, model_name)
+            finally:
+                self._in_use[key] -= 1
+
+    def stats(self) -> Dict[str, object]:
+        """Occupation du pool par modèle"""
+        return {
+            "pool_size": self.pool_size,
+            "shared_http_client": self._http_client is not None,
+            "provider_transports": sorted(PROVIDER_HOSTS) if self._http_client is not None else [],
+            "models": {
+                f"{provider}/{model}": {
+                    "in_use": self._in_use.get((provider, model), 0),
+                    "sessions_created": self._sessions_created.get((provider, model), 0),
+                }
+                for provider, model in self._slots
+            },
+        }
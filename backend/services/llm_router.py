@@ -0,0 +1,286 @@
+"""Routage adaptatif primary/fallback : disjoncteur et requêtes couvertes (hedging)"""
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Model = Tuple[str, str]
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ModelHealth:
+    """
+    Santé glissante d'un modèle et état de son disjoncteur
+
+    - closed : le trafic passe normalement
+    - open : le modèle est jugé indisponible, le trafic part sur le fallback
+    - half_open : après le délai de refroidissement, une requête sonde est autorisée
+
+    Chaque requête autorisée reçoit un ticket, rendu à record() : seul le
+    résultat de la sonde ferme ou rouvre le disjoncteur, et les réponses
+    tardives de requêtes envoyées avant la dernière fermeture sont ignorées.
+    """
+
+    def __init__(
+        self,
+        window: int = 50,
+        error_rate_threshold: float = 0.5,
+        min_requests: int = 10,
+        cooldown_seconds: float = 30.0
+    ):
+        self.error_rate_threshold = error_rate_threshold
+        self.min_requests = min_requests
+        self.cooldown_seconds = cooldown_seconds
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._tickets = itertools.count(1)
+        # Ticket de la sonde en cours (half_open), None sinon
+        self._probe: Optional[int] = None
+        # Tickets délivrés avant la dernière fermeture : résultats ignorés
+        self._closed_after = 0
+        self.trips = 0
+
+    def allow_request(self) -> Optional[int]:
+        """Ticket de la requête à envoyer à ce modèle, None si elle est refusée"""
+        if self.state == CLOSED:
+            return next(self._tickets)
+
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.cooldown_seconds:
+                return None
+            self.state = HALF_OPEN
+
+        # half_open : une seule sonde à la fois
+        if self._probe is not None:
+            return None
+        self._probe = next(self._tickets)
+        return self._probe
+
+    def is_available(self) -> bool:
+        """Comme allow_request, sans réserver de sonde"""
+        if self.state == OPEN:
+            return time.monotonic() - self._opened_at >= self.cooldown_seconds
+        return not (self.state == HALF_OPEN and self._probe is not None)
+
+    def record(self, ticket: int, latency: float, ok: bool) -> None:
+        """Enregistre le résultat de l'appel autorisé par ticket"""
+        if ticket == self._probe:
+            self._probe = None
+            self._samples.append((latency, ok))
+            if ok:
+                logger.info("Disjoncteur refermé après une sonde réussie")
+                self.state = CLOSED
+                self._closed_after = ticket
+                self._samples.clear()
+            else:
+                self._trip()
+            return
+
+        if ticket <= self._closed_after:
+            return
+        self._samples.append((latency, ok))
+
+        if (
+            self.state == CLOSED
+            and len(self._samples) >= self.min_requests
+            and self.error_rate() >= self.error_rate_threshold
+        ):
+            self._trip()
+
+    def release_probe(self, ticket: int) -> None:
+        """Libère la sonde si l'appel annulé (perdant d'une course hedgée) était elle"""
+        if ticket == self._probe:
+            self._probe = None
+
+    def _trip(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self.trips += 1
+        logger.warning("Disjoncteur ouvert (taux d'erreur %.0f%%)", self.error_rate() * 100)
+
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Percentile de latence des appels réussis, None si pas assez d'échantillons"""
+        latencies = sorted(latency for latency, ok in self._samples if ok)
+        if len(latencies) < self.min_requests:
+            return None
+        index = min(len(latencies) - 1, int(round(percentile * (len(latencies) - 1))))
+        return latencies[index]
+
+    def snapshot(self) -> Dict[str, object]:
+        p50 = self.latency_percentile(0.50)
+        p95 = self.latency_percentile(0.95)
+        return {
+            "state": self.state,
+            "samples": len(self._samples),
+            "error_rate": round(self.error_rate(), 4),
+            "latency_p50": round(p50, 3) if p50 is not None else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+            "trips": self.trips,
+        }
+
+
+class LLMRouter:
+    """
+    Choisit entre le modèle primary et le fallback selon leur santé
+
+    - Primary disjoncté : envoi direct au fallback, sans attendre son timeout ;
+      le fallback passe par son propre disjoncteur
+    - Hedging (optionnel) : si le primary dépasse son p95, une requête est lancée
+      en parallèle sur le fallback et la première réponse réussie l'emporte
+    """
+
+    def __init__(
+        self,
+        primary: Model,
+        fallback: Model,
+        window: int = 50,
+        error_rate_threshold: float = 0.5,
+        min_requests: int = 10,
+        cooldown_seconds: float = 30.0,
+        hedge_enabled: bool = False,
+        hedge_min_delay: float = 2.0
+    ):
+        self.primary = primary
+        self.fallback = fallback
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay = hedge_min_delay
+        self.health: Dict[Model, ModelHealth] = {
+            model: ModelHealth(window, error_rate_threshold, min_requests, cooldown_seconds)
+            for model in (primary, fallback)
+        }
+        self._stats = {
+            "primary": 0, "fallback": 0, "short_circuited": 0, "rejected": 0, "hedged": 0, "hedge_wins": 0
+        }
+
+    def is_available(self, model: Model) -> bool:
+        return self.health[model].is_available()
+
+    async def call(self, send: Callable[[Model], Awaitable[str]]) -> str:
+        """
+        Exécute send(model) sur le meilleur modèle disponible
+
+        Args:
+            send: Coroutine qui envoie le prompt au modèle donné
+
+        Returns:
+            str: La première réponse réussie
+        """
+        ticket = self.health[self.primary].allow_request()
+        if ticket is None:
+            self._stats["short_circuited"] += 1
+            logger.info("Primary disjoncté, envoi direct au fallback")
+            return await self._call_fallback(send)
+
+        hedge_delay = self._hedge_delay()
+        primary_task = asyncio.create_task(self._timed(self.primary, ticket, send))
+
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=hedge_delay)
+            if not done:
+                hedge_ticket = self.health[self.fallback].allow_request()
+                if hedge_ticket is not None:
+                    return await self._race(primary_task, hedge_ticket, send)
+                # Fallback disjoncté : pas de couverture, le primary va au bout
+                await asyncio.wait({primary_task})
+        except asyncio.CancelledError:
+            primary_task.cancel()
+            raise
+
+        try:
+            response = primary_task.result()
+        except Exception as e:
+            logger.error("Erreur avec %s/%s: %s", *self.primary, e)
+            logger.info("Tentative avec le modèle fallback...")
+            return await self._call_fallback(send)
+
+        self._stats["primary"] += 1
+        return response
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge_enabled:
+            return None
+        p95 = self.health[self.primary].latency_percentile(0.95)
+        if p95 is None:
+            return None
+        return max(p95, self.hedge_min_delay)
+
+    async def _race(
+        self,
+        primary_task: asyncio.Task,
+        hedge_ticket: int,
+        send: Callable[[Model], Awaitable[str]]
+    ) -> str:
+        """Lance le fallback en parallèle du primary lent et garde la première réussite"""
+        self._stats["hedged"] += 1
+        hedge_task = asyncio.create_task(self._timed(self.fallback, hedge_ticket, send))
+        pending = {primary_task, hedge_task}
+        last_error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge_task:
+                            self._stats["hedge_wins"] += 1
+                            self._stats["fallback"] += 1
+                        else:
+                            self._stats["primary"] += 1
+                        return task.result()
+                    last_error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise Exception(f"Échec de génération avec tous les modèles: {str(last_error)}")
+
+    async def _call_fallback(self, send: Callable[[Model], Awaitable[str]]) -> str:
+        ticket = self.health[self.fallback].allow_request()
+        if ticket is None:
+            self._stats["rejected"] += 1
+            raise Exception(f"Échec de génération avec tous les modèles: fallback {'/'.join(self.fallback)} disjoncté")
+        try:
+            response = await self._timed(self.fallback, ticket, send)
+        except Exception as e:
+            logger.error("Erreur avec %s/%s: %s", *self.fallback, e)
+            raise Exception(f"Échec de génération avec tous les modèles: {str(e)}")
+        self._stats["fallback"] += 1
+        return response
+
+    async def _timed(self, model: Model, ticket: int, send: Callable[[Model], Awaitable[str]]) -> str:
+        """Appelle le modèle et enregistre sa latence et son résultat sous son ticket"""
+        health = self.health[model]
+        start = time.monotonic()
+        try:
+            response = await send(model)
+        except asyncio.CancelledError:
+            health.release_probe(ticket)
+            raise
+        except Exception:
+            health.record(ticket, time.monotonic() - start, ok=False)
+            raise
+        health.record(ticket, time.monotonic() - start, ok=True)
+        return response
+
+    def snapshot(self) -> Dict[str, object]:
+        """État de santé exposé sur l'endpoint interne"""
+        return {
+            "primary": "/".join(self.primary),
+            "fallback": "/".join(self.fallback),
+            "hedge_enabled": self.hedge_enabled,
+            "models": {"/".join(model): health.snapshot() for model, health in self.health.items()},
+            "routing": dict(self._stats),
+        }
@@ -0,0 +1,276 @@
+"""
+Métriques au format d'exposition Prometheus
+
+Compteurs et histogrammes en mémoire, sans dépendance externe. Les
+statistiques déjà tenues ailleurs (cache LLM, cache d'auth, pool MongoDB...)
+sont lues au moment du scrape par des collecteurs, sans coût sur le chemin
+des requêtes.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from services.tracing import end_span, start_span
+
+# Bornes des histogrammes de latence (secondes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Compteur monotone par combinaison de labels"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in items]
+
+
+class Histogram:
+    """Histogramme cumulatif (buckets, somme, nombre) par combinaison de labels"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [compte par bucket (+Inf en dernier), somme]
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+
+        lines = []
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                bucket_labels = _format_labels((*self.labelnames, "le"), (*labels, bound))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            base = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{base} {total}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+# Collecteur : fonction appelée au scrape, retournant (nom, aide, type, [(labels, valeur)])
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+
+        for collector in self._collectors:
+            for name, documentation, kind, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP par route",
+    ("method", "route", "status")
+))
+MONGO_COMMAND_DURATION = REGISTRY.register(Histogram(
+    "mongo_command_duration_seconds", "Durée des commandes MongoDB",
+    ("command", "collection"), DB_BUCKETS
+))
+MONGO_COMMAND_FAILURES = REGISTRY.register(Counter(
+    "mongo_command_failures_total", "Commandes MongoDB en échec", ("command", "collection")
+))
+LLM_CALL_DURATION = REGISTRY.register(Histogram(
+    "llm_call_duration_seconds", "Durée des appels LLM",
+    ("provider", "model", "outcome")
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens_total", "Tokens LLM estimés (prompt, completion)", ("provider", "model", "kind")
+))
+LLM_FALLBACK_CALLS = REGISTRY.register(Counter(
+    "llm_fallback_calls_total", "Appels au modèle de fallback", ("provider", "model")
+))
+LLM_JSON_PARSE = REGISTRY.register(Counter(
+    "llm_json_parse_total", "Parsing du JSON des réponses LLM (ok, repaired, failed)", ("section", "result")
+))
+PROMPT_RENDERS = REGISTRY.register(Counter(
+    "llm_prompt_renders_total", "Prompts rendus par gabarit et variante", ("template", "version", "variant")
+))
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI : latence par route
+
+    Le label route est le chemin déclaré (/api/stores/{store_id}) et non l'URL,
+    pour garder un nombre de séries borné.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code[0])
+            )
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    Durée de chaque commande MongoDB (et span OpenTelemetry si activé)
+
+    Les événements arrivent depuis les threads du driver : la collection de
+    la commande en cours est gardée sous verrou jusqu'à son résultat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[int, object], Tuple[str, object]] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        span = start_span(f"mongodb.{event.command_name}", {
+            "db.system": "mongodb",
+            "db.name": event.database_name,
+            "db.operation": event.command_name,
+            "db.mongodb.collection": collection,
+        })
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = (collection, span)
+
+    def _finish(self, event) -> Tuple[str, object]:
+        with self._lock:
+            return self._pending.pop((event.request_id, event.connection_id), ("", None))
+
+    def succeeded(self, event):
+        collection, span = self._finish(event)
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, collection)
+        end_span(span)
+
+    def failed(self, event):
+        collection, span = self._finish(event)
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, event.command_name, collection)
+        MONGO_COMMAND_FAILURES.inc(event.command_name, collection)
+        end_span(span, error=str(event.failure))
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+def stats_collector(
+    name: str,
+    documentation: str,
+    read_stats: Callable[[], Dict[str, object]],
+    fields: Iterable[str],
+    kind: str = "gauge",
+    label: Optional[str] = None
+) -> Collector:
+    """
+    Collecteur à partir d'une méthode stats() existante
+
+    Chaque champ numérique devient une série ({label}="champ" si label, sinon
+    un nom de métrique name_champ, suffixé _total pour un compteur).
+    """
+    fields = tuple(fields)
+    suffix = "_total" if kind == "counter" else ""
+
+    def collect():
+        stats = read_stats()
+        if label:
+            yield name, documentation, kind, [
+                ({label: field}, float(stats[field])) for field in fields if field in stats
+            ]
+        else:
+            for field in fields:
+                if field in stats:
+                    yield f"{name}_{field}{suffix}", documentation, kind, [({}, float(stats[field]))]
+
+    return collect
@@ -0,0 +1,35 @@
+"""Garde des requêtes sortantes vers des URLs fournies par les utilisateurs"""
+import asyncio
+import ipaddress
+from urllib.parse import urlsplit
+
+
+class UnsafeURL(ValueError):
+    """URL non http(s) ou pointant vers le réseau interne"""
+
+
+async def check_public_url(url: str, allow_private_hosts: bool = False) -> None:
+    """
+    Vérifie qu'une URL http(s) ne vise que des adresses publiques
+
+    Toutes les adresses résolues doivent être globales : pas de requête vers
+    le réseau interne (métadonnées cloud, services privés, loopback). Les
+    redirections ne sont pas couvertes : l'appelant vérifie chaque saut ou ne
+    les suit pas.
+    """
+    try:
+        parts = urlsplit(url)
+        scheme, host, port = parts.scheme, parts.hostname, parts.port
+    except ValueError:
+        scheme = host = port = None
+    if scheme not in ("http", "https") or not host:
+        raise UnsafeURL(f"URL invalide: {url}")
+    if allow_private_hosts:
+        return
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(host, port or 443)
+    except OSError:
+        raise UnsafeURL(f"Hôte introuvable: {host}") from None
+    for *_, sockaddr in addresses:
+        if not ipaddress.ip_address(sockaddr[0].split("%")[0]).is_global:
+            raise UnsafeURL(f"Hôte non autorisé: {host}")
@@ -0,0 +1,377 @@
+"""
+Traduction d'opérations JSON Patch (RFC 6902) en mises à jour MongoDB ciblées
+
+Les sections sont adressées par leur id, pas par leur position :
+- /title, /slug, /is_published, /seo_title, /seo_description
+- /sections/-                      (add : nouvelle section en fin de liste)
+- /sections/{id}                   (replace, remove)
+- /sections/{id}/type|order        (add, replace)
+- /sections/{id}/settings/a/b...   (add, replace, remove)
+
+Les opérations sur des sections existantes deviennent des $set/$unset sur
+sections.$[sN] (arrayFilters), les suppressions un $pull et les ajouts un
+$push : l'écriture ne dépend que de la taille de la modification. MongoDB
+refuse ces opérateurs ensemble sur le même tableau : un patch qui les combine
+devient une mise à jour par pipeline (sections_expression), toujours en une
+seule écriture.
+"""
+from typing import Any, Dict, List
+
+from pydantic import TypeAdapter, ValidationError
+
+from models.page import PageBase, PagePatchOperation, PageSection
+
+PAGE_FIELDS = {
+    name: TypeAdapter(PageBase.model_fields[name].annotation)
+    for name in ("title", "slug", "is_published", "seo_title", "seo_description")
+}
+NULLABLE_PAGE_FIELDS = {"seo_title", "seo_description"}
+SECTION_ADAPTER = TypeAdapter(PageSection)
+SECTION_FIELDS = {
+    name: TypeAdapter(field.annotation)
+    for name, field in PageSection.model_fields.items()
+    if name != "id"
+}
+
+
+def parse_pointer(path: str) -> List[str]:
+    """Segments d'un JSON Pointer (RFC 6901)"""
+    if not path.startswith("/"):
+        raise ValueError(f"Chemin invalide: {path}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _mongo_key(token: str) -> str:
+    # Un segment devient un nom de champ MongoDB : ni point ni $ initial
+    if not token or "." in token or token.startswith("$"):
+        raise ValueError(f"Clé non supportée: {token!r}")
+    return token
+
+
+def _validate(adapter: TypeAdapter, value: Any, path: str) -> Any:
+    try:
+        return adapter.validate_python(value)
+    except ValidationError as e:
+        raise ValueError(f"Valeur invalide pour {path}: {e.errors()[0]['msg']}")
+
+
+class PagePatchPlan:
+    """
+    Mises à jour issues d'un patch
+
+    Attributes:
+        set: Champs à $set (chemins MongoDB)
+        unset: Champs à $unset
+        array_filters: Filtres des identifiants sections.$[sN] utilisés
+        targeted: Ids des sections existantes visées (doivent exister)
+        removed: Ids des sections à retirer ($pull)
+        added: Nouvelles sections à ajouter en fin de liste ($push)
+    """
+
+    def __init__(self):
+        self.set: Dict[str, Any] = {}
+        self.unset: Dict[str, str] = {}
+        self.array_filters: List[Dict[str, str]] = []
+        self.targeted: List[str] = []
+        self.removed: List[str] = []
+        self.added: List[Dict[str, Any]] = []
+        self._identifiers: Dict[str, str] = {}
+        # Sections ajoutées ou remplacées : les opérations suivantes les modifient en mémoire
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._new_ids: List[str] = []
+
+    @property
+    def updates_sections(self) -> bool:
+        """True si des champs de sections existantes sont modifiés (conflit avec $pull/$push)"""
+        return any(key.startswith("sections.") for key in (*self.set, *self.unset))
+
+    @property
+    def needs_pipeline(self) -> bool:
+        """True si modifications, suppressions et ajouts de sections se combinent"""
+        return sum((self.updates_sections, bool(self.removed), bool(self.added))) > 1
+
+    @property
+    def page_set(self) -> Dict[str, Any]:
+        """Champs de la page (hors sections) à $set"""
+        return {key: value for key, value in self.set.items() if not key.startswith("sections.")}
+
+    def sections_expression(self) -> Dict[str, Any]:
+        """
+        Nouveau tableau sections en expression d'agrégation
+
+        Applique dans l'ordre les $set/$unset sur sections.$[sN], le $pull et
+        le $push du plan, pour une mise à jour par pipeline.
+        """
+        section_ids = {identifier: section_id for section_id, identifier in self._identifiers.items()}
+        changes: Dict[str, Any] = {}
+        for key, value in [*self.set.items(), *((key, _REMOVE) for key in self.unset)]:
+            if not key.startswith("sections.$["):
+                continue
+            identifier, _, path = key[len("sections.$["):].partition("]")
+            section_id = section_ids[identifier]
+            if not path:
+                # Section remplacée entière : finalize() a exclu toute autre clé sur elle
+                changes[section_id] = _Value(value)
+                continue
+            tree = changes.setdefault(section_id, {})
+            tokens = path[1:].split(".")
+            for token in tokens[:-1]:
+                tree = tree.setdefault(token, {})
+            tree[tokens[-1]] = value if value is _REMOVE else _Value(value)
+
+        sections: Dict[str, Any] = {"$ifNull": ["$sections", []]}
+        if changes:
+            sections = {"$map": {"input": sections, "as": "section", "in": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": ["$$section.id", {"$literal": section_id}]}, "then": _changed("$$section", change)}
+                    for section_id, change in changes.items()
+                ],
+                "default": "$$section",
+            }}}}
+        if self.removed:
+            sections = {"$filter": {
+                "input": sections,
+                "as": "section",
+                "cond": {"$not": [{"$in": ["$$section.id", {"$literal": self.removed}]}]},
+            }}
+        if self.added:
+            sections = {"$concatArrays": [sections, {"$literal": self.added}]}
+        return sections
+
+    def _identifier(self, section_id: str) -> str:
+        if section_id not in self._identifiers:
+            self._identifiers[section_id] = f"s{len(self._identifiers)}"
+            self.targeted.append(section_id)
+        return self._identifiers[section_id]
+
+    def _drop_section_keys(self, section_id: str) -> None:
+        identifier = self._identifiers.get(section_id)
+        if identifier is None:
+            return
+        prefix = f"sections.$[{identifier}]"
+        for updates in (self.set, self.unset):
+            for key in [key for key in updates if key == prefix or key.startswith(prefix + ".")]:
+                del updates[key]
+
+    def apply(self, operation: PagePatchOperation) -> None:
+        tokens = parse_pointer(operation.path)
+
+        if tokens[0] in PAGE_FIELDS and len(tokens) == 1:
+            self._apply_page_field(operation, tokens[0])
+        elif tokens[0] == "sections" and len(tokens) == 2 and tokens[1] == "-":
+            self._add_section(operation)
+        elif tokens[0] == "sections" and len(tokens) == 2:
+            self._apply_section(operation, tokens[1])
+        elif tokens[0] == "sections" and len(tokens) > 2:
+            self._apply_section_field(operation, tokens[1], tokens[2:])
+        elif tokens == ["sections"]:
+            raise ValueError("Remplacer toutes les sections : utiliser PUT")
+        else:
+            raise ValueError(f"Chemin non supporté: {operation.path}")
+
+    def _apply_page_field(self, operation: PagePatchOperation, field: str) -> None:
+        if operation.op == "remove":
+            if field not in NULLABLE_PAGE_FIELDS:
+                raise ValueError(f"Champ obligatoire: {operation.path}")
+            self.set[field] = None
+        else:
+            self.set[field] = _validate(PAGE_FIELDS[field], operation.value, operation.path)
+
+    def _add_section(self, operation: PagePatchOperation) -> None:
+        if operation.op != "add":
+            raise ValueError("/sections/- n'accepte que add")
+        section = _validate(SECTION_ADAPTER, operation.value, operation.path).model_dump()
+        section_id = section["id"]
+        if section_id in self._pending or section_id in self._identifiers or section_id in self.removed:
+            raise ValueError(f"Section {section_id} déjà visée par ce patch")
+        self._pending[section_id] = section
+        self._new_ids.append(section_id)
+
+    def _check_not_removed(self, section_id: str) -> None:
+        if section_id in self.removed:
+            raise ValueError(f"Section {section_id} supprimée par ce patch")
+
+    def _apply_section(self, operation: PagePatchOperation, section_id: str) -> None:
+        self._check_not_removed(section_id)
+
+        if operation.op == "remove":
+            if section_id in self._new_ids:
+                # Ajoutée puis retirée dans le même patch : rien à écrire
+                self._new_ids.remove(section_id)
+                del self._pending[section_id]
+                return
+            self._drop_section_keys(section_id)
+            self._pending.pop(section_id, None)
+            self._identifier(section_id)
+            self.removed.append(section_id)
+            return
+
+        if operation.op != "replace":
+            raise ValueError("Ajouter une section : add sur /sections/-")
+        section = _validate(SECTION_ADAPTER, operation.value, operation.path).model_dump()
+        if section["id"] != section_id:
+            raise ValueError(f"L'id de la section ne peut pas changer ({section_id})")
+        if section_id not in self._new_ids:
+            # Les modifications précédentes de la section sont remplacées
+            self._drop_section_keys(section_id)
+            self._identifier(section_id)
+        self._pending[section_id] = section
+
+    def _apply_section_field(self, operation: PagePatchOperation, section_id: str, tokens: List[str]) -> None:
+        self._check_not_removed(section_id)
+        field = tokens[0]
+        if field not in SECTION_FIELDS:
+            raise ValueError(f"Champ de section non modifiable: {operation.path}")
+        if len(tokens) > 1 and field != "settings":
+            raise ValueError(f"Chemin non supporté: {operation.path}")
+        if len(tokens) == 1:
+            if operation.op == "remove":
+                raise ValueError(f"Champ obligatoire: {operation.path}")
+            value = _validate(SECTION_FIELDS[field], operation.value, operation.path)
+        else:
+            value = operation.value
+
+        pending = self._pending.get(section_id)
+        if pending is not None:
+            _apply_in_memory(pending, tokens, operation.op, value, operation.path)
+            return
+
+        key = ".".join([f"sections.$[{self._identifier(section_id)}]", *map(_mongo_key, tokens)])
+        if operation.op == "remove":
+            self.set.pop(key, None)
+            self.unset[key] = ""
+        else:
+            self.unset.pop(key, None)
+            self.set[key] = value
+
+    def finalize(self) -> "PagePatchPlan":
+        """Écrit les sections remplacées ou ajoutées, vérifie les chemins et les arrayFilters"""
+        for section_id, section in self._pending.items():
+            if section_id in self._new_ids:
+                continue
+            self.set[f"sections.$[{self._identifiers[section_id]}]"] = section
+        self.added = [self._pending[section_id] for section_id in self._new_ids]
+
+        keys = sorted((*self.set, *self.unset))
+        for before, after in zip(keys, keys[1:]):
+            if after.startswith(before + "."):
+                raise ValueError(f"Chemins en conflit: {before} et {after}")
+
+        used = {key.split("]", 1)[0] + "]" for key in keys if key.startswith("sections.$[")}
+        self.array_filters = [
+            {f"{identifier}.id": section_id}
+            for section_id, identifier in self._identifiers.items()
+            if f"sections.$[{identifier}]" in used
+        ]
+        return self
+
+
+def _apply_in_memory(section: Dict[str, Any], tokens: List[str], op: str, value: Any, path: str) -> None:
+    """Applique une opération à une section pas encore écrite en base"""
+    if len(tokens) == 1:
+        section[tokens[0]] = value
+        return
+
+    parent = section
+    for token in tokens[:-1]:
+        parent = parent.get(token) if isinstance(parent, dict) else None
+        if not isinstance(parent, dict):
+            raise ValueError(f"Chemin inexistant: {path}")
+    last = _mongo_key(tokens[-1])
+    if op == "remove":
+        if last not in parent:
+            raise ValueError(f"Chemin inexistant: {path}")
+        del parent[last]
+    else:
+        parent[last] = value
+
+
+class _Value:
+    """Valeur posée par $set (distingue une valeur dict d'un sous-arbre de modifications)"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+# Clé retirée par $unset
+_REMOVE = object()
+
+
+def _changed(value: Any, change: Any, depth: int = 0) -> Any:
+    """
+    Expression de value après application de change
+
+    change est un _Value, ou un arbre {clé: _Value | _REMOVE | sous-arbre}.
+    Comme $set/$unset : les objets intermédiaires absents sont créés (pas par
+    un $unset seul), une clé numérique sur un tableau vise l'élément (complété
+    par des null), $unset d'un élément de tableau le met à null.
+    """
+    if isinstance(change, _Value):
+        return {"$literal": change.value}
+
+    current = f"$$v{depth}"
+    merged, removed = {}, []
+    for key, child in change.items():
+        if child is _REMOVE:
+            removed.append(key)
+        else:
+            merged[key] = _changed(f"{current}.{key}", child, depth + 1)
+    as_object = {"$ifNull": [current, {}]}
+    if merged:
+        as_object = {"$mergeObjects": [as_object, merged]}
+    if removed:
+        as_object = {"$arrayToObject": {"$filter": {
+            "input": {"$objectToArray": as_object},
+            "as": "field",
+            "cond": {"$not": [{"$in": ["$$field.k", {"$literal": removed}]}]},
+        }}}
+
+    indexes = {int(key): child for key, child in change.items() if key.isdigit()}
+    if len(indexes) == len(change):
+        position = f"$$i{depth}"
+        extent = max((index + 1 for index, child in indexes.items() if _has_set(child)), default=0)
+        as_array = {"$map": {
+            "input": {"$range": [0, {"$max": [{"$size": current}, extent]}]},
+            "as": f"i{depth}",
+            "in": {"$switch": {
+                "branches": [
+                    {
+                        "case": {"$eq": [position, index]},
+                        "then": None if child is _REMOVE else _changed({"$arrayElemAt": [current, index]}, child, depth + 1),
+                    }
+                    for index, child in sorted(indexes.items())
+                ],
+                "default": {"$ifNull": [{"$arrayElemAt": [current, position]}, None]},
+            }},
+        }}
+        body = {"$cond": [{"$isArray": current}, as_array, as_object]}
+    else:
+        body = as_object
+    if not _has_set(change):
+        # $unset seul : une valeur absente ou null reste telle quelle
+        body = {"$cond": [{"$in": [{"$type": current}, ["missing", "null"]]}, current, body]}
+    return {"$let": {"vars": {f"v{depth}": value}, "in": body}}
+
+
+def _has_set(change: Any) -> bool:
+    if isinstance(change, _Value):
+        return True
+    return change is not _REMOVE and any(_has_set(child) for child in change.values())
+
+
+def build_patch_plan(operations: List[PagePatchOperation]) -> PagePatchPlan:
+    """
+    Applique les opérations dans l'ordre et retourne les mises à jour à écrire
+
+    Raises:
+        ValueError: Si une opération est invalide ou non supportée (message avec son index)
+    """
+    plan = PagePatchPlan()
+    for index, operation in enumerate(operations):
+        try:
+            plan.apply(operation)
+        except ValueError as e:
+            raise ValueError(f"Opération {index}: {e}")
+    return plan.finalize()
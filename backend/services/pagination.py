@@ -0,0 +1,133 @@
+"""Pagination par curseur (keyset), projection de champs et streaming NDJSON"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING
+
+from responses import dumps
+
+SortSpec = List[Tuple[str, int]]
+
+
+class InvalidCursor(ValueError):
+    """Curseur de pagination illisible ou incompatible avec le tri"""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_cursor(document: Dict[str, Any], sort: SortSpec) -> str:
+    """Curseur opaque : valeurs des clés de tri du dernier document de la page"""
+    values = [_encode_value(document.get(field)) for field, _ in sort]
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: SortSpec) -> List[Any]:
+    """Valeurs des clés de tri contenues dans le curseur"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("Curseur invalide") from e
+
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidCursor("Curseur invalide")
+    return [_decode_value(value) for value in values]
+
+
+def keyset_filter(sort: SortSpec, values: List[Any]) -> Dict[str, Any]:
+    """
+    Filtre "après ce curseur" pour un tri composé
+
+    Pour un tri (a desc, b desc) : a < va OU (a == va ET b < vb).
+    La dernière clé de tri doit être unique (ex: id) pour un ordre total.
+    """
+    clauses = []
+    for position, (field, direction) in enumerate(sort):
+        clause = {prev_field: values[i] for i, (prev_field, _) in enumerate(sort[:position])}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": values[position]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def parse_fields(
+    fields: Optional[str],
+    allowed: Iterable[str],
+    always: Iterable[str] = ()
+) -> Optional[Dict[str, int]]:
+    """
+    Projection MongoDB à partir d'une liste "a,b,c" demandée par le client
+
+    Les champs inconnus sont refusés ; les champs de always (clés de tri) sont
+    toujours inclus pour pouvoir construire le curseur suivant.
+
+    Returns:
+        La projection, ou None si aucun champ n'est demandé (document complet)
+    """
+    if not fields:
+        return None
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = set(requested) - set(allowed)
+    if unknown:
+        raise ValueError(f"Champs inconnus: {', '.join(sorted(unknown))}")
+
+    projection = {"_id": 0}
+    for field in (*requested, *always):
+        projection[field] = 1
+    return projection
+
+
+async def fetch_page(
+    collection,
+    filter: Dict[str, Any],
+    sort: SortSpec,
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, int]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Lit une page de documents après le curseur
+
+    Lit limit + 1 documents pour savoir s'il existe une page suivante sans
+    requête de comptage.
+
+    Returns:
+        (documents, curseur de la page suivante ou None)
+    """
+    query = dict(filter)
+    if cursor:
+        query = {"$and": [filter, keyset_filter(sort, decode_cursor(cursor, sort))]}
+
+    documents = await collection.find(query, projection or {"_id": 0}).sort(sort).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1], sort)
+    return documents, next_cursor
+
+
+async def stream_ndjson(
+    collection,
+    filter: Dict[str, Any],
+    sort: SortSpec,
+    projection: Optional[Dict[str, int]] = None,
+    batch_size: int = 200
+) -> AsyncIterator[bytes]:
+    """Streame les documents en NDJSON au fil de la lecture du curseur MongoDB"""
+    cursor = collection.find(filter, projection or {"_id": 0}).sort(sort).batch_size(batch_size)
+    async for document in cursor:
+        yield dumps(document) + b"\n"
@@ -0,0 +1,808 @@
+"""
+Recherche de produits : index inversé en mémoire, par boutique
+
+L'index d'une boutique est construit à la première recherche (une requête
+sur store_id), puis tenu à jour :
+- par les écritures de produits du worker courant (routes /api/products)
+- entre workers, par le change stream de la collection products
+- sans change stream, par une reconstruction en arrière-plan après
+  PRODUCT_SEARCH_TTL_SECONDS (l'index précédent reste servi entre-temps)
+
+Une recherche ne touche pas MongoDB : intersections d'ensembles d'entiers
+pour le texte et les filtres, comptages pour les facettes, liste triée des
+termes pour la recherche par préfixe (typeahead).
+
+Texte : minuscules sans accents, découpé sur tout ce qui n'est ni lettre ni
+chiffre. Chaque terme d'une requête doit être présent (ET) ; le dernier est
+un préfixe pour le typeahead. Score : poids du champ (nom > tags >
+catégorie > variantes, description) pondéré par la rareté du terme.
+"""
+import asyncio
+import bisect
+import heapq
+import logging
+import math
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from datetime import datetime
+from itertools import chain
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config import settings
+from services.document_cache import ChangeStreamInvalidator
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Champs lus pour l'index (ni les images suivantes ni les stocks)
+SEARCH_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "store_id": 1,
+    "name": 1,
+    "description": 1,
+    "category": 1,
+    "tags": 1,
+    "price": 1,
+    "compare_at_price": 1,
+    "variants.name": 1,
+    "variants.sku": 1,
+    "images": {"$slice": 1},
+    "is_active": 1,
+    "version": 1,
+    "created_at": 1,
+}
+
+FIELD_WEIGHTS = {"name": 4.0, "tags": 3.0, "category": 2.0, "variants": 1.5, "description": 1.0}
+MAX_FIELD_WEIGHT = max(FIELD_WEIGHTS.values())
+
+STOPWORDS = frozenset({
+    "a", "au", "aux", "avec", "d", "de", "des", "du", "en", "et", "l", "la", "le", "les",
+    "ou", "par", "pour", "sur", "un", "une", "the", "and", "of", "for", "with",
+})
+
+# Termes complétés au plus pour un préfixe (les plus fréquents)
+PREFIX_MAX_EXPANSIONS = 50
+TOP_TAGS = 20
+# Combinaisons de filtres dont les facettes sont mémorisées, par boutique
+FACET_CACHE_SIZE = 256
+
+_TOKEN = re.compile(r"[^\W_]+")
+_EPOCH = datetime(1970, 1, 1)
+
+
+def normalize(text: Optional[str]) -> List[str]:
+    """Termes d'un texte : minuscules, sans accents"""
+    if not text:
+        return []
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return _TOKEN.findall("".join(char for char in decomposed if not unicodedata.combining(char)))
+
+
+def query_terms(query: Optional[str], prefix: bool = False) -> List[str]:
+    """Termes d'une requête, sans mots vides (sauf le dernier en mode préfixe, en cours de frappe)"""
+    tokens = normalize(query)
+    last = tokens[-1:] if prefix else []
+    terms = [token for token in (tokens[:-1] if prefix else tokens) if token not in STOPWORDS]
+    return list(dict.fromkeys(terms + last))
+
+
+def parse_price_buckets(value: str) -> Tuple[float, ...]:
+    """Bornes des tranches de prix : "5000,10000" -> (5000.0, 10000.0)"""
+    return tuple(sorted(float(part) for part in value.split(",") if part.strip()))
+
+
+def _product_terms(product: Dict[str, Any]) -> Dict[str, float]:
+    # Poids d'un terme : celui du meilleur champ où il apparaît
+    fields = {
+        "name": [product.get("name")],
+        "tags": product.get("tags") or [],
+        "category": [product.get("category")],
+        "variants": [
+            value
+            for variant in product.get("variants") or []
+            for value in (variant.get("name"), variant.get("sku"))
+        ],
+        "description": [product.get("description")],
+    }
+    terms = {}
+    for field, values in fields.items():
+        weight = FIELD_WEIGHTS[field]
+        for value in values:
+            for term in normalize(value):
+                if terms.get(term, 0) < weight:
+                    terms[term] = weight
+    return terms
+
+
+class _Entry:
+    """Produit indexé : champs renvoyés dans les résultats et termes (pour le retirer)"""
+
+    __slots__ = (
+        "number", "id", "name", "price", "compare_at_price", "category", "tags",
+        "image", "is_active", "version", "created_at", "age", "terms",
+    )
+
+    def __init__(self, number: int, product: Dict[str, Any]):
+        images = product.get("images") or []
+        self.number = number
+        self.id = product["id"]
+        self.name = product.get("name") or ""
+        self.price = float(product.get("price") or 0)
+        self.compare_at_price = product.get("compare_at_price")
+        self.category = product.get("category")
+        self.tags = tuple(dict.fromkeys(product.get("tags") or []))
+        self.image = images[0].get("url") if images else None
+        self.is_active = product.get("is_active", True)
+        self.version = product.get("version", 0)
+        self.created_at = product.get("created_at") or _EPOCH
+        # Clé du tri newest : plus récent d'abord
+        self.age = -(self.created_at - _EPOCH).total_seconds()
+        self.terms = _product_terms(product)
+
+    def hit(self, score: Optional[float]) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "price": self.price,
+            "compare_at_price": self.compare_at_price,
+            "category": self.category,
+            "tags": list(self.tags),
+            "image": self.image,
+            "is_active": self.is_active,
+            "score": round(score, 4) if score is not None else None,
+        }
+
+
+class StoreIndex:
+    """
+    Index inversé des produits d'une boutique
+
+    Chaque produit reçoit un numéro interne ; termes, catégories, tags et
+    statut pointent vers des ensembles de numéros. Les ordres de tri (prix,
+    date, nom) et les tranches de prix sont calculés à la première demande
+    puis mis à jour par chaque écriture (insertion par dichotomie). Les
+    facettes sont mémorisées par combinaison de filtres jusqu'à l'écriture
+    suivante.
+    """
+
+    def __init__(self, store_id: str, price_buckets: Tuple[float, ...] = ()):
+        self.store_id = store_id
+        self.price_buckets = price_buckets
+        self.loaded_at = time.monotonic()
+        self._entries: Dict[int, _Entry] = {}
+        self._numbers: Dict[str, int] = {}
+        self._next_number = 0
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._categories: Dict[str, Set[int]] = {}
+        self._tags: Dict[str, Set[int]] = {}
+        self._active: Set[int] = set()
+        self._inactive: Set[int] = set()
+        self._all: Set[int] = set()
+        # Termes triés pour les préfixes, construits à la première recherche par préfixe
+        self._terms: Optional[List[str]] = None
+        self._orders: Dict[str, List[int]] = {}
+        self._price_buckets: Optional[List[Set[int]]] = None
+        self._facet_cache: Dict[Tuple, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self._numbers
+
+    @property
+    def term_count(self) -> int:
+        return len(self._postings)
+
+    # Écritures
+
+    def upsert(self, product: Dict[str, Any]) -> bool:
+        """
+        Indexe un produit (ou sa nouvelle version)
+
+        Returns:
+            False si cette version ou une plus récente est déjà indexée (événement en retard)
+        """
+        number = self._numbers.get(product["id"])
+        if number is not None:
+            if product.get("version", 0) <= self._entries[number].version:
+                return False
+            self._remove_number(number)
+
+        number = self._next_number
+        self._next_number += 1
+        entry = _Entry(number, product)
+        self._entries[number] = entry
+        self._numbers[entry.id] = number
+
+        for term, weight in entry.terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if self._terms is not None:
+                    bisect.insort(self._terms, term)
+            postings[number] = weight
+        if entry.category:
+            self._categories.setdefault(entry.category, set()).add(number)
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(number)
+        (self._active if entry.is_active else self._inactive).add(number)
+        self._all.add(number)
+
+        for sort, order in self._orders.items():
+            bisect.insort(order, number, key=self._number_key(sort))
+        if self._price_buckets is not None:
+            self._price_buckets[bisect.bisect_right(self.price_buckets, entry.price)].add(number)
+        self._facet_cache.clear()
+        return True
+
+    def remove(self, product_id: str) -> bool:
+        number = self._numbers.get(product_id)
+        if number is None:
+            return False
+        self._remove_number(number)
+        return True
+
+    def _remove_number(self, number: int) -> None:
+        entry = self._entries[number]
+        for sort, order in self._orders.items():
+            del order[bisect.bisect_left(order, self._sort_key(sort)(entry), key=self._number_key(sort))]
+        if self._price_buckets is not None:
+            self._price_buckets[bisect.bisect_right(self.price_buckets, entry.price)].discard(number)
+
+        del self._entries[number]
+        del self._numbers[entry.id]
+        for term in entry.terms:
+            postings = self._postings[term]
+            del postings[number]
+            if not postings:
+                del self._postings[term]
+                if self._terms is not None:
+                    del self._terms[bisect.bisect_left(self._terms, term)]
+        for groups, keys in ((self._categories, (entry.category,) if entry.category else ()), (self._tags, entry.tags)):
+            for key in keys:
+                members = groups[key]
+                members.discard(number)
+                if not members:
+                    del groups[key]
+        self._active.discard(number)
+        self._inactive.discard(number)
+        self._all.discard(number)
+        self._facet_cache.clear()
+
+    # Recherche texte
+
+    def _sorted_terms(self) -> List[str]:
+        if self._terms is None:
+            self._terms = sorted(self._postings)
+        return self._terms
+
+    def _expand(self, prefix: str) -> List[str]:
+        """Termes commençant par prefix, les plus fréquents d'abord"""
+        terms = self._sorted_terms()
+        start = bisect.bisect_left(terms, prefix)
+        end = bisect.bisect_left(terms, prefix + "\U0010ffff", start)
+        return heapq.nlargest(PREFIX_MAX_EXPANSIONS, terms[start:end], key=lambda term: len(self._postings[term]))
+
+    def _idf(self, term: str) -> float:
+        return math.log(1 + len(self._entries) / len(self._postings[term]))
+
+    def _text_match(self, terms: List[str], prefix: bool) -> Tuple[Set[int], List[Tuple[Dict[int, float], float]]]:
+        """
+        Numéros des produits contenant tous les termes, et (poids, idf) par terme
+
+        En mode préfixe, le dernier terme vaut pour tous ses compléments (poids
+        du meilleur complément, déjà multiplié par son idf).
+        """
+        weighted = []
+        for term in terms[:-1] if prefix else terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                return set(), []
+            weighted.append((postings, self._idf(term)))
+
+        weighted.sort(key=lambda item: len(item[0]))
+        matched = set(weighted[0][0]) if weighted else None
+        for postings, _ in weighted[1:]:
+            matched.intersection_update(postings.keys())
+            if not matched:
+                return set(), []
+
+        if prefix:
+            expansions = [(self._postings[term], self._idf(term)) for term in self._expand(terms[-1])]
+            expansion = {}
+            if matched is not None and len(matched) * len(expansions) < sum(len(postings) for postings, _ in expansions):
+                # Peu de candidats : tester chacun plutôt que fusionner les compléments
+                for number in matched:
+                    best = max((postings[number] * idf for postings, idf in expansions if number in postings), default=0)
+                    if best:
+                        expansion[number] = best
+            else:
+                for postings, idf in expansions:
+                    for number, weight in postings.items():
+                        score = weight * idf
+                        if expansion.get(number, 0) < score:
+                            expansion[number] = score
+            matched = set(expansion) if matched is None else matched.intersection(expansion.keys())
+            weighted.append((expansion, 1.0))
+
+        return matched, weighted
+
+    def _top_prefix(self, expanded: List[str], candidates: Set[int], count: int) -> List[Tuple[int, float]]:
+        """
+        Meilleurs produits pour un préfixe seul, sans fusionner tous les compléments
+
+        Les compléments sont parcourus du plus rare au plus fréquent (idf
+        décroissant). Dès que le meilleur score encore possible (poids
+        maximal × idf) passe sous le count-ième score obtenu, les suivants ne
+        peuvent plus entrer : même résultat que _text_match, à moindre coût.
+        """
+        expansions = sorted(
+            ((self._postings[term], self._idf(term)) for term in expanded),
+            key=lambda item: item[1],
+            reverse=True
+        )
+        best: Dict[int, float] = {}
+        best_score = 0.0
+        threshold = 0.0
+        for postings, idf in expansions:
+            bound = MAX_FIELD_WEIGHT * idf
+            if len(best) >= count and bound < best_score:
+                if bound >= threshold:
+                    threshold = heapq.nlargest(count, best.values())[-1]
+                if bound < threshold:
+                    break
+            for number, weight in postings.items():
+                score = weight * idf
+                if best.get(number, 0) < score and number in candidates:
+                    best[number] = score
+                    if score > best_score:
+                        best_score = score
+        top = heapq.nlargest(count, best, key=lambda number: (best[number], number))
+        return [(number, best[number]) for number in top]
+
+    # Tri
+
+    def _sort_key(self, sort: str):
+        if sort == "price_asc":
+            return lambda entry: (entry.price, entry.id)
+        if sort == "price_desc":
+            return lambda entry: (-entry.price, entry.id)
+        if sort == "name":
+            return lambda entry: (entry.name.casefold(), entry.id)
+        return lambda entry: (entry.age, entry.id)
+
+    def _number_key(self, sort: str):
+        key = self._sort_key(sort)
+        entries = self._entries
+        return lambda number: key(entries[number])
+
+    def _order(self, sort: str) -> List[int]:
+        order = self._orders.get(sort)
+        if order is None:
+            order = [entry.number for entry in sorted(self._entries.values(), key=self._sort_key(sort))]
+            self._orders[sort] = order
+        return order
+
+    def _page(
+        self,
+        results: Set[int],
+        sort: str,
+        count: int,
+        weighted: List[Tuple[Dict[int, float], float]]
+    ) -> List[Tuple[int, Optional[float]]]:
+        """Les count premiers résultats dans l'ordre demandé, avec leur score"""
+        if sort == "relevance" and weighted:
+            if len(weighted) == 1:
+                postings, idf = weighted[0]
+
+                def score(number):
+                    return postings[number] * idf
+            else:
+                def score(number):
+                    return sum(postings[number] * idf for postings, idf in weighted)
+            # À score égal, le produit indexé le plus récemment d'abord
+            top = heapq.nlargest(count, results, key=lambda number: (score(number), number))
+            return [(number, score(number)) for number in top]
+
+        if sort == "relevance":
+            sort = "newest"
+        if len(results) * 8 < len(self._entries):
+            top = heapq.nsmallest(count, results, key=self._number_key(sort))
+            return [(number, None) for number in top]
+
+        # Beaucoup de résultats : parcourir l'ordre précalculé
+        page = []
+        for number in self._order(sort):
+            if number in results:
+                page.append((number, None))
+                if len(page) == count:
+                    break
+        return page
+
+    # Filtres
+
+    def _narrow(self, numbers: Set[int], groups: List[Set[int]]) -> Set[int]:
+        """numbers restreint à chacun des ensembles (numbers n'est pas modifié)"""
+        if not groups:
+            return numbers
+        if numbers is self._all and len(groups) == 1:
+            return groups[0]
+        # Du plus petit ensemble au plus grand : chaque intersection parcourt le plus petit
+        sets = sorted(groups if numbers is self._all else [numbers, *groups], key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            if not result:
+                break
+            result &= other
+        return result
+
+    def _filter_price(self, numbers: Set[int], min_price: Optional[float], max_price: Optional[float]) -> Set[int]:
+        order = self._order("price_asc")
+        entries = self._entries
+
+        def price(number):
+            return entries[number].price
+
+        start = bisect.bisect_left(order, min_price, key=price) if min_price is not None else 0
+        end = bisect.bisect_right(order, max_price, key=price) if max_price is not None else len(order)
+        if numbers is self._all:
+            return set(order[start:end])
+        if len(numbers) < end - start:
+            low = -math.inf if min_price is None else min_price
+            high = math.inf if max_price is None else max_price
+            return {number for number in numbers if low <= entries[number].price <= high}
+        return numbers.intersection(order[start:end])
+
+    # Facettes
+
+    def _values(self, numbers: Set[int], attribute: str) -> Counter:
+        values = map(attrgetter(attribute), map(self._entries.__getitem__, numbers))
+        if attribute == "tags":
+            values = chain.from_iterable(values)
+        counts = Counter(values)
+        counts.pop(None, None)
+        return counts
+
+    def _missing(self, numbers: Set[int]) -> Optional[Set[int]]:
+        """Produits absents de numbers, si numbers en contient plus de la moitié (sinon None)"""
+        if numbers is self._all:
+            return set()
+        if numbers is self._active:
+            return self._inactive
+        if len(numbers) * 2 > len(self._all):
+            return self._all - numbers
+        return None
+
+    def _count(
+        self,
+        groups: Dict[str, Set[int]],
+        numbers: Set[int],
+        missing: Optional[Set[int]],
+        attribute: str
+    ) -> Counter:
+        """Nombre de produits de numbers par catégorie ou par tag"""
+        if missing is None:
+            return self._values(numbers, attribute)
+        # Plus de la moitié des produits : compter ceux qui manquent
+        counts = Counter({key: len(members) for key, members in groups.items()})
+        if missing:
+            counts.subtract(self._values(missing, attribute))
+        return +counts
+
+    def _price_bucket_sets(self) -> List[Set[int]]:
+        if self._price_buckets is None:
+            order = self._order("price_asc")
+            entries = self._entries
+            cuts = [
+                0,
+                *(bisect.bisect_left(order, bound, key=lambda number: entries[number].price) for bound in self.price_buckets),
+                len(order),
+            ]
+            self._price_buckets = [set(order[start:end]) for start, end in zip(cuts, cuts[1:])]
+        return self._price_buckets
+
+    def _price_facet(self, numbers: Set[int], missing: Optional[Set[int]]) -> List[Dict[str, Any]]:
+        bounds = (None, *self.price_buckets, None)
+        facet = []
+        for bucket, members in enumerate(self._price_bucket_sets()):
+            if missing is None:
+                count = len(members & numbers)
+            else:
+                count = len(members) - len(members & missing)
+            if count:
+                facet.append({"min": bounds[bucket], "max": bounds[bucket + 1], "count": count})
+        return facet
+
+    def _facets(
+        self,
+        results: Set[int],
+        without_category: Set[int],
+        without_price: Set[int]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Comptages par catégorie, tag et tranche de prix
+
+        Catégories et prix sont comptés sans leur propre filtre (les autres
+        choix restent visibles) ; les tags, cumulés en ET, sur les résultats.
+        """
+        # Un même ensemble sert souvent à plusieurs facettes : son complément est calculé une fois
+        complements = {}
+
+        def missing(numbers):
+            if id(numbers) not in complements:
+                complements[id(numbers)] = self._missing(numbers)
+            return complements[id(numbers)]
+
+        categories = self._count(self._categories, without_category, missing(without_category), "category")
+        tags = self._count(self._tags, results, missing(results), "tags")
+        return {
+            "categories": [{"value": value, "count": count} for value, count in categories.most_common()],
+            "tags": [{"value": value, "count": count} for value, count in tags.most_common(TOP_TAGS)],
+            "price_ranges": self._price_facet(without_price, missing(without_price)),
+        }
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        categories: Optional[List[str]] = None,
+        tags: Optional[List[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        is_active: Optional[bool] = None,
+        sort: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+        prefix: bool = False,
+        facets: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Recherche avec filtres et facettes
+
+        Args:
+            query: Texte recherché (vide : tous les produits)
+            categories: Catégories acceptées (OU)
+            tags: Tags requis (ET)
+            min_price, max_price: Bornes incluses sur le prix du produit
+            is_active: Filtre sur le statut (None : tous)
+            sort: relevance (défaut avec query), newest (défaut sans), price_asc, price_desc, name
+            prefix: Dernier terme de query traité comme un préfixe
+            facets: Calculer les facettes
+        """
+        terms = query_terms(query, prefix)
+        matched, weighted = self._text_match(terms, prefix) if terms else (self._all, [])
+        sort = sort or ("relevance" if terms else "newest")
+        priced = min_price is not None or max_price is not None
+
+        filters = []
+        if is_active is not None:
+            filters.append(self._active if is_active else self._inactive)
+        filters.extend(self._tags.get(tag, set()) for tag in tags or [])
+        base = self._narrow(matched, filters)
+        if categories:
+            category_filter = set()
+            for category in categories:
+                category_filter |= self._categories.get(category, set())
+            with_category = self._narrow(base, [category_filter])
+        else:
+            with_category = base
+        results = self._filter_price(with_category, min_price, max_price) if priced else with_category
+
+        page = self._page(results, sort, offset + limit, weighted)[offset:]
+        response = {
+            "total": len(results),
+            "products": [self._entries[number].hit(score) for number, score in page],
+        }
+
+        if facets:
+            key = (
+                tuple(terms), prefix, tuple(sorted(categories or ())), tuple(sorted(tags or ())),
+                min_price, max_price, is_active,
+            )
+            cached = self._facet_cache.get(key)
+            if cached is None:
+                without_category = results
+                if categories:
+                    without_category = self._filter_price(base, min_price, max_price) if priced else base
+                cached = self._facets(results, without_category, with_category)
+                if len(self._facet_cache) >= FACET_CACHE_SIZE:
+                    self._facet_cache.clear()
+                self._facet_cache[key] = cached
+            response["facets"] = cached
+        return response
+
+    def suggest(self, query: str, limit: int = 8) -> Dict[str, Any]:
+        """
+        Typeahead : compléments du dernier terme et meilleurs produits
+
+        Les compléments sont comptés parmi les produits actifs qui contiennent
+        aussi les termes précédents de la requête.
+        """
+        terms = query_terms(query, prefix=True)
+        if not terms:
+            return {"completions": [], "products": []}
+
+        candidates = self._active
+        if len(terms) > 1:
+            candidates, _ = self._text_match(terms[:-1], prefix=False)
+            candidates &= self._active
+        leading = " ".join(terms[:-1])
+        expanded = self._expand(terms[-1])
+
+        # Compléments par fréquence décroissante : la fréquence borne le nombre
+        # de candidats, on s'arrête quand elle passe sous le limit-ième compte
+        completions = []
+        counts = []
+        for term in expanded:
+            postings = self._postings[term]
+            if len(counts) == limit and len(postings) < counts[0]:
+                break
+            count = len(postings.keys() & candidates)
+            if count:
+                completions.append({"text": f"{leading} {term}".strip(), "count": count})
+                if len(counts) < limit:
+                    heapq.heappush(counts, count)
+                else:
+                    heapq.heappushpop(counts, count)
+        completions.sort(key=lambda completion: (-completion["count"], completion["text"]))
+
+        if len(terms) == 1:
+            products = [
+                self._entries[number].hit(score)
+                for number, score in self._top_prefix(expanded, candidates, limit)
+            ]
+        else:
+            products = self.search(query, is_active=True, limit=limit, prefix=True, facets=False)["products"]
+        return {"completions": completions[:limit], "products": products}
+
+
+class ProductSearch:
+    """
+    Index des boutiques récemment recherchées
+
+    Les index les moins récemment utilisés sont libérés au-delà de
+    max_products produits indexés au total.
+    """
+
+    def __init__(
+        self,
+        max_products: int = 500000,
+        ttl_seconds: float = 300,
+        price_buckets: Tuple[float, ...] = (),
+        enabled: bool = True
+    ):
+        self.enabled = enabled
+        self.max_products = max_products
+        self.ttl_seconds = ttl_seconds
+        self.price_buckets = price_buckets
+        self._indexes: "OrderedDict[str, StoreIndex]" = OrderedDict()
+        # Écritures reçues pendant un chargement, rejouées sur le nouvel index
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._refreshing: Set[str] = set()
+        # Incrémentée par clear() : un chargement commencé avant est abandonné
+        self._epoch = 0
+        self._inflight = SingleFlight()
+        self._stats = {"queries": 0, "loads": 0, "refreshes": 0, "updates": 0, "evictions": 0, "clears": 0}
+
+    async def get_index(self, collection, store_id: str) -> StoreIndex:
+        """
+        Index d'une boutique, chargé à la première demande
+
+        Un index plus vieux que ttl_seconds est reconstruit en arrière-plan ;
+        l'actuel est servi en attendant.
+        """
+        self._stats["queries"] += 1
+        index = self._indexes.get(store_id)
+        if index is None:
+            return await self._inflight.do(store_id, lambda: self._load(collection, store_id))
+
+        self._indexes.move_to_end(store_id)
+        if time.monotonic() - index.loaded_at > self.ttl_seconds and store_id not in self._refreshing:
+            self._refreshing.add(store_id)
+            asyncio.create_task(self._refresh(collection, store_id))
+        return index
+
+    async def _refresh(self, collection, store_id: str) -> None:
+        try:
+            await self._inflight.do(store_id, lambda: self._load(collection, store_id))
+            self._stats["refreshes"] += 1
+        except Exception as e:
+            logger.warning("Reconstruction de l'index de recherche de %s échouée: %s", store_id, e)
+        finally:
+            self._refreshing.discard(store_id)
+
+    async def _load(self, collection, store_id: str) -> StoreIndex:
+        epoch = self._epoch
+        self._pending[store_id] = []
+        try:
+            index = StoreIndex(store_id, self.price_buckets)
+            async for product in collection.find({"store_id": store_id}, SEARCH_PROJECTION):
+                index.upsert(product)
+            for product in self._pending[store_id]:
+                if product.get("store_id") == store_id:
+                    index.upsert(product)
+                else:
+                    index.remove(product["id"])
+        finally:
+            self._pending.pop(store_id, None)
+
+        self._stats["loads"] += 1
+        if epoch == self._epoch:
+            self._indexes[store_id] = index
+            self._indexes.move_to_end(store_id)
+            self._evict()
+        return index
+
+    def _evict(self) -> None:
+        total = sum(len(index) for index in self._indexes.values())
+        while total > self.max_products and len(self._indexes) > 1:
+            _, index = self._indexes.popitem(last=False)
+            total -= len(index)
+            self._stats["evictions"] += 1
+
+    def upsert(self, product: Dict[str, Any]) -> None:
+        """Répercute l'écriture d'un produit (document complet) sur les index chargés"""
+        store_id = product.get("store_id")
+        for pending_store, pending in self._pending.items():
+            if pending_store == store_id or product["id"] in self._indexes.get(pending_store, ()):
+                pending.append(product)
+        for index_store, index in self._indexes.items():
+            if index_store == store_id:
+                index.upsert(product)
+            else:
+                # Produit déplacé vers une autre boutique
+                index.remove(product["id"])
+        self._stats["updates"] += 1
+
+    async def refresh(self, collection, product_ids: List[str]) -> None:
+        """Relit des produits écrits sans retour du document (imports en lot) et les réindexe"""
+        if not product_ids or not (self._indexes or self._pending):
+            return
+        async for product in collection.find({"id": {"$in": product_ids}}, SEARCH_PROJECTION):
+            self.upsert(product)
+
+    def clear(self) -> None:
+        """Libère tous les index (rechargés à la demande)"""
+        self._epoch += 1
+        self._indexes.clear()
+        self._stats["clears"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "stores": len(self._indexes),
+            "products": sum(len(index) for index in self._indexes.values()),
+            "terms": sum(index.term_count for index in self._indexes.values()),
+            "max_products": self.max_products,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+class SearchIndexUpdater(ChangeStreamInvalidator):
+    """
+    Applique le change stream de products aux index chargés
+
+    Le document complet (updateLookup) est réindexé ; une suppression (sans
+    document) libère les index. Une coupure du flux les libère aussi.
+    """
+
+    def handle(self, collection: str, change: Dict[str, Any]) -> None:
+        document = change.get("fullDocument")
+        if document and document.get("id"):
+            self.cache.upsert(document)
+        else:
+            self.cache.clear()
+
+
+# Instance globale
+product_search = ProductSearch(
+    max_products=settings.product_search_max_products,
+    ttl_seconds=settings.product_search_ttl_seconds,
+    price_buckets=parse_price_buckets(settings.product_search_price_buckets),
+    enabled=settings.product_search_enabled
+)
@@ -0,0 +1,288 @@
+"""
+Registre des prompts de génération
+
+Chaque prompt est un gabarit nommé et versionné, compilé une seule fois à
+l'import (segments de texte et champs à remplacer). Le rendu se limite à une
+concaténation, et l'estimation des tokens ne demande même pas de rendre le
+prompt : la longueur du texte fixe est connue d'avance.
+
+Les variantes d'un même gabarit servent aux tests A/B : un sujet stable (la
+marque, le produit) reçoit toujours la même variante, ce qui garde le cache
+LLM efficace. La clé de cache d'un prompt rendu repose sur le nom, la version,
+la variante et une empreinte courte du texte du gabarit, plus les valeurs :
+un texte modifié sans changer de version ne resservira pas les anciennes
+réponses.
+"""
+import hashlib
+import string
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from services.metrics import PROMPT_RENDERS
+
+DEFAULT_VARIANT = "default"
+
+# Sections de boutique générées par défaut, dans l'ordre d'affichage
+SECTION_PROMPTS = ("hero", "features", "about", "cta")
+
+
+class RenderedPrompt(str):
+    """Texte d'un prompt rendu, accompagné de son gabarit et de sa clé de cache"""
+
+    def __new__(cls, text: str, template: "PromptTemplate", cache_id: str):
+        rendered = super().__new__(cls, text)
+        rendered.template = template
+        rendered.cache_id = cache_id
+        return rendered
+
+
+def prompt_cache_id(prompt: str) -> str:
+    """Identifiant à hasher pour le cache : stable pour un prompt du registre, sinon le texte"""
+    return getattr(prompt, "cache_id", prompt)
+
+
+class PromptTemplate:
+    """
+    Gabarit de prompt compilé
+
+    Le texte suit la syntaxe de str.format ({champ}, accolades doublées pour
+    le JSON). Seuls des noms de champs simples sont acceptés.
+
+    Args:
+        name: Nom du prompt (hero, product, repair...)
+        version: Version du texte (métriques, A/B), à incrémenter à chaque modification
+        text: Texte du gabarit
+        variant: Nom de la variante A/B
+        weight: Part du trafic de la variante quand les tests A/B sont activés
+        max_output_tokens: Taille de sortie attendue, utilisée par les budgets de tokens
+    """
+
+    def __init__(
+        self,
+        name: str,
+        version: int,
+        text: str,
+        variant: str = DEFAULT_VARIANT,
+        weight: float = 1.0,
+        max_output_tokens: Optional[int] = None
+    ):
+        self.name = name
+        self.version = version
+        self.variant = variant
+        self.weight = weight
+        self.max_output_tokens = max_output_tokens
+        self.key = f"{name}@v{version}/{variant}"
+        # Empreinte du texte : la clé de cache suit le texte réel, même sans nouvelle version
+        self.digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        self._segments, self.fields = self._compile(text)
+        self._static_chars = sum(len(literal) for literal, _ in self._segments)
+        self._labels = (name, str(version), variant)
+
+    def _compile(self, text: str) -> Tuple[List[Tuple[str, Optional[str]]], Tuple[str, ...]]:
+        segments = []
+        fields = []
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if field is not None:
+                if not field.isidentifier() or spec or conversion:
+                    raise ValueError(f"Champ non supporté dans le prompt {self.key}: {{{field}}}")
+                if field not in fields:
+                    fields.append(field)
+            segments.append((literal, field))
+        return segments, tuple(fields)
+
+    def render(self, **values: Any) -> RenderedPrompt:
+        """
+        Rend le prompt
+
+        Les valeurs en trop sont ignorées : un même contexte peut servir à
+        toutes les sections.
+
+        Raises:
+            KeyError: Si un champ du gabarit n'a pas de valeur
+        """
+        values = {field: str(values[field]) for field in self.fields}
+        parts = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(values[field])
+        PROMPT_RENDERS.inc(*self._labels)
+        cache_id = "\x00".join((f"{self.key}#{self.digest}", *(values[field] for field in self.fields)))
+        return RenderedPrompt("".join(parts), self, cache_id)
+
+    def estimate_tokens(self, **values: Any) -> int:
+        """Tokens du prompt rendu (~4 caractères par token), sans le rendre"""
+        chars = self._static_chars
+        lengths = {field: len(str(values[field])) for field in self.fields}
+        for _, field in self._segments:
+            if field is not None:
+                chars += lengths[field]
+        return max(1, chars // 4)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "digest": self.digest,
+            "fields": list(self.fields),
+            "weight": self.weight,
+            "static_tokens": max(1, self._static_chars // 4),
+            "max_output_tokens": self.max_output_tokens,
+        }
+
+
+class PromptRegistry:
+    """Gabarits par nom, avec leurs variantes A/B"""
+
+    def __init__(self):
+        self._templates: Dict[str, List[PromptTemplate]] = {}
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        variants = self._templates.setdefault(template.name, [])
+        if any(existing.variant == template.variant for existing in variants):
+            raise ValueError(f"Prompt déjà enregistré: {template.key}")
+        variants.append(template)
+        return template
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+    def get(self, name: str, variant: str = DEFAULT_VARIANT) -> PromptTemplate:
+        """
+        Raises:
+            KeyError: Si le prompt ou la variante n'existe pas
+        """
+        for template in self._templates[name]:
+            if template.variant == variant:
+                return template
+        raise KeyError(f"{name}/{variant}")
+
+    def select(self, name: str, subject: str = "") -> PromptTemplate:
+        """
+        Choisit la variante d'un prompt pour un sujet
+
+        Sans tests A/B, la variante par défaut est toujours retournée. Sinon
+        le hash de (nom, sujet) répartit les sujets selon les poids des
+        variantes, de façon déterministe.
+
+        Raises:
+            KeyError: Si le prompt n'existe pas
+        """
+        variants = self._templates[name]
+        if len(variants) == 1 or not settings.ai_prompt_ab_enabled:
+            return self.get(name)
+
+        total = sum(template.weight for template in variants)
+        digest = hashlib.sha256(f"{name}\x00{subject}".encode("utf-8")).digest()
+        point = int.from_bytes(digest[:8], "big") / 2 ** 64 * total
+        for template in variants:
+            point -= template.weight
+            if point < 0:
+                return template
+        return variants[-1]
+
+    def describe(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            name: [template.describe() for template in variants]
+            for name, variants in self._templates.items()
+        }
+
+
+# Instance globale
+prompt_registry = PromptRegistry()
+
+prompt_registry.register(PromptTemplate("hero", 1, """
+Crée un contenu de section Hero pour une boutique e-commerce {business_type} nommée "{brand_name}".
+Public cible: {target_audience}
+
+Réponds UNIQUEMENT avec un objet JSON structuré comme ceci:
+{{
+  "heading": "Titre principal accrocheur (max 10 mots)",
+  "subheading": "Sous-titre descriptif (max 20 mots)",
+  "cta_primary": "Texte bouton principal",
+  "cta_secondary": "Texte bouton secondaire"
+}}
+
+Pas de texte supplémentaire, juste le JSON.
+""", max_output_tokens=200))
+
+# Variante B : accroche centrée sur le bénéfice client
+prompt_registry.register(PromptTemplate("hero", 1, """
+Crée un contenu de section Hero pour une boutique e-commerce {business_type} nommée "{brand_name}".
+Public cible: {target_audience}
+Le titre met en avant le principal bénéfice pour le client, pas le nom de la marque.
+
+Réponds UNIQUEMENT avec un objet JSON structuré comme ceci:
+{{
+  "heading": "Bénéfice principal (max 10 mots)",
+  "subheading": "Sous-titre descriptif (max 20 mots)",
+  "cta_primary": "Texte bouton principal",
+  "cta_secondary": "Texte bouton secondaire"
+}}
+
+Pas de texte supplémentaire, juste le JSON.
+""", variant="benefice", weight=1.0, max_output_tokens=200))
+
+prompt_registry.register(PromptTemplate("features", 1, """
+Crée 4 fonctionnalités/avantages clés pour une boutique e-commerce {business_type} en Afrique.
+Nom de la marque: {brand_name}
+
+Réponds UNIQUEMENT avec un objet JSON:
+{{
+  "heading": "Titre de la section",
+  "subheading": "Sous-titre",
+  "features": [
+    {{
+      "title": "Titre de la fonctionnalité",
+      "description": "Description courte",
+      "icon": "truck|shield|support|award"
+    }}
+  ]
+}}
+""", max_output_tokens=400))
+
+prompt_registry.register(PromptTemplate("about", 1, """
+Crée une section "À Propos" engageante pour {brand_name}, une entreprise {business_type} en Afrique.
+
+Réponds UNIQUEMENT avec un objet JSON:
+{{
+  "heading": "Titre",
+  "paragraphs": ["paragraphe 1", "paragraphe 2", "paragraphe 3"]
+}}
+""", max_output_tokens=500))
+
+prompt_registry.register(PromptTemplate("cta", 1, """
+Crée une section Call-to-Action finale pour {brand_name}.
+
+Réponds UNIQUEMENT avec un objet JSON:
+{{
+  "heading": "Titre motivant",
+  "text": "Texte persuasif",
+  "button_text": "Texte du bouton"
+}}
+""", max_output_tokens=150))
+
+prompt_registry.register(PromptTemplate("product", 1, """
+Crée une description de produit e-commerce professionnelle pour:
+
+Nom: {product_name}
+Catégorie: {category}
+Caractéristiques:
+{features}
+
+Réponds UNIQUEMENT avec un objet JSON:
+{{
+  "title": "Titre produit optimisé SEO",
+  "short_description": "Description courte accrocheuse (1-2 phrases)",
+  "long_description": "Description détaillée (3-4 paragraphes)",
+  "seo_keywords": ["mot-clé1", "mot-clé2", "mot-clé3"]
+}}
+""", max_output_tokens=700))
+
+prompt_registry.register(PromptTemplate("repair", 1, """
+La réponse suivante devait être un objet JSON pour la section "{section}" mais elle est invalide ({error}).
+{schema_line}
+Réponse à corriger:
+{raw_content}
+
+Réponds UNIQUEMENT avec l'objet JSON corrigé, en conservant le contenu.
+"""))
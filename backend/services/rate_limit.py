@@ -0,0 +1,170 @@
+"""Limitation de débit par fenêtre glissante (mémoire ou MongoDB)"""
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+# (clé, limite, fenêtre en secondes, coût)
+Rule = Tuple[str, int, int, int]
+
+
+class RateLimitExceeded(Exception):
+    """Limite atteinte : réessayer après retry_after secondes"""
+
+    def __init__(self, key: str, limit: int, retry_after: int):
+        super().__init__(f"Limite atteinte pour {key}")
+        self.key = key
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+class MemoryRateLimitStore:
+    """Compteurs par fenêtre dans le process (un seul worker)"""
+
+    # Nombre de compteurs au-delà duquel les fenêtres expirées sont purgées
+    SWEEP_THRESHOLD = 10000
+
+    def __init__(self):
+        # (clé, fenêtre) -> [compte, fin de validité (fin de la fenêtre suivante)]
+        self._counts: Dict[Tuple[str, int], list] = {}
+        self._lock = asyncio.Lock()
+
+    def _sweep(self, now: float) -> None:
+        expired = [slot for slot, (_, expires_at) in self._counts.items() if expires_at <= now]
+        for slot in expired:
+            del self._counts[slot]
+
+    async def hit(self, key: str, window: int, cost: int, window_seconds: int) -> Tuple[int, int]:
+        async with self._lock:
+            if len(self._counts) > self.SWEEP_THRESHOLD:
+                self._sweep(time.time())
+            slot = self._counts.setdefault((key, window), [0, (window + 2) * window_seconds])
+            slot[0] += cost
+            previous = self._counts.get((key, window - 1), [0])[0]
+            return previous, slot[0]
+
+    async def refund(self, key: str, window: int, cost: int) -> None:
+        async with self._lock:
+            if (key, window) in self._counts:
+                self._counts[(key, window)][0] -= cost
+
+
+class MongoRateLimitStore:
+    """
+    Compteurs par fenêtre partagés entre workers
+
+    Un document par (clé, fenêtre), incrémenté atomiquement, supprimé par un
+    index TTL après la fin de la fenêtre suivante.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    async def hit(self, key: str, window: int, cost: int, window_seconds: int) -> Tuple[int, int]:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=2 * window_seconds)
+        current, previous = await asyncio.gather(
+            self._collection.find_one_and_update(
+                {"_id": f"{key}:{window}"},
+                {"$inc": {"count": cost}, "$setOnInsert": {"expires_at": expires_at}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            ),
+            self._collection.find_one({"_id": f"{key}:{window - 1}"})
+        )
+        return (previous or {}).get("count", 0), current["count"]
+
+    async def refund(self, key: str, window: int, cost: int) -> None:
+        await self._collection.update_one({"_id": f"{key}:{window}"}, {"$inc": {"count": -cost}})
+
+
+class RateLimiter:
+    """
+    Limiteur à fenêtre glissante (approximation à deux fenêtres fixes)
+
+    Le volume estimé est : précédente × part restante + courante. Il sert
+    aussi bien pour un nombre de requêtes que pour un budget de tokens LLM.
+    """
+
+    def __init__(self):
+        self.store = MemoryRateLimitStore()
+        self.rejected = 0
+
+    async def attach_collection(self, collection) -> None:
+        """Partage les compteurs entre workers via MongoDB (index TTL dans indexes.INDEXES)"""
+        self.store = MongoRateLimitStore(collection)
+
+    async def acquire(self, rules: List[Rule], now: Optional[float] = None) -> None:
+        """
+        Consomme le coût de chaque règle, ou aucune si l'une d'elles est dépassée
+
+        Raises:
+            RateLimitExceeded: Avec le délai d'attente le plus long des règles dépassées
+        """
+        now = time.time() if now is None else now
+        taken = []
+        exceeded: Optional[RateLimitExceeded] = None
+
+        for key, limit, window_seconds, cost in rules:
+            window = int(now // window_seconds)
+            elapsed = (now % window_seconds) / window_seconds
+            previous, current = await self.store.hit(key, window, cost, window_seconds)
+            taken.append((key, window, cost))
+
+            if previous * (1 - elapsed) + current > limit:
+                retry_after = _retry_after(limit, previous, current - cost, cost, elapsed, window_seconds)
+                if exceeded is None or retry_after > exceeded.retry_after:
+                    exceeded = RateLimitExceeded(key, limit, retry_after)
+
+        if exceeded is not None:
+            # Une requête refusée ne consomme rien
+            await asyncio.gather(*(self.store.refund(key, window, cost) for key, window, cost in taken))
+            self.rejected += 1
+            raise exceeded
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "backend": "mongo" if isinstance(self.store, MongoRateLimitStore) else "memory",
+            "rejected": self.rejected,
+        }
+
+
+def _retry_after(
+    limit: int,
+    previous: int,
+    current: int,
+    cost: int,
+    elapsed: float,
+    window_seconds: int
+) -> int:
+    """Secondes avant que la requête passe, si le trafic s'arrête entre-temps"""
+    if cost > limit:
+        return window_seconds
+
+    # Dans la fenêtre courante, le poids de la précédente décroît
+    room = limit - current - cost
+    if room >= 0 and previous > 0:
+        needed = 1 - room / previous
+        return max(1, _ceil((needed - elapsed) * window_seconds))
+
+    # Sinon, attendre la fenêtre suivante, où la courante devient la précédente
+    wait = (1 - elapsed) * window_seconds
+    if current > 0:
+        wait += max(0.0, 1 - (limit - cost) / current) * window_seconds
+    return max(1, _ceil(wait))
+
+
+def _ceil(seconds: float) -> int:
+    # Arrondi préalable : 40.00000000000001 s donne 40 et non 41
+    return math.ceil(round(seconds, 6))
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière du nombre de tokens (~4 caractères par token)"""
+    return max(1, len(text) // 4)
+
+
+# Instance globale
+rate_limiter = RateLimiter()
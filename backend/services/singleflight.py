@@ -0,0 +1,86 @@
+"""Coalescence des appels identiques en cours (single-flight)"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call:
+    """Appel partagé : la tâche amont et le nombre d'appelants qui l'attendent"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Regroupe les appels concurrents ayant la même clé sur une seule exécution
+
+    Le premier appelant démarre la tâche amont, les suivants attendent le même
+    résultat. Chaque appelant attend via asyncio.shield : l'annulation d'un
+    appelant (client déconnecté) ne touche pas les autres. La tâche amont n'est
+    annulée que lorsque plus personne ne l'attend.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._stats = {
+            "calls": 0,
+            "executions": 0,
+            "coalesced": 0,
+            "cancelled_waiters": 0,
+            "cancelled_executions": 0,
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Exécute fn() une seule fois pour tous les appelants concurrents de même clé
+
+        Args:
+            key: Clé d'identité de l'appel (ex: clé de cache du prompt)
+            fn: Fabrique de la coroutine à exécuter
+
+        Returns:
+            Le résultat partagé de fn()
+        """
+        self._stats["calls"] += 1
+
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self._stats["executions"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done():
+                self._stats["cancelled_waiters"] += 1
+            raise
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Plus aucun appelant : inutile de payer l'appel amont
+                call.task.cancel()
+                self._forget(key, call)
+                self._stats["cancelled_executions"] += 1
+                logger.info("Appel amont annulé, plus aucun appelant pour %s", key[:12])
+
+    def _forget(self, key: str, call: _Call) -> None:
+        """Retire l'appel de la table s'il y est toujours"""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Compteurs de coalescence"""
+        return {**self._stats, "in_flight": len(self._calls)}
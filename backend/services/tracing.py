@@ -0,0 +1,56 @@
+"""
+Spans OpenTelemetry optionnels
+
+Actifs seulement si OTEL_ENABLED=true et que le paquet opentelemetry-api est
+installé ; l'exporteur est configuré par l'environnement OpenTelemetry
+(opentelemetry-instrument, OTEL_EXPORTER_OTLP_ENDPOINT...). Sinon toutes
+les fonctions sont des no-op.
+"""
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from config import settings
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:  # dépendance optionnelle
+    trace = None
+
+_tracer = None
+
+
+def _get_tracer():
+    global _tracer
+    if not settings.otel_enabled or trace is None:
+        return None
+    if _tracer is None:
+        _tracer = trace.get_tracer("easyshop.backend")
+    return _tracer
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+    """Span courant autour d'un bloc (no-op si le tracing est désactivé)"""
+    tracer = _get_tracer()
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(name, attributes=attributes or {}) as current:
+        yield current
+
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """Démarre un span terminé plus tard par end_span (événements du driver MongoDB)"""
+    tracer = _get_tracer()
+    if tracer is None:
+        return None
+    return tracer.start_span(name, attributes=attributes or {})
+
+
+def end_span(current, error: Optional[str] = None) -> None:
+    if current is None:
+        return
+    if error:
+        current.set_status(Status(StatusCode.ERROR, error))
+    current.end()
@@ -0,0 +1,347 @@
+"""
+Historique des versions des boutiques et des pages
+
+Chaque écriture versionnée est enregistrée sous forme de delta par rapport à
+la version précédente, avec un snapshot complet toutes les
+VERSION_SNAPSHOT_INTERVAL versions. Reconstruire une version lit au plus un
+intervalle d'entrées (un snapshot et ses deltas) en une requête.
+
+La dernière version complète de chaque document est gardée à part (tête) :
+le delta se calcule sans relire l'historique. Une version arrivée dans le
+désordre ou dont la précédente manque est enregistrée en snapshot, si bien
+qu'un delta a toujours sa version de base juste avant lui.
+
+Élagage, à chaque snapshot périodique :
+- les VERSION_HISTORY_DETAILED_VERSIONS dernières versions gardent leurs deltas
+- plus anciennes, seuls les snapshots restent (compaction)
+- au-delà de VERSION_HISTORY_MAX_VERSIONS versions ou de
+  VERSION_HISTORY_MAX_AGE_DAYS jours, tout est supprimé
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+# Métadonnées non restaurées : identité, propriété, versioning, état de suppression
+RESTORE_EXCLUDED = {"_id", "id", "user_id", "store_id", "version", "created_at", "updated_at", "is_active"}
+
+
+def diff_documents(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, list]:
+    """
+    Delta de before vers after
+
+    Les chemins sont des listes de clés (str) et d'index (int). Les listes de
+    même longueur sont comparées élément par élément ; sinon seule la partie
+    entre le préfixe et le suffixe communs est remplacée (splice). Les valeurs
+    sont comparées avec leur type : 1, 1.0 et True diffèrent, comme en BSON.
+    """
+    delta = {"set": [], "unset": [], "splice": []}
+    _diff(before, after, [], delta)
+    return {op: changes for op, changes in delta.items() if changes}
+
+
+def _same(old: Any, new: Any) -> bool:
+    """Égalité de valeur et de type, récursive (1 == 1.0 == True pour Python, pas pour BSON)"""
+    if type(old) is not type(new):
+        return False
+    if isinstance(old, dict):
+        return old.keys() == new.keys() and all(_same(value, new[key]) for key, value in old.items())
+    if isinstance(old, list):
+        return len(old) == len(new) and all(map(_same, old, new))
+    return old == new
+
+
+def _diff(before: Dict[str, Any], after: Dict[str, Any], path: list, delta: Dict[str, list]) -> None:
+    for key, value in after.items():
+        if key not in before:
+            delta["set"].append([path + [key], value])
+        elif not _same(before[key], value):
+            _diff_value(before[key], value, path + [key], delta)
+    for key in before:
+        if key not in after:
+            delta["unset"].append(path + [key])
+
+
+def _diff_value(old: Any, new: Any, path: list, delta: Dict[str, list]) -> None:
+    if isinstance(old, dict) and isinstance(new, dict):
+        _diff(old, new, path, delta)
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            if not _same(old_item, new_item):
+                _diff_value(old_item, new_item, path + [index], delta)
+    elif isinstance(old, list) and isinstance(new, list):
+        prefix = 0
+        while prefix < min(len(old), len(new)) and _same(old[prefix], new[prefix]):
+            prefix += 1
+        suffix = 0
+        while (
+            suffix < min(len(old), len(new)) - prefix
+            and _same(old[len(old) - 1 - suffix], new[len(new) - 1 - suffix])
+        ):
+            suffix += 1
+        delta["splice"].append([path, prefix, len(old) - prefix - suffix, new[prefix:len(new) - suffix]])
+    else:
+        delta["set"].append([path, new])
+
+
+def _container(document: Any, path: list) -> Any:
+    for token in path[:-1]:
+        document = document[token]
+    return document
+
+
+def apply_delta(document: Dict[str, Any], delta: Dict[str, list]) -> Dict[str, Any]:
+    """Applique un delta de diff_documents (modifie document en place)"""
+    for path, value in delta.get("set", []):
+        _container(document, path)[path[-1]] = value
+    for path in delta.get("unset", []):
+        del _container(document, path)[path[-1]]
+    for path, start, deleted, items in delta.get("splice", []):
+        target = _container(document, path)[path[-1]]
+        target[start:start + deleted] = items
+    return document
+
+
+class VersionHistory:
+    """
+    Historique par document (collection, id)
+
+    Entrées : {collection, document_id, user_id, version, kind, data|delta, created_at}
+    Têtes : dernière version complète, {_id: "collection:id", version, data}
+    """
+
+    def __init__(
+        self,
+        snapshot_interval: int = 25,
+        detailed_versions: int = 100,
+        max_versions: int = 1000,
+        max_age_days: int = 90
+    ):
+        self.snapshot_interval = max(1, snapshot_interval)
+        self.detailed_versions = detailed_versions
+        self.max_versions = max_versions
+        self.max_age_days = max_age_days
+        self._collection = None
+        self._heads = None
+        self._stats = {"snapshots": 0, "deltas": 0, "out_of_order": 0, "failures": 0, "prunes": 0}
+
+    async def attach_collection(self, collection) -> None:
+        """
+        Active l'historique sur une collection MongoDB (têtes dans {nom}_heads)
+
+        Index dans indexes.INDEXES ; les têtes n'utilisent que _id.
+        """
+        self._collection = collection
+        self._heads = collection.database[f"{collection.name}_heads"]
+
+    @property
+    def enabled(self) -> bool:
+        return self._collection is not None
+
+    def _align(self, version: int) -> int:
+        # Version du snapshot périodique au plus tard à version
+        return version - version % self.snapshot_interval
+
+    async def record(self, collection, document: Dict[str, Any]) -> None:
+        """
+        Enregistre la version d'un document qui vient d'être écrit
+
+        Un échec est journalisé sans remonter : l'écriture principale a déjà
+        eu lieu. La version suivante sera alors un snapshot.
+
+        Args:
+            collection: Collection Motor du document
+            document: Document complet après écriture (avec id et version)
+        """
+        if self._collection is None:
+            return
+
+        name = collection.name
+        document_id = document["id"]
+        version = document.get("version", 0)
+        data = {key: value for key, value in document.items() if key != "_id"}
+        head_id = f"{name}:{document_id}"
+
+        try:
+            try:
+                previous = await self._heads.find_one_and_replace(
+                    {"_id": head_id, "version": {"$lt": version}},
+                    {"version": version, "data": data},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # Tête déjà à une version plus récente : écritures concurrentes arrivées dans le désordre
+                previous = None
+                self._stats["out_of_order"] += 1
+
+            entry = {
+                "_id": f"{head_id}:{version}",
+                "collection": name,
+                "document_id": document_id,
+                "user_id": document.get("user_id"),
+                "version": version,
+                "created_at": datetime.utcnow(),
+            }
+            periodic = version % self.snapshot_interval == 0
+            if previous is not None and previous.get("version") == version - 1 and not periodic:
+                entry["kind"] = DELTA
+                entry["delta"] = diff_documents(previous["data"], data)
+            else:
+                entry["kind"] = SNAPSHOT
+                entry["data"] = data
+
+            try:
+                await self._collection.insert_one(entry)
+            except DuplicateKeyError:
+                return
+            except PyMongoError:
+                # Sans cette entrée, la version suivante ne doit pas être un delta
+                await self._heads.delete_one({"_id": head_id, "version": version})
+                raise
+            self._stats["snapshots" if entry["kind"] == SNAPSHOT else "deltas"] += 1
+
+            if periodic:
+                await self.prune(name, document_id, version)
+        except PyMongoError as e:
+            self._stats["failures"] += 1
+            logger.warning("Version %s de %s/%s non enregistrée: %s", version, name, document_id, e)
+
+    async def record_latest(self, collection, document_id: str) -> None:
+        """Relit le document puis l'enregistre (écritures qui ne retournent pas le document complet)"""
+        if self._collection is None:
+            return
+        try:
+            document = await collection.find_one({"id": document_id}, {"_id": 0})
+        except PyMongoError as e:
+            logger.warning("Version de %s/%s non enregistrée: %s", collection.name, document_id, e)
+            return
+        if document is not None:
+            await self.record(collection, document)
+
+    async def prune(self, collection_name: str, document_id: str, latest: int) -> int:
+        """
+        Applique la politique de rétention à l'historique d'un document
+
+        Les bornes sont alignées sur les snapshots périodiques : chaque version
+        conservée reste reconstructible.
+
+        Returns:
+            Nombre d'entrées supprimées
+        """
+        base = {"collection": collection_name, "document_id": document_id}
+
+        oldest_kept = latest - self.max_versions + 1
+        if self.max_age_days:
+            recent = await self._collection.find_one(
+                {**base, "created_at": {"$gte": datetime.utcnow() - timedelta(days=self.max_age_days)}},
+                {"_id": 0, "version": 1},
+                sort=[("version", ASCENDING)]
+            )
+            oldest_kept = max(oldest_kept, recent["version"] if recent else latest)
+        detailed_from = latest - self.detailed_versions + 1
+
+        result = await self._collection.delete_many({
+            **base,
+            "$or": [
+                {"version": {"$lt": self._align(oldest_kept)}},
+                {"kind": DELTA, "version": {"$lt": self._align(detailed_from)}},
+            ],
+        })
+        self._stats["prunes"] += 1
+        return result.deleted_count
+
+    async def list_versions(
+        self,
+        collection_name: str,
+        document_id: str,
+        user_id: str,
+        limit: int = 50,
+        before: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Versions disponibles, plus récentes d'abord (sans leur contenu)"""
+        if self._collection is None:
+            return []
+        query = {"collection": collection_name, "document_id": document_id, "user_id": user_id}
+        if before is not None:
+            query["version"] = {"$lt": before}
+        cursor = self._collection.find(
+            query,
+            {"_id": 0, "version": 1, "kind": 1, "created_at": 1}
+        ).sort("version", DESCENDING).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def get_version(
+        self,
+        collection_name: str,
+        document_id: str,
+        user_id: str,
+        version: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Reconstruit une version : dernier snapshot puis deltas, en une requête
+
+        Returns:
+            Le document à cette version, ou None si elle n'est pas (ou plus) disponible
+        """
+        if self._collection is None:
+            return None
+
+        cursor = self._collection.find(
+            {
+                "collection": collection_name,
+                "document_id": document_id,
+                "user_id": user_id,
+                "version": {"$gte": self._align(version), "$lte": version},
+            },
+            {"_id": 0, "version": 1, "kind": 1, "data": 1, "delta": 1}
+        ).sort("version", ASCENDING)
+        entries = await cursor.to_list(length=self.snapshot_interval)
+
+        start = None
+        for index, entry in enumerate(entries):
+            if entry["kind"] == SNAPSHOT:
+                start = index
+        if start is None:
+            return None
+
+        document = entries[start]["data"]
+        current = entries[start]["version"]
+        for entry in entries[start + 1:]:
+            if entry["version"] != current + 1:
+                return None
+            apply_delta(document, entry["delta"])
+            current += 1
+        return document if current == version else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "snapshot_interval": self.snapshot_interval,
+            "detailed_versions": self.detailed_versions,
+            "max_versions": self.max_versions,
+            "max_age_days": self.max_age_days,
+        }
+
+
+def restorable_fields(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Contenu d'une version à réécrire lors d'une restauration"""
+    return {key: value for key, value in document.items() if key not in RESTORE_EXCLUDED}
+
+
+# Instance globale
+version_history = VersionHistory(
+    snapshot_interval=settings.version_snapshot_interval,
+    detailed_versions=settings.version_history_detailed_versions,
+    max_versions=settings.version_history_max_versions,
+    max_age_days=settings.version_history_max_age_days
+)
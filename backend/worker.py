@@ -0,0 +1,72 @@
+"""
+Worker de génération IA autonome
+
+Consomme la file de jobs MongoDB indépendamment de l'API, pour dimensionner
+séparément les workers HTTP et les workers de génération (textes IA et
+images produits).
+
+Usage:
+    python worker.py [--concurrency 4]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+from pathlib import Path
+
+from dotenv import load_dotenv
+from config import settings
+from database import create_client
+from services.ai_service import ai_generator
+from services.image_pipeline import image_pipeline
+from services.job_queue import job_queue, JobWorker, DEFAULT_HANDLERS
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def main(concurrency: int):
+    client = create_client(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    
+    await ai_generator.pool.start()
+    if settings.llm_cache_persistent:
+        await ai_generator.cache.attach_collection(db[settings.llm_cache_collection])
+    if settings.image_pipeline_enabled:
+        await image_pipeline.attach_collections(db[settings.image_asset_collection], db.products)
+        await image_pipeline.start()
+    await job_queue.attach_collection(db[settings.ai_job_collection])
+    
+    worker = JobWorker(
+        job_queue,
+        DEFAULT_HANDLERS,
+        concurrency=concurrency,
+        poll_interval=settings.ai_job_poll_interval_seconds
+    )
+    worker.start()
+    logger.info("Worker %s démarré (%s slots)", worker.worker_id, concurrency)
+    
+    # Arrêt propre sur SIGINT/SIGTERM
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    
+    logger.info("Arrêt du worker %s", worker.worker_id)
+    await worker.stop()
+    await image_pipeline.close()
+    await ai_generator.pool.close()
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker de génération IA")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
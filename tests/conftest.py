@@ -0,0 +1,52 @@
+"""Configuration pytest : les modules du backend s'importent à plat (from config import settings)"""
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "easyshop_test")
+
+# Sans MONGO_TEST_URL, mongo_db est une base mongomock ; seuls les tests qui
+# exigent un vrai mongod (explain) sont alors ignorés
+MONGO_TEST_URL = os.getenv("MONGO_TEST_URL")
+requires_mongod = pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL non défini (mongod requis)")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def mongo_db():
+    """Base jetable, supprimée après le test : mongod de MONGO_TEST_URL, sinon mongomock"""
+    from pymongo.errors import PyMongoError
+
+    if not MONGO_TEST_URL:
+        from mongomock_motor import AsyncMongoMockClient
+
+        import tests.mongomock_compat  # noqa: F401
+
+        yield AsyncMongoMockClient()[f"easyshop_test_{uuid.uuid4().hex[:8]}"]
+        return
+
+    from database import create_client
+
+    client = create_client(MONGO_TEST_URL)
+    try:
+        await client.admin.command("ping")
+    except PyMongoError as e:
+        client.close()
+        pytest.skip(f"mongod injoignable: {e}")
+    name = f"easyshop_test_{uuid.uuid4().hex[:8]}"
+    try:
+        yield client[name]
+    finally:
+        await client.drop_database(name)
+        client.close()
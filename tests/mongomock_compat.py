@@ -0,0 +1,276 @@
+"""
+Compléments à mongomock pour les tests sans mongod
+
+mongomock (4.3) ne couvre pas tout ce qu'utilise le backend :
+- find_one_and_update avec projection {"_id": 0} et ReturnDocument.AFTER relit
+  le document par le filtre d'origine, qui ne correspond plus une fois la
+  version incrémentée : le résultat est None ;
+- arrayFilters (sections.$[sN]) n'est pas implémenté ;
+- les mises à jour par pipeline n'évaluent qu'une partie des opérateurs ;
+- create_indexes compare la clé d'un IndexModel (items d'un SON) à la liste
+  stockée par create_index : un index identique déjà présent passe pour un
+  conflit d'options ;
+- bulk_write numérote les upserts entre eux et non parmi toutes les
+  opérations (upserted_ids) : le statut par élément des imports serait faux.
+
+Ce module corrige ces cinq points sur mongomock.Collection, pour les seules
+formes utilisées par le backend (filtres d'égalité sur un tableau de premier
+niveau, étapes $set). Un opérateur non couvert lève NotImplementedError plutôt
+que de produire un résultat faux.
+"""
+import copy
+import functools
+import re
+
+import mongomock.collection
+from pymongo import ReturnDocument
+
+_find_one_and_update = mongomock.collection.Collection.find_one_and_update
+
+# Champ absent (distinct de null) dans les expressions d'agrégation
+MISSING = object()
+
+
+def _path(value, parts):
+    for part in parts:
+        if isinstance(value, list):
+            value = [item for item in (_path(element, [part]) for element in value) if item is not MISSING]
+        elif isinstance(value, dict):
+            value = value.get(part, MISSING)
+        else:
+            return MISSING
+    return value
+
+
+def _type_name(value):
+    if value is MISSING:
+        return "missing"
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, str):
+        return "string"
+    return "double" if isinstance(value, float) else "int"
+
+
+def _single(argument):
+    return argument[0] if isinstance(argument, list) else argument
+
+
+def evaluate(expression, document, variables):
+    """Évalue une expression d'agrégation sur un document"""
+    if isinstance(expression, str) and expression.startswith("$$"):
+        name, *rest = expression[2:].split(".")
+        return _path(variables[name], rest)
+    if isinstance(expression, str) and expression.startswith("$"):
+        return _path(document, expression[1:].split("."))
+    if isinstance(expression, list):
+        return [evaluate(item, document, variables) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) != 1 or not next(iter(expression)).startswith("$"):
+        evaluated = ((key, evaluate(value, document, variables)) for key, value in expression.items())
+        return {key: value for key, value in evaluated if value is not MISSING}
+
+    (operator, argument), = expression.items()
+
+    def run(value, scope=variables):
+        return evaluate(value, document, scope)
+
+    if operator == "$literal":
+        return copy.deepcopy(argument)
+    if operator == "$ifNull":
+        value = run(argument[0])
+        return run(argument[1]) if value is MISSING or value is None else value
+    if operator == "$let":
+        scope = {**variables, **{name: run(value) for name, value in argument["vars"].items()}}
+        return run(argument["in"], scope)
+    if operator == "$cond":
+        return run(argument[1]) if run(argument[0]) else run(argument[2])
+    if operator == "$switch":
+        for branch in argument["branches"]:
+            if run(branch["case"]):
+                return run(branch["then"])
+        return run(argument["default"])
+    if operator == "$filter":
+        name = argument.get("as", "this")
+        return [item for item in run(argument["input"]) if run(argument["cond"], {**variables, name: item})]
+    if operator == "$map":
+        name = argument.get("as", "this")
+        return [run(argument["in"], {**variables, name: item}) for item in run(argument["input"])]
+    if operator == "$add":
+        return sum(run(item) for item in argument)
+    if operator == "$max":
+        return max(run(item) for item in argument)
+    if operator == "$concatArrays":
+        return [item for array in argument for item in run(array)]
+    if operator == "$eq":
+        return run(argument[0]) == run(argument[1])
+    if operator == "$in":
+        return run(argument[0]) in run(argument[1])
+    if operator == "$not":
+        return not run(_single(argument))
+    if operator == "$indexOfArray":
+        array, value = run(argument[0]), run(argument[1])
+        return array.index(value) if value in array else -1
+    if operator == "$arrayElemAt":
+        array, index = run(argument[0]), run(argument[1])
+        return array[index] if isinstance(array, list) and -len(array) <= index < len(array) else MISSING
+    if operator == "$mergeObjects":
+        merged = {}
+        for item in argument:
+            value = run(item)
+            if value is None or value is MISSING:
+                continue
+            if not isinstance(value, dict):
+                raise TypeError(f"$mergeObjects exige des objets: {value!r}")
+            merged.update(value)
+        return merged
+    if operator == "$objectToArray":
+        return [{"k": key, "v": value} for key, value in run(argument).items()]
+    if operator == "$arrayToObject":
+        return {item["k"]: item["v"] for item in run(argument)}
+    if operator == "$range":
+        return list(range(run(argument[0]), run(argument[1])))
+    if operator == "$size":
+        return len(run(_single(argument)))
+    if operator == "$isArray":
+        return isinstance(run(_single(argument)), list)
+    if operator == "$type":
+        return _type_name(run(_single(argument)))
+    raise NotImplementedError(f"Opérateur non couvert par mongomock_compat: {operator}")
+
+
+def _project(document, projection):
+    """Projection d'inclusion (chemins pointés compris) d'un document déjà lu"""
+    if not projection:
+        return document
+    included = [key for key, value in projection.items() if value and key != "_id"]
+    if not included:
+        return {key: value for key, value in document.items() if projection.get(key, 1)}
+    projected = {"_id": document["_id"]} if projection.get("_id", 1) else {}
+    for key in included:
+        head, *rest = key.split(".")
+        if head not in document:
+            continue
+        value = document[head]
+        if not rest:
+            projected[head] = value
+        elif isinstance(value, list):
+            projected[head] = [{rest[0]: item[rest[0]]} for item in value if rest[0] in item]
+        elif isinstance(value, dict) and rest[0] in value:
+            projected.setdefault(head, {})[rest[0]] = value[rest[0]]
+    return projected
+
+
+def _expand_array_filters(document, update, array_filters):
+    """Remplace chaque tableau.$[x] par les indices des éléments retenus par x"""
+    conditions = {}
+    for array_filter in array_filters:
+        for key, value in array_filter.items():
+            identifier, _, field = key.partition(".")
+            conditions.setdefault(identifier, []).append((field, value))
+
+    def keys(key):
+        match = re.search(r"^([^$]+)\.\$\[(\w+)\]", key)
+        if not match:
+            return [key]
+        array = _path(document, match.group(1).split("."))
+        indexes = [
+            index for index, item in enumerate(array if isinstance(array, list) else [])
+            if all(_path(item, field.split(".")) == value for field, value in conditions[match.group(2)])
+        ]
+        return [f"{match.group(1)}.{index}{key[match.end():]}" for index in indexes]
+
+    return {
+        operator: {expanded: value for key, value in fields.items() for expanded in keys(key)}
+        if operator in ("$set", "$unset") else fields
+        for operator, fields in update.items()
+    }
+
+
+def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                        array_filters=None, return_document=ReturnDocument.BEFORE, **kwargs):
+    document = self.find_one(filter, sort=sort)
+    if document is None:
+        if upsert and not isinstance(update, list):
+            return _find_one_and_update(
+                self, filter, update, projection, upsert=True, return_document=return_document, **kwargs
+            )
+        return None
+
+    if isinstance(update, list):
+        if array_filters:
+            raise ValueError("arrayFilters incompatible avec une mise à jour par pipeline")
+        updated = copy.deepcopy(document)
+        for stage in update:
+            (name, fields), = stage.items()
+            if name != "$set":
+                raise NotImplementedError(f"Étape non couverte par mongomock_compat: {name}")
+            computed = {key: evaluate(value, updated, {"ROOT": updated}) for key, value in fields.items()}
+            for key, value in computed.items():
+                if value is MISSING:
+                    updated.pop(key, None)
+                else:
+                    updated[key] = value
+        self.replace_one({"_id": document["_id"]}, updated)
+    else:
+        if array_filters:
+            update = _expand_array_filters(document, update, array_filters)
+        # Relecture par _id : le filtre d'origine peut ne plus correspondre (version incrémentée)
+        _find_one_and_update(self, {"_id": document["_id"]}, update, **kwargs)
+
+    if return_document == ReturnDocument.AFTER:
+        return self.find_one({"_id": document["_id"]}, projection)
+    return _project(document, projection)
+
+
+mongomock.collection.Collection.find_one_and_update = find_one_and_update
+
+
+def create_indexes(self, indexes, session=None):
+    return [
+        self.create_index(
+            list(index.document["key"].items()),
+            session=session,
+            **{key: value for key, value in index.document.items() if key != "key"}
+        )
+        for index in indexes
+    ]
+
+
+mongomock.collection.Collection.create_indexes = create_indexes
+
+
+_execute = mongomock.collection.BulkOperationBuilder.execute
+
+
+def _numbered(builder, index, executor):
+    @functools.wraps(executor)
+    def run():
+        builder._compat_index = index
+        return executor()
+    return run
+
+
+def execute(self, write_concern=None):
+    self.executors = [_numbered(self, index, executor) for index, executor in enumerate(self.executors)]
+    return _execute(self, write_concern)
+
+
+def _aggregate_operation_result(self, total_result, key, value):
+    if key == "upserted":
+        total_result[key].append({"index": self._compat_index, "_id": value})
+    elif isinstance(total_result[key], list):
+        total_result[key].append(value)
+    else:
+        total_result[key] += value
+
+
+mongomock.collection.BulkOperationBuilder.execute = execute
+mongomock.collection.BulkOperationBuilder._BulkOperationBuilder__aggregate_operation_result = _aggregate_operation_result
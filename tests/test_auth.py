@@ -0,0 +1,155 @@
+"""Vérification des JWT Supabase : cache des payloads, algorithmes, JWKS"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import auth.supabase_auth as supabase_auth
+from auth.supabase_auth import AUDIENCE, TokenVerifier
+from config import settings
+
+pytestmark = pytest.mark.anyio
+
+SECRET = "secret-de-test-" + "x" * 64
+
+
+@pytest.fixture(autouse=True)
+def auth_settings(monkeypatch):
+    monkeypatch.setattr(settings, "supabase_jwt_secret", SECRET)
+    monkeypatch.setattr(settings, "supabase_jwt_algorithms", "HS256,RS256")
+    monkeypatch.setattr(settings, "auth_token_cache_size", 100)
+    monkeypatch.setattr(settings, "auth_token_cache_max_seconds", 300)
+
+
+def claims(**extra):
+    return {"sub": "u1", "aud": AUDIENCE, "exp": int(time.time()) + 3600, **extra}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge du cache des payloads, avancée à la main"""
+    now = [time.time()]
+    monkeypatch.setattr(supabase_auth, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+async def test_verified_payload_is_cached():
+    verifier = TokenVerifier()
+    token = jwt.encode(claims(), SECRET, algorithm="HS256")
+
+    assert (await verifier.verify(token))["sub"] == "u1"
+    assert (await verifier.verify(token))["sub"] == "u1"
+
+    assert (verifier.hits, verifier.misses) == (1, 1)
+
+
+async def test_cached_payload_expires_with_the_token(clock):
+    verifier = TokenVerifier()
+    token = jwt.encode(claims(exp=int(clock[0]) + 60), SECRET, algorithm="HS256")
+    await verifier.verify(token)
+
+    clock[0] += 30
+    await verifier.verify(token)
+    assert verifier.hits == 1
+
+    # Au-delà de exp, le payload n'est plus servi depuis le cache : le token est revérifié
+    clock[0] += 31
+    await verifier.verify(token)
+    assert (verifier.hits, verifier.misses) == (1, 2)
+
+
+def test_cache_lifetime_is_capped():
+    assert TokenVerifier._expires_at(None, {"exp": 1000}, 100) == 400
+    assert TokenVerifier._expires_at(None, {"exp": 150}, 100) == 150
+    assert TokenVerifier._expires_at(None, {}, 100) == 400
+
+
+async def test_expired_token_is_rejected():
+    verifier = TokenVerifier()
+    token = jwt.encode(claims(exp=int(time.time()) - 10), SECRET, algorithm="HS256")
+
+    with pytest.raises(jwt.exceptions.ExpiredSignatureError):
+        await verifier.verify(token)
+    assert verifier.stats()["size"] == 0
+
+
+@pytest.mark.parametrize("algorithm", ["HS512", "none"])
+async def test_unlisted_algorithm_is_rejected(algorithm):
+    token = jwt.encode(claims(), SECRET if algorithm != "none" else None, algorithm=algorithm)
+
+    with pytest.raises(jwt.exceptions.InvalidAlgorithmError):
+        await TokenVerifier().verify(token)
+
+
+async def test_wrong_audience_is_rejected():
+    token = jwt.encode(claims(aud="anon"), SECRET, algorithm="HS256")
+
+    with pytest.raises(jwt.exceptions.InvalidAudienceError):
+        await TokenVerifier().verify(token)
+
+
+class JWKSServer:
+    """Sert un JWKS local et compte les téléchargements"""
+
+    def __init__(self, keys):
+        self.hits = 0
+        server = self
+        body = json.dumps({"keys": keys}).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.hits += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/jwks.json"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def signing_key(monkeypatch):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+    server = JWKSServer([{**jwk, "kid": "k1", "alg": "RS256", "use": "sig"}])
+    monkeypatch.setattr(settings, "supabase_jwks_url", server.url)
+    yield SimpleNamespace(key=key, server=server)
+    server.close()
+
+
+async def test_asymmetric_token_is_verified_with_the_jwks_key(signing_key):
+    verifier = TokenVerifier()
+    first = jwt.encode(claims(), signing_key.key, algorithm="RS256", headers={"kid": "k1"})
+    second = jwt.encode(claims(sub="u2"), signing_key.key, algorithm="RS256", headers={"kid": "k1"})
+
+    assert (await verifier.verify(first))["sub"] == "u1"
+    assert (await verifier.verify(second))["sub"] == "u2"
+
+    # La clé publique est gardée par kid : un seul téléchargement du JWKS
+    assert signing_key.server.hits == 1
+    assert verifier.stats()["jwks_keys"] == 1
+
+
+async def test_unknown_or_missing_kid_is_rejected(signing_key):
+    verifier = TokenVerifier()
+
+    for headers in ({"kid": "inconnu"}, {}):
+        token = jwt.encode(claims(), signing_key.key, algorithm="RS256", headers=headers)
+        with pytest.raises(jwt.exceptions.InvalidTokenError):
+            await verifier.verify(token)
+
+    assert verifier.stats()["jwks_keys"] == 0
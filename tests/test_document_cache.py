@@ -0,0 +1,62 @@
+"""Cache des documents : invalidation par génération et réponses conditionnelles"""
+import json
+
+import pytest
+
+from models.store import StoreUpdate
+from routes.stores import delete_store, get_store, update_store
+from services.document_cache import DocumentCache, document_cache
+
+pytestmark = pytest.mark.anyio
+
+USER = {"user_id": "u1"}
+
+
+async def test_forgotten_generation_does_not_revive_stale_entry():
+    cache = DocumentCache(max_entries=2, ttl_seconds=60)
+    stored = {"id": "s1", "version": 1}
+
+    async def load():
+        return dict(stored)
+
+    assert (await cache.get_document("stores", "s1", load))["version"] == 1
+    stored["version"] = 2
+    cache.invalidate("stores", "s1")
+    assert (await cache.get_document("stores", "s1", load))["version"] == 2
+
+    # Les générations d'autres documents évincent celle de s1 ; les deux entrées de s1 vivent encore
+    for number in range(cache._generations.maxsize):
+        cache.invalidate("stores", f"other-{number}")
+
+    assert (await cache.get_document("stores", "s1", load))["version"] == 2
+
+
+async def test_store_read_after_write_has_new_etag(mongo_db):
+    document_cache.clear()
+    await mongo_db.stores.insert_one({"id": "s1", "user_id": "u1", "name": "Avant", "is_active": True, "version": 1})
+
+    first = await get_store("s1", None, USER, mongo_db)
+    first_etag = first.headers["etag"]
+    assert (await get_store("s1", first_etag, USER, mongo_db)).status_code == 304
+
+    await update_store("s1", StoreUpdate(name="Après", expected_version=1), USER, mongo_db)
+
+    fresh = await get_store("s1", first_etag, USER, mongo_db)
+    assert fresh.status_code == 200
+    assert json.loads(fresh.body)["store"]["name"] == "Après"
+    assert fresh.headers["etag"] != first_etag
+    assert (await get_store("s1", fresh.headers["etag"], USER, mongo_db)).status_code == 304
+
+
+async def test_soft_delete_is_a_new_version(mongo_db):
+    document_cache.clear()
+    await mongo_db.stores.insert_one({"id": "s1", "user_id": "u1", "name": "Avant", "is_active": True, "version": 1})
+    first_etag = (await get_store("s1", None, USER, mongo_db)).headers["etag"]
+
+    await delete_store("s1", USER, mongo_db)
+
+    fresh = await get_store("s1", first_etag, USER, mongo_db)
+    assert fresh.status_code == 200
+    assert json.loads(fresh.body)["store"]["is_active"] is False
+    assert json.loads(fresh.body)["store"]["version"] == 2
+    assert fresh.headers["etag"] != first_etag
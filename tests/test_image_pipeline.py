@@ -0,0 +1,126 @@
+"""Téléchargement et déduplication des images produits, contre un serveur HTTP local"""
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import services.image_pipeline as image_pipeline_module
+from services.image_pipeline import ImagePipeline, ImageRejected, LocalImageStorage
+
+pytestmark = pytest.mark.anyio
+
+
+def jpeg(width=200, height=120):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 40)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class StubServer:
+    """Serveur fournisseur : chemin → (statut, headers, corps) ; compte les requêtes"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.hits = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits[self.path] = stub.hits.get(self.path, 0) + 1
+                status, headers, body = stub.routes.get(self.path, (404, {}, b""))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def supplier():
+    image = jpeg()
+    server = StubServer({
+        "/photo.jpg": (200, {"Content-Type": "image/jpeg", "Content-Length": str(len(image))}, image),
+        "/copie.jpg": (200, {"Content-Type": "image/jpeg"}, image),
+        # Sans Content-Length : la limite s'applique pendant la lecture
+        "/lourde.jpg": (200, {"Content-Type": "image/jpeg"}, image + b"\0" * 5000),
+    })
+    yield server
+    server.close()
+
+
+@pytest.fixture
+async def pipeline(tmp_path):
+    pipeline = ImagePipeline(
+        LocalImageStorage(str(tmp_path), "/media/images"),
+        widths=(64,),
+        formats=("webp",),
+        process_workers=1,
+        max_bytes=len(jpeg()) + 1000,
+        allow_private_hosts=True
+    )
+    await pipeline.start()
+    yield pipeline
+    await pipeline.close()
+
+
+async def test_redirect_to_private_host_is_rejected(pipeline, supplier, monkeypatch):
+    internal = StubServer({"/latest/meta-data": (200, {"Content-Type": "image/jpeg"}, jpeg())})
+    supplier.routes["/redirection.jpg"] = (302, {"Location": f"{internal.url}/latest/meta-data"}, b"")
+    check_public_url = image_pipeline_module.check_public_url
+
+    async def supplier_is_public(url, allow_private_hosts=False):
+        # Le serveur fournisseur (local) tient lieu d'hôte public ; tout autre hôte est vérifié
+        if not url.startswith(supplier.url + "/"):
+            await check_public_url(url, allow_private_hosts)
+
+    monkeypatch.setattr(image_pipeline_module, "check_public_url", supplier_is_public)
+    pipeline.allow_private_hosts = False
+    try:
+        with pytest.raises(ImageRejected, match="Hôte non autorisé"):
+            await pipeline.ingest(f"{supplier.url}/redirection.jpg")
+    finally:
+        internal.close()
+
+    assert supplier.hits == {"/redirection.jpg": 1}
+    assert internal.hits == {}
+    assert pipeline.stats()["rejected"] == 1
+
+
+async def test_oversized_image_is_rejected(pipeline, supplier):
+    with pytest.raises(ImageRejected, match="Image trop lourde"):
+        await pipeline.ingest(f"{supplier.url}/lourde.jpg")
+
+    supplier.routes["/lourde.jpg"] = (200, {"Content-Type": "image/jpeg", "Content-Length": "99999999"}, b"")
+    with pytest.raises(ImageRejected, match="99999999 octets"):
+        await pipeline.ingest(f"{supplier.url}/lourde.jpg")
+
+    assert pipeline.stats()["downloads"] == 0
+    assert pipeline.stats()["rejected"] == 2
+
+
+async def test_same_image_reuses_stored_asset(pipeline, supplier, tmp_path):
+    first = await pipeline.ingest(f"{supplier.url}/photo.jpg")
+    stored = {path: path.stat().st_mtime_ns for path in tmp_path.rglob("*.webp")}
+
+    again = await pipeline.ingest(f"{supplier.url}/photo.jpg")
+    same_content = await pipeline.ingest(f"{supplier.url}/copie.jpg")
+
+    assert again == first and same_content == first
+    assert [variant["width"] for variant in first["variants"]] == [64]
+    assert supplier.hits == {"/photo.jpg": 1, "/copie.jpg": 1}
+    stats = pipeline.stats()
+    assert (stats["downloads"], stats["url_hits"], stats["hash_hits"], stats["encoded"]) == (2, 1, 1, 1)
+    assert {path: path.stat().st_mtime_ns for path in tmp_path.rglob("*.webp")} == stored
@@ -0,0 +1,52 @@
+"""Index déclarés ; les plans d'exécution exigent un vrai mongod (MONGO_TEST_URL)"""
+import pytest
+
+from config import settings
+from indexes import QUERY_SHAPES, backfill_page_owners, check_query_plans, ensure_indexes, index_report
+from tests.conftest import requires_mongod
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_declared_indexes_exist(mongo_db):
+    await ensure_indexes(mongo_db)
+    report = await index_report(mongo_db)
+
+    assert {collection: entry["missing"] for collection, entry in report.items() if entry["missing"]} == {}
+
+
+async def test_service_indexes_keep_their_runtime_names(mongo_db):
+    # Index créés par les anciennes versions des services, avant INDEXES
+    await mongo_db[settings.rate_limit_collection].create_index("expires_at", expireAfterSeconds=0)
+    await mongo_db[settings.ai_job_collection].create_index("id", unique=True)
+
+    await ensure_indexes(mongo_db)
+    report = await index_report(mongo_db)
+
+    assert report[settings.ai_job_collection]["undeclared"] == []
+    for collection in (settings.rate_limit_collection, settings.llm_cache_collection):
+        assert report[collection]["undeclared"] == []
+        assert (await mongo_db[collection].index_information())["expires_at_1"]["expireAfterSeconds"] == 0
+
+
+async def test_pages_get_the_owner_of_their_store(mongo_db):
+    await mongo_db.stores.insert_many([{"id": "s1", "user_id": "u1"}, {"id": "s2", "user_id": "u2"}])
+    await mongo_db.pages.insert_many([
+        {"id": "p1", "store_id": "s1"},
+        {"id": "p2", "store_id": "s2", "user_id": None},
+        {"id": "p3", "store_id": "s2", "user_id": "u2"},
+        {"id": "p4", "store_id": "inconnue"},
+    ])
+
+    assert await backfill_page_owners(mongo_db) == 2
+    owners = {page["id"]: page.get("user_id") async for page in mongo_db.pages.find()}
+    assert owners == {"p1": "u1", "p2": "u2", "p3": "u2", "p4": None}
+
+
+@requires_mongod
+async def test_query_shapes_do_not_scan_collections(mongo_db):
+    await ensure_indexes(mongo_db)
+    plans = await check_query_plans(mongo_db)
+
+    assert len(plans) == len(QUERY_SHAPES)
+    assert [plan for plan in plans if plan["collection_scan"]] == []
@@ -0,0 +1,32 @@
+"""Endpoints internes : protégés par le token interne"""
+import httpx
+import pytest
+
+from config import settings
+from server import app
+
+pytestmark = pytest.mark.anyio
+
+STATS_PATHS = ["/api/internal/llm-cache", "/api/internal/llm-inflight", "/api/internal/llm-pool"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "internal_api_open", False)
+    monkeypatch.setattr(settings, "internal_api_token", "jeton-interne")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.parametrize("path", STATS_PATHS)
+async def test_llm_stats_require_the_internal_token(client, path):
+    async with client:
+        assert (await client.get(path)).status_code == 403
+        # Un utilisateur authentifié n'y a pas accès pour autant
+        assert (await client.get(path, headers={"Authorization": "Bearer jwt-utilisateur"})).status_code == 403
+        assert (await client.get(path, headers={"X-Internal-Token": "jeton-interne"})).status_code == 200
+
+
+@pytest.mark.parametrize("path", ["/api/ai/cache/stats", "/api/ai/inflight/stats", "/api/ai/pool/stats"])
+async def test_llm_stats_are_gone_from_the_public_api(client, path):
+    async with client:
+        assert (await client.get(path)).status_code == 404
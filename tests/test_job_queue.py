@@ -0,0 +1,77 @@
+"""File de jobs : bail, expiration, reprises et abandon"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from config import settings
+from services.job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def queue(mongo_db, monkeypatch):
+    monkeypatch.setattr(settings, "ai_job_max_attempts", 2)
+    monkeypatch.setattr(settings, "ai_job_retry_base_seconds", 60)
+    queue = JobQueue()
+    await queue.attach_collection(mongo_db.ai_jobs)
+    return queue
+
+
+async def expire(queue, job_id, field):
+    """Fait comme si le délai (bail ou reprise) était écoulé"""
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await queue._collection.update_one({"id": job_id}, {"$set": {field: past}})
+
+
+async def test_leased_job_is_not_claimed_twice(queue):
+    job = await queue.submit("u1", "store_content", {"brand_name": "x"})
+
+    claimed = await queue.claim("w1")
+
+    assert (claimed["id"], claimed["status"], claimed["attempts"]) == (job["id"], RUNNING, 1)
+    assert await queue.claim("w2") is None
+
+
+async def test_expired_lease_is_taken_over(queue):
+    job = await queue.submit("u1", "store_content", {})
+    first = await queue.claim("w1")
+    await expire(queue, job["id"], "lease_expires_at")
+
+    second = await queue.claim("w2")
+
+    assert (second["id"], second["attempts"]) == (job["id"], 2)
+    # Le premier worker a perdu son bail : son résultat est ignoré
+    assert await queue.complete(first, "w1", {"ok": True}) is None
+    finished = await queue.complete(second, "w2", {"ok": True})
+    assert (finished["status"], finished["result"]) == (SUCCEEDED, {"ok": True})
+
+
+async def test_failure_is_retried_after_a_delay_then_fails(queue):
+    job = await queue.submit("u1", "store_content", {})
+
+    retried = await queue.fail(await queue.claim("w1"), "w1", "erreur 1")
+    assert (retried["status"], retried["error"]) == (QUEUED, "erreur 1")
+    assert await queue.claim("w1") is None
+
+    await expire(queue, job["id"], "available_at")
+    last = await queue.claim("w1")
+    assert last["attempts"] == 2
+
+    failed = await queue.fail(last, "w1", "erreur 2")
+    assert (failed["status"], failed["error"]) == (FAILED, "erreur 2")
+    assert await queue.counts() == {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 1}
+
+
+async def test_expired_lease_on_last_attempt_is_abandoned_once(queue):
+    job = await queue.submit("u1", "store_content", {})
+    await queue.claim("w1")
+    await expire(queue, job["id"], "lease_expires_at")
+    await queue.claim("w2")
+    await expire(queue, job["id"], "lease_expires_at")
+
+    assert await queue.claim("w3") is None
+    abandoned = await queue.abandon_expired()
+    assert (abandoned["id"], abandoned["status"]) == (job["id"], FAILED)
+    assert abandoned["error"] == "Bail expiré au dernier essai"
+    assert await queue.abandon_expired() is None
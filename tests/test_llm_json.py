@@ -0,0 +1,89 @@
+"""Extraction, validation et réparation du JSON des réponses LLM"""
+import pytest
+
+from services.ai_service import AIContentGenerator
+from services.llm_json import LLMJSONError, extract_json, find_json_object, parse_section
+
+pytestmark = pytest.mark.anyio
+
+HERO = '{"heading": "Titre", "subheading": "Sous-titre", "cta_primary": "Acheter"}'
+
+
+@pytest.mark.parametrize("text", [
+    HERO,
+    f"```json\n{HERO}\n```",
+    f"Voici le contenu demandé :\n{HERO}\nBonne vente !",
+])
+def test_extract_json_ignores_surrounding_text(text):
+    assert extract_json(text)["heading"] == "Titre"
+
+
+def test_extract_json_skips_braces_in_prose_and_strings():
+    text = 'Format {section} attendu. {"heading": "Accolade } dans \\"une\\" chaîne", "n": {"a": 1}} fin {'
+
+    assert extract_json(text) == {"heading": 'Accolade } dans "une" chaîne', "n": {"a": 1}}
+    assert find_json_object(text) == (text.index("{"), text.index("{") + len("{section}"))
+
+
+def test_extract_json_tolerates_trailing_commas():
+    assert extract_json('{"paragraphs": ["a", "b",], "heading": "x",}') == {"paragraphs": ["a", "b"], "heading": "x"}
+
+
+@pytest.mark.parametrize("text", ["", "pas de JSON", '{"heading": "tronqué"', "{pas: du json}"])
+def test_extract_json_without_valid_object_raises(text):
+    with pytest.raises(LLMJSONError):
+        extract_json(text)
+
+
+def test_parse_section_validates_against_schema():
+    parsed = parse_section("hero", HERO.replace("}", ', "badge": "Nouveau"}'))
+
+    assert parsed["cta_secondary"] is None
+    # Les champs supplémentaires renvoyés par le modèle sont conservés
+    assert parsed["badge"] == "Nouveau"
+
+    with pytest.raises(LLMJSONError, match="schéma hero"):
+        parse_section("hero", '{"heading": "Titre"}')
+
+
+def test_parse_section_without_schema_only_extracts():
+    assert parse_section("inconnue", 'texte {"libre": true}') == {"libre": True}
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    generator = AIContentGenerator()
+    generator.prompts = []
+
+    async def generate_content(prompt, system_message=None, **kwargs):
+        generator.prompts.append(prompt)
+        return generator.replies.pop(0)
+
+    monkeypatch.setattr(generator, "generate_content", generate_content)
+    return generator
+
+
+async def test_invalid_section_is_repaired_with_a_targeted_prompt(generator):
+    generator.replies = [HERO]
+
+    parsed = await generator.parse_section_content("hero", '{"heading": "Titre", "subheading": 3')
+
+    assert parsed["cta_primary"] == "Acheter"
+    assert len(generator.prompts) == 1
+    assert "hero" in str(generator.prompts[0])
+
+
+async def test_failed_repair_returns_raw_content(generator):
+    generator.replies = ["toujours pas de JSON"]
+
+    parsed = await generator.parse_section_content("hero", "pas de JSON")
+
+    assert parsed["raw"] == "pas de JSON"
+    assert "error" in parsed
+
+
+async def test_valid_section_is_not_repaired(generator):
+    generator.replies = []
+
+    assert (await generator.parse_section_content("hero", HERO))["heading"] == "Titre"
+    assert generator.prompts == []
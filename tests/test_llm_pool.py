@@ -0,0 +1,39 @@
+"""Pool LLM : un pool de connexions par provider dans le client partagé"""
+import sys
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from services.llm_pool import PROVIDER_HOSTS, LLMClientPool
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_each_provider_has_its_own_connection_pool(monkeypatch):
+    # litellm (long à importer) ne sert ici qu'à recevoir le client
+    litellm = SimpleNamespace(aclient_session=None)
+    monkeypatch.setitem(sys.modules, "litellm", litellm)
+    monkeypatch.setenv("HTTPS_PROXY", "http://proxy.local:3128")
+    monkeypatch.setenv("NO_PROXY", PROVIDER_HOSTS["gemini"])
+    pool = LLMClientPool("cle", pool_size=3)
+    await pool.start()
+    try:
+        client = pool._http_client
+        assert litellm.aclient_session is client
+        transports = {
+            provider: client._transport_for_url(httpx.URL(f"https://{host}/v1/chat/completions"))
+            for provider, host in PROVIDER_HOSTS.items()
+        }
+        proxied = client._transport_for_url(httpx.URL("https://llm-proxy.example/v1/chat/completions"))
+
+        assert len({id(transport) for transport in [*transports.values(), proxied]}) == len(PROVIDER_HOSTS) + 1
+        assert all(transport._pool._max_connections == 6 for transport in transports.values())
+        # Le proxy de l'environnement reste appliqué, sauf exception NO_PROXY
+        assert isinstance(transports["openai"]._pool, type(proxied._pool))
+        assert not isinstance(transports["gemini"]._pool, type(transports["openai"]._pool))
+        assert pool.stats()["provider_transports"] == sorted(PROVIDER_HOSTS)
+    finally:
+        await pool.close()
+    assert pool.stats()["provider_transports"] == []
+    assert litellm.aclient_session is None
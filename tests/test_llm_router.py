@@ -0,0 +1,135 @@
+"""Disjoncteur des modèles LLM et routage primary/fallback"""
+import pytest
+
+from services.llm_router import CLOSED, HALF_OPEN, OPEN, LLMRouter, ModelHealth
+
+pytestmark = pytest.mark.anyio
+
+PRIMARY = ("openai", "primary")
+FALLBACK = ("anthropic", "fallback")
+
+
+def tripped(cooldown_seconds=0.0):
+    health = ModelHealth(window=10, error_rate_threshold=0.5, min_requests=4, cooldown_seconds=cooldown_seconds)
+    for _ in range(4):
+        health.record(health.allow_request(), 1.0, ok=False)
+    assert (health.state, health.trips) == (OPEN, 1)
+    return health
+
+
+def test_open_breaker_refuses_requests_during_cooldown():
+    health = tripped(cooldown_seconds=60)
+
+    assert health.allow_request() is None
+    assert not health.is_available()
+    assert health.state == OPEN
+
+
+def test_successful_probe_closes_the_breaker():
+    health = tripped()
+
+    probe = health.allow_request()
+    assert probe is not None and health.state == HALF_OPEN
+    # Une seule sonde à la fois
+    assert health.allow_request() is None
+    assert not health.is_available()
+
+    health.record(probe, 0.5, ok=True)
+    assert health.state == CLOSED
+    assert health.snapshot()["samples"] == 0
+    assert health.allow_request() is not None
+
+
+def test_failed_probe_reopens_the_breaker():
+    health = tripped()
+
+    health.record(health.allow_request(), 0.5, ok=False)
+
+    assert (health.state, health.trips) == (OPEN, 2)
+
+
+def test_late_completion_does_not_decide_for_the_probe():
+    health = ModelHealth(window=10, error_rate_threshold=0.5, min_requests=4, cooldown_seconds=0)
+    late = health.allow_request()
+    for _ in range(4):
+        health.record(health.allow_request(), 1.0, ok=False)
+    probe = health.allow_request()
+
+    # Réponse d'une requête envoyée avant l'ouverture : la sonde reste seule juge
+    health.record(late, 0.1, ok=True)
+    assert health.state == HALF_OPEN
+    assert health.allow_request() is None
+
+    health.record(probe, 0.5, ok=False)
+    assert (health.state, health.trips) == (OPEN, 2)
+
+
+def test_late_failures_after_closing_are_ignored():
+    health = ModelHealth(window=10, error_rate_threshold=0.5, min_requests=4, cooldown_seconds=0)
+    late = [health.allow_request() for _ in range(4)]
+    for _ in range(4):
+        health.record(health.allow_request(), 1.0, ok=False)
+    health.record(health.allow_request(), 0.5, ok=True)
+
+    for ticket in late:
+        health.record(ticket, 1.0, ok=False)
+
+    assert health.state == CLOSED
+    assert health.snapshot()["samples"] == 0
+
+
+def test_cancelled_request_only_releases_its_own_probe():
+    health = tripped()
+    probe = health.allow_request()
+
+    health.release_probe(probe - 1)
+    assert health.allow_request() is None
+
+    health.release_probe(probe)
+    assert health.allow_request() is not None
+
+
+def make_router(cooldown_seconds):
+    return LLMRouter(PRIMARY, FALLBACK, window=10, min_requests=2, cooldown_seconds=cooldown_seconds)
+
+
+async def test_tripped_fallback_is_not_called():
+    router = make_router(cooldown_seconds=60)
+    calls = []
+
+    async def send(model):
+        calls.append(model)
+        raise RuntimeError("indisponible")
+
+    for _ in range(2):
+        with pytest.raises(Exception, match="tous les modèles"):
+            await router.call(send)
+    assert router.health[PRIMARY].state == router.health[FALLBACK].state == OPEN
+    calls.clear()
+
+    with pytest.raises(Exception, match="fallback anthropic/fallback disjoncté"):
+        await router.call(send)
+
+    assert calls == []
+    assert router.snapshot()["routing"]["rejected"] == 1
+
+
+async def test_fallback_recovers_through_its_probe():
+    router = make_router(cooldown_seconds=0)
+    failing = {PRIMARY, FALLBACK}
+
+    async def send(model):
+        if model in failing:
+            raise RuntimeError("indisponible")
+        return f"réponse de {model[1]}"
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await router.call(send)
+    assert router.health[FALLBACK].state == OPEN
+
+    failing = {PRIMARY}
+    # Primary : sonde échouée ; fallback : sonde réussie qui le referme
+    assert await router.call(send) == "réponse de fallback"
+    assert router.health[FALLBACK].state == CLOSED
+    assert router.health[PRIMARY].state == OPEN
@@ -0,0 +1,104 @@
+"""Écritures de sections (mises à jour par pipeline)"""
+import json
+
+import pytest
+
+from fastapi import HTTPException
+
+from models.page import PagePatchRequest, PageSectionsBulkRequest
+from routes.pages import bulk_write_sections, patch_page
+
+pytestmark = pytest.mark.anyio
+
+USER = {"user_id": "u1"}
+
+
+def section(section_id, order=0, **settings):
+    return {"id": section_id, "type": "hero", "settings": settings, "order": order}
+
+
+@pytest.fixture
+async def pages(mongo_db):
+    await mongo_db.pages.insert_one({
+        "id": "pg", "user_id": "u1", "store_id": "s1", "title": "Accueil", "slug": "accueil",
+        "version": 3, "sections": [section("a"), section("b", 1)],
+    })
+    return mongo_db
+
+
+async def stored_sections(db):
+    page = await db.pages.find_one({"id": "pg"})
+    return page["version"], page["sections"]
+
+
+async def test_bulk_upsert_writes_once(pages):
+    request = PageSectionsBulkRequest(
+        sections=[section("b", 1, heading="$title"), section("c", 2)],
+        expected_version=3
+    )
+    response = json.loads((await bulk_write_sections("pg", request, USER, pages)).body)
+
+    assert [item["status"] for item in response["results"]] == ["updated", "created"]
+    assert response["version"] == 4
+    assert await stored_sections(pages) == (4, [section("a"), section("b", 1, heading="$title"), section("c", 2)])
+
+
+@pytest.mark.parametrize("mode, statuses, ids", [
+    ("create", ["unchanged", "created"], ["a", "b", "c"]),
+    ("update", ["updated", "not_found"], ["a", "b"]),
+])
+async def test_bulk_modes(pages, mode, statuses, ids):
+    request = PageSectionsBulkRequest(mode=mode, sections=[section("a", heading="x"), section("c", 2)])
+    response = json.loads((await bulk_write_sections("pg", request, USER, pages)).body)
+
+    assert [item["status"] for item in response["results"]] == statuses
+    version, sections = await stored_sections(pages)
+    assert [s["id"] for s in sections] == ids
+    assert sections[0]["settings"] == ({} if mode == "create" else {"heading": "x"})
+
+
+async def test_patch_combining_edits_removal_and_addition_bumps_version_once(pages):
+    await pages.pages.update_one({"id": "pg"}, {"$set": {"sections.0.settings": {"items": [{"t": 1}], "n": {"x": 1}}}})
+    request = PagePatchRequest(expected_version=3, operations=[
+        {"op": "replace", "path": "/sections/a/settings/items/0/t", "value": "$t"},
+        {"op": "remove", "path": "/sections/a/settings/n/x"},
+        {"op": "remove", "path": "/sections/a/settings/missing/x"},
+        {"op": "remove", "path": "/sections/b"},
+        {"op": "add", "path": "/sections/-", "value": section("c", 2)},
+        {"op": "replace", "path": "/title", "value": "Nouveau"},
+    ])
+    response = json.loads((await patch_page("pg", request, USER, pages)).body)
+
+    page = await pages.pages.find_one({"id": "pg"})
+    assert response["version"] == page["version"] == 4
+    assert page["title"] == "Nouveau"
+    assert page["sections"] == [section("a", items=[{"t": "$t"}], n={}), section("c", 2)]
+
+
+async def test_rejected_patch_writes_nothing(pages):
+    request = PagePatchRequest(operations=[
+        {"op": "replace", "path": "/sections/a/settings/heading", "value": "x"},
+        {"op": "add", "path": "/sections/-", "value": section("b")},
+    ])
+    with pytest.raises(HTTPException) as rejected:
+        await patch_page("pg", request, USER, pages)
+
+    assert rejected.value.status_code == 409
+    assert rejected.value.detail["existing_sections"] == ["b"]
+    assert await stored_sections(pages) == (3, [section("a"), section("b", 1)])
+
+
+async def test_page_without_owner_is_claimed_through_its_store(pages):
+    await pages.pages.update_one({"id": "pg"}, {"$unset": {"user_id": ""}})
+    await pages.stores.insert_one({"id": "s1", "user_id": "u1"})
+    request = PagePatchRequest(operations=[{"op": "replace", "path": "/title", "value": "Nouveau"}])
+
+    with pytest.raises(HTTPException) as refused:
+        await patch_page("pg", request, {"user_id": "u2"}, pages)
+    assert refused.value.status_code == 404
+    assert "user_id" not in await pages.pages.find_one({"id": "pg"})
+
+    response = json.loads((await patch_page("pg", request, USER, pages)).body)
+    page = await pages.pages.find_one({"id": "pg"})
+    assert response["version"] == page["version"] == 4
+    assert (page["user_id"], page["title"]) == ("u1", "Nouveau")
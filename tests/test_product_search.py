@@ -0,0 +1,187 @@
+"""Recherche de produits : index par boutique et routes"""
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from routes.products import search_products
+from routes.stores import get_store
+from services.document_cache import document_cache
+from services.product_search import StoreIndex, product_search
+
+pytestmark = pytest.mark.anyio
+
+USER = {"user_id": "u1"}
+
+
+@pytest.fixture
+async def store_db(mongo_db):
+    document_cache.clear()
+    product_search.clear()
+    await mongo_db.stores.insert_one({"id": "s1", "user_id": "u1", "name": "Boutique", "is_active": True, "version": 1})
+    await mongo_db.products.insert_one(
+        {"id": "p1", "store_id": "s1", "user_id": "u1", "name": "Tasse bleue", "price": 12.0, "is_active": True}
+    )
+    yield mongo_db
+    document_cache.clear()
+    product_search.clear()
+
+
+async def search(database, q):
+    response = await search_products(
+        "s1", q=q, category=None, tag=None, min_price=None, max_price=None, is_active=None, sort=None,
+        limit=20, offset=0, facets=False, current_user=USER, database=database
+    )
+    return [product["id"] for product in json.loads(response.body)["products"]]
+
+
+@pytest.mark.parametrize("search_first", [True, False])
+async def test_search_and_get_store_share_the_cache_entry(store_db, search_first):
+    if search_first:
+        assert await search(store_db, "tasse") == ["p1"]
+    store = await get_store("s1", None, USER, store_db)
+
+    assert json.loads(store.body)["store"]["name"] == "Boutique"
+    assert store.headers["etag"]
+    assert await search(store_db, "tasse") == ["p1"]
+
+
+def product(product_id, name, version=1, **fields):
+    return {"id": product_id, "store_id": "s1", "name": name, "version": version, "price": 10.0, **fields}
+
+
+@pytest.fixture
+def catalog():
+    index = StoreIndex("s1", price_buckets=(20.0, 50.0))
+    for item in [
+        product("mug", "Tasse en céramique", category="cuisine", tags=["bleu"], price=12.0),
+        product("bol", "Bol", category="cuisine", tags=["bleu", "lot"], price=25.0,
+                description="Idéal avec une tasse de thé"),
+        product("the", "Thé vert", category="epicerie", tags=["tasse"], price=8.0),
+        product("sac", "Sac cabas", category="mode", tags=["lot"], price=60.0, is_active=False),
+        product("tasseau", "Tasseau en bois", category="bricolage", price=4.0),
+    ]:
+        index.upsert(item)
+    return index
+
+
+def ids(response):
+    return [hit["id"] for hit in response["products"]]
+
+
+def test_ranking_prefers_name_then_tags_then_description(catalog):
+    assert ids(catalog.search("TASSE")) == ["mug", "the", "bol"]
+    assert ids(catalog.search("ceramique")) == ["mug"]
+    # Tous les termes sont requis ; les mots vides sont ignorés
+    assert ids(catalog.search("tasse de céramique")) == ["mug"]
+    assert ids(catalog.search("tasse inconnu")) == []
+
+
+def test_filters_combine(catalog):
+    assert ids(catalog.search(categories=["cuisine", "mode"], sort="price_asc")) == ["mug", "bol", "sac"]
+    assert ids(catalog.search(tags=["bleu", "lot"])) == ["bol"]
+    assert ids(catalog.search(min_price=8.0, max_price=25.0, sort="price_desc")) == ["bol", "mug", "the"]
+    assert ids(catalog.search(is_active=False)) == ["sac"]
+    assert catalog.search("tasse", is_active=True, categories=["cuisine"])["total"] == 2
+
+
+def test_facets_ignore_their_own_filter(catalog):
+    facets = catalog.search(categories=["cuisine"])["facets"]
+
+    # Les autres catégories restent proposées ; les tags sont comptés sur les résultats
+    assert {entry["value"]: entry["count"] for entry in facets["categories"]} == {
+        "cuisine": 2, "epicerie": 1, "mode": 1, "bricolage": 1
+    }
+    assert {entry["value"]: entry["count"] for entry in facets["tags"]} == {"bleu": 2, "lot": 1}
+    assert facets["price_ranges"] == [{"min": None, "max": 20.0, "count": 1}, {"min": 20.0, "max": 50.0, "count": 1}]
+
+
+def test_prefix_matches_completions(catalog):
+    assert set(ids(catalog.search("tas", prefix=True))) == {"mug", "the", "bol", "tasseau"}
+    assert ids(catalog.search("tas", prefix=True)) == ids(catalog.search("tas", prefix=True, sort="relevance"))
+    assert ids(catalog.search("vert ta", prefix=True)) == ["the"]
+
+    suggestion = catalog.suggest("tas", limit=5)
+    assert [completion["text"] for completion in suggestion["completions"]] == ["tasse", "tasseau"]
+    assert set(ids(suggestion)) == {"mug", "the", "bol", "tasseau"}
+
+
+def test_stale_version_is_ignored_and_remove_cleans_up(catalog):
+    assert not catalog.upsert(product("mug", "Assiette", version=1))
+    assert ids(catalog.search("assiette")) == []
+
+    assert catalog.upsert(product("mug", "Assiette", version=2))
+    assert ids(catalog.search("assiette")) == ["mug"]
+    assert ids(catalog.search("ceramique")) == []
+
+    assert catalog.remove("mug")
+    assert not catalog.remove("mug")
+    assert "mug" not in catalog
+    assert ids(catalog.search("assiette")) == []
+    assert catalog.suggest("assi")["completions"] == []
+
+
+def random_product(rng, product_id, version):
+    return product(
+        product_id,
+        " ".join(rng.sample(WORDS, rng.randrange(1, 4))),
+        version=version,
+        category=rng.choice(["cuisine", "mode", None]),
+        tags=rng.sample(["bleu", "lot", "promo"], rng.randrange(3)),
+        price=float(rng.randrange(1, 80)),
+        is_active=rng.random() < 0.8,
+        description=" ".join(rng.sample(WORDS, 2)),
+        created_at=datetime(2026, 1, 1) + timedelta(hours=rng.randrange(1000)),
+    )
+
+
+WORDS = ["tasse", "tasseau", "table", "tapis", "bol", "bois", "bleu", "sac", "savon", "thé"]
+
+QUERIES = [
+    {},
+    {"query": "ta", "prefix": True},
+    {"query": "bois"},
+    {"query": "bleu ta", "prefix": True, "is_active": True},
+    {"categories": ["cuisine"], "min_price": 10, "max_price": 50},
+    {"tags": ["lot", "promo"], "sort": "name"},
+    {"query": "tasse", "sort": "price_desc", "categories": ["mode", "cuisine"]},
+    {"is_active": False, "sort": "newest", "max_price": 40},
+]
+
+
+def comparable(response):
+    """Résultats d'une recherche, indépendants de l'ordre d'indexation à égalité (score, facettes)"""
+    hits = [(hit["id"], hit["score"]) for hit in response["products"]]
+    facets = {
+        name: sorted(entries, key=repr)
+        for name, entries in response["facets"].items()
+    }
+    return response["total"], sorted(hits) if hits and hits[0][1] is not None else hits, facets
+
+
+def test_incremental_updates_match_a_rebuilt_index():
+    rng = random.Random(24)
+    index = StoreIndex("s1", price_buckets=(20.0, 50.0))
+    products, versions = {}, {}
+    for round_number in range(300):
+        product_id = f"p{rng.randrange(40)}"
+        if product_id in products and rng.random() < 0.3:
+            index.remove(product_id)
+            del products[product_id]
+        else:
+            versions[product_id] = versions.get(product_id, 0) + 1
+            products[product_id] = random_product(rng, product_id, versions[product_id])
+            index.upsert(products[product_id])
+        if round_number % 25 == 0:
+            # Ordres, termes triés et tranches de prix construits en cours de route
+            for query in QUERIES:
+                index.search(limit=100, **query)
+
+    rebuilt = StoreIndex("s1", price_buckets=(20.0, 50.0))
+    for item in products.values():
+        rebuilt.upsert(item)
+    for query in QUERIES:
+        assert comparable(index.search(limit=100, **query)) == comparable(rebuilt.search(limit=100, **query)), query
+    assert index.suggest("ta")["completions"] == rebuilt.suggest("ta")["completions"]
+    assert index.term_count == rebuilt.term_count
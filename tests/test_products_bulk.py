@@ -0,0 +1,56 @@
+"""Import de produits en lot : statut par produit"""
+import json
+
+import pytest
+
+from models.product import ProductBulkRequest
+from routes.products import bulk_write_products
+from services.product_search import product_search
+
+pytestmark = pytest.mark.anyio
+
+USER = {"user_id": "u1"}
+
+
+@pytest.fixture
+async def catalog(mongo_db):
+    product_search.clear()
+    await mongo_db.stores.insert_one({"id": "s1", "user_id": "u1", "is_active": True})
+    await mongo_db.products.insert_many([
+        {"id": "p1", "store_id": "s1", "user_id": "u1", "name": "Tasse", "price": 5.0, "version": 2},
+        {"id": "autre", "store_id": "s9", "user_id": "u2", "name": "Bol", "price": 7.0, "version": 1},
+    ])
+    yield mongo_db
+    product_search.clear()
+
+
+def item(product_id, store_id="s1", **fields):
+    return {"id": product_id, "store_id": store_id, "name": product_id, "price": 10.0, **fields}
+
+
+async def bulk(database, mode, *items):
+    request = ProductBulkRequest(mode=mode, products=list(items))
+    return json.loads((await bulk_write_products(request, USER, database)).body)
+
+
+async def test_update_reports_each_product_from_its_write(catalog):
+    response = await bulk(catalog, "update", item("p1", name="Grande tasse"), item("absent"), item("autre"),
+                          item("p1"), item("p2", store_id="s9"))
+
+    assert [entry["status"] for entry in response["results"]] == ["updated", "not_found", "not_found", "error", "error"]
+    assert response["counts"]["updated"] == 1 and not response["success"]
+    p1 = await catalog.products.find_one({"id": "p1"})
+    assert (p1["name"], p1["version"]) == ("Grande tasse", 3)
+    # Ni création, ni écriture sur le produit d'un autre utilisateur
+    assert await catalog.products.count_documents({}) == 2
+    assert (await catalog.products.find_one({"id": "autre"}))["name"] == "Bol"
+
+
+async def test_create_and_upsert(catalog):
+    created = await bulk(catalog, "create", item("p1", name="Ignoré"), item("p3"))
+    assert [entry["status"] for entry in created["results"]] == ["unchanged", "created"]
+    assert (await catalog.products.find_one({"id": "p1"}))["name"] == "Tasse"
+
+    upserted = await bulk(catalog, "upsert", item("p1", name="Mug"), item("p4"))
+    assert [entry["status"] for entry in upserted["results"]] == ["updated", "created"]
+    assert (await catalog.products.find_one({"id": "p1"}))["version"] == 3
@@ -0,0 +1,89 @@
+"""Registre des prompts : rendu, versions, variantes A/B et clés de cache"""
+from collections import Counter
+
+import pytest
+
+from config import settings
+from services.prompts import PromptRegistry, PromptTemplate, prompt_cache_id, prompt_registry
+
+TEXT = 'Boutique {brand_name} ({business_type}) : {{"heading": "{brand_name}"}}'
+
+
+def test_render_fills_fields_and_keeps_json_braces():
+    template = PromptTemplate("hero", 1, TEXT)
+
+    rendered = template.render(brand_name="Kora", business_type="mode", inutilisé="ignoré")
+
+    assert rendered == 'Boutique Kora (mode) : {"heading": "Kora"}'
+    assert template.fields == ("brand_name", "business_type")
+    assert rendered.template is template
+    assert template.estimate_tokens(brand_name="Kora", business_type="mode") == len(rendered) // 4
+
+
+def test_missing_value_raises():
+    with pytest.raises(KeyError):
+        PromptTemplate("hero", 1, TEXT).render(brand_name="Kora")
+
+
+@pytest.mark.parametrize("text", ["{brand.name}", "{brand_name!r}", "{price:.2f}", "{0}"])
+def test_unsupported_fields_are_rejected_at_compile_time(text):
+    with pytest.raises(ValueError, match="Champ non supporté"):
+        PromptTemplate("hero", 1, text)
+
+
+def test_cache_id_depends_on_version_variant_values_and_text():
+    base = PromptTemplate("hero", 1, TEXT)
+    values = {"brand_name": "Kora", "business_type": "mode"}
+
+    def cache_id(template, **overrides):
+        return prompt_cache_id(template.render(**{**values, **overrides}))
+
+    assert cache_id(base) == cache_id(PromptTemplate("hero", 1, TEXT))
+    assert len({
+        cache_id(base),
+        cache_id(base, brand_name="Zola"),
+        cache_id(PromptTemplate("hero", 2, TEXT)),
+        cache_id(PromptTemplate("hero", 1, TEXT, variant="b")),
+        # Texte modifié sans nouvelle version : nouvelle clé quand même
+        cache_id(PromptTemplate("hero", 1, TEXT + " Sans texte autour.")),
+    }) == 5
+    # Un texte hors registre sert lui-même de clé
+    assert prompt_cache_id("texte libre") == "texte libre"
+
+
+def test_registry_rejects_duplicate_variants():
+    registry = PromptRegistry()
+    registry.register(PromptTemplate("hero", 1, TEXT))
+    registry.register(PromptTemplate("hero", 1, TEXT, variant="b"))
+
+    with pytest.raises(ValueError, match="déjà enregistré"):
+        registry.register(PromptTemplate("hero", 2, TEXT, variant="b"))
+    with pytest.raises(KeyError):
+        registry.get("hero", "c")
+    assert [entry["key"] for entry in registry.describe()["hero"]] == ["hero@v1/default", "hero@v1/b"]
+
+
+def test_variant_selection_is_stable_and_weighted(monkeypatch):
+    registry = PromptRegistry()
+    registry.register(PromptTemplate("hero", 1, TEXT, weight=3.0))
+    registry.register(PromptTemplate("hero", 1, TEXT, variant="b", weight=1.0))
+
+    monkeypatch.setattr(settings, "ai_prompt_ab_enabled", False)
+    assert {registry.select("hero", f"marque-{n}").variant for n in range(50)} == {"default"}
+
+    monkeypatch.setattr(settings, "ai_prompt_ab_enabled", True)
+    assert registry.select("hero", "Kora") is registry.select("hero", "Kora")
+    shares = Counter(registry.select("hero", f"marque-{n}").variant for n in range(2000))
+    assert 0.7 < shares["default"] / 2000 < 0.8
+
+
+def test_shipped_prompts_render():
+    context = {
+        "business_type": "mode", "brand_name": "Kora", "target_audience": "jeunes",
+        "product_name": "Sac", "category": "maroquinerie", "features": "- cuir",
+        "section": "hero", "error": "JSON invalide", "schema_line": "", "raw_content": "{",
+    }
+    for name, variants in prompt_registry.describe().items():
+        for entry in variants:
+            variant = entry["key"].rsplit("/", 1)[1]
+            assert prompt_registry.get(name, variant).render(**context).strip()
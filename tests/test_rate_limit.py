@@ -0,0 +1,117 @@
+"""Limitation de débit par fenêtre glissante et en-tête Retry-After"""
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from config import settings
+from routes.ai import client_ip, enforce_ai_limits
+from services.rate_limit import MongoRateLimitStore, RateLimiter, RateLimitExceeded, _retry_after
+
+pytestmark = pytest.mark.anyio
+
+# Début d'une fenêtre de 60 s
+T0 = 6000.0
+
+
+@pytest.fixture(params=["memory", "mongo"])
+async def limiter(request, mongo_db):
+    limiter = RateLimiter()
+    if request.param == "mongo":
+        limiter.store = MongoRateLimitStore(mongo_db.rate_limits)
+    return limiter
+
+
+async def test_limit_is_enforced_within_a_window(limiter):
+    for _ in range(3):
+        await limiter.acquire([("k", 3, 60, 1)], now=T0 + 10)
+
+    with pytest.raises(RateLimitExceeded) as exceeded:
+        await limiter.acquire([("k", 3, 60, 1)], now=T0 + 20)
+
+    # Fenêtre suivante : la précédente compte encore 3 × 40/60 = 2
+    assert exceeded.value.retry_after == 40 + 20
+    assert limiter.stats()["rejected"] == 1
+
+
+async def test_previous_window_weight_decays(limiter):
+    for _ in range(4):
+        await limiter.acquire([("k", 4, 60, 1)], now=T0 + 59)
+
+    # À mi-fenêtre suivante : 4 × 0,5 = 2, il reste 2 places
+    for _ in range(2):
+        await limiter.acquire([("k", 4, 60, 1)], now=T0 + 90)
+    with pytest.raises(RateLimitExceeded) as exceeded:
+        await limiter.acquire([("k", 4, 60, 1)], now=T0 + 90)
+
+    # 4 × (1 - e) + 2 + 1 <= 4 dès que e >= 3/4, soit 15 s plus tard
+    assert exceeded.value.retry_after == 15
+    await limiter.acquire([("k", 4, 60, 1)], now=T0 + 90 + exceeded.value.retry_after)
+
+
+async def test_rejected_request_consumes_no_rule(limiter):
+    rules = [("requests", 10, 60, 1), ("tokens", 100, 60, 80)]
+    await limiter.acquire(rules, now=T0)
+
+    with pytest.raises(RateLimitExceeded) as exceeded:
+        await limiter.acquire(rules, now=T0 + 1)
+    assert exceeded.value.key == "tokens"
+
+    # Le refus n'a rien consommé : il reste 20 tokens et 9 requêtes
+    await limiter.acquire([("requests", 10, 60, 9), ("tokens", 100, 60, 20)], now=T0 + 2)
+
+
+async def test_cost_above_limit_waits_a_full_window(limiter):
+    with pytest.raises(RateLimitExceeded) as exceeded:
+        await limiter.acquire([("k", 10, 60, 11)], now=T0 + 30)
+
+    assert exceeded.value.retry_after == 60
+
+
+@pytest.mark.parametrize("previous,current,cost,elapsed", [
+    (10, 0, 1, 0.0), (10, 5, 2, 0.3), (0, 10, 1, 0.5), (7, 3, 4, 0.9), (10, 10, 5, 0.1),
+])
+def test_retry_after_is_the_first_second_that_passes(previous, current, cost, elapsed):
+    limit, window_seconds = 10, 60
+    wait = _retry_after(limit, previous, current, cost, elapsed, window_seconds)
+
+    def passes(seconds):
+        position = elapsed + seconds / window_seconds
+        if position < 1:
+            return previous * (1 - position) + current + cost <= limit
+        # Fenêtre suivante : la courante devient la précédente
+        return current * (2 - position) + cost <= limit if position < 2 else True
+
+    assert passes(wait)
+    assert wait == 1 or not passes(wait - 1)
+
+
+async def test_ai_limits_answer_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(settings, "ai_rate_limit_requests", 1)
+    monkeypatch.setattr("routes.ai.rate_limiter", RateLimiter())
+
+    await enforce_ai_limits("u1", 10)
+    with pytest.raises(HTTPException) as refused:
+        await enforce_ai_limits("u1", 10)
+
+    assert refused.value.status_code == 429
+    assert int(refused.value.headers["Retry-After"]) >= 1
+    assert refused.value.headers["X-RateLimit-Limit"] == "1"
+
+
+def request_from(peer, *forwarded):
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded]
+    return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+
+@pytest.mark.parametrize("hops,forwarded,expected", [
+    (0, ["6.6.6.6"], "10.0.0.1"),
+    (1, ["6.6.6.6, 1.2.3.4"], "1.2.3.4"),
+    (2, ["6.6.6.6, 1.2.3.4", "10.0.0.2"], "1.2.3.4"),
+    (2, ["1.2.3.4"], "10.0.0.1"),
+    (1, [], "10.0.0.1"),
+])
+def test_client_ip_trusts_only_the_declared_proxies(monkeypatch, hops, forwarded, expected):
+    monkeypatch.setattr(settings, "trusted_proxy_hops", hops)
+
+    assert client_ip(request_from("10.0.0.1", *forwarded)) == expected
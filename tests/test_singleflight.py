@@ -0,0 +1,93 @@
+"""Coalescence des appels identiques en cours (single-flight)"""
+import asyncio
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+class Upstream:
+    """Appel amont bloqué jusqu'à release() ; compte les exécutions et les annulations"""
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+        self.gate = asyncio.Event()
+        self.error = None
+
+    async def __call__(self):
+        self.started += 1
+        try:
+            await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return "résultat"
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight, upstream = SingleFlight(), Upstream()
+    callers = [asyncio.create_task(flight.do("clé", upstream)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    upstream.gate.set()
+
+    assert await asyncio.gather(*callers) == ["résultat"] * 3
+    assert upstream.started == 1
+    stats = flight.stats()
+    assert (stats["executions"], stats["coalesced"], stats["in_flight"]) == (1, 2, 0)
+
+
+async def test_error_is_raised_to_every_caller_and_not_cached():
+    flight, upstream = SingleFlight(), Upstream()
+    upstream.error = ValueError("amont en panne")
+    callers = [asyncio.create_task(flight.do("clé", upstream)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    upstream.gate.set()
+    results = await asyncio.gather(*callers, return_exceptions=True)
+
+    assert [str(result) for result in results] == ["amont en panne"] * 3
+    assert all(isinstance(result, ValueError) for result in results)
+    # L'échec n'est pas mémorisé : l'appel suivant relance l'amont
+    upstream.error = None
+    assert await flight.do("clé", upstream) == "résultat"
+    assert upstream.started == 2
+
+
+async def test_cancelled_caller_does_not_cancel_the_others():
+    flight, upstream = SingleFlight(), Upstream()
+    leaving = asyncio.create_task(flight.do("clé", upstream))
+    staying = asyncio.create_task(flight.do("clé", upstream))
+    await asyncio.sleep(0)
+
+    leaving.cancel()
+    await asyncio.sleep(0)
+    upstream.gate.set()
+
+    assert await staying == "résultat"
+    assert leaving.cancelled()
+    assert upstream.cancelled == 0
+    assert flight.stats()["cancelled_waiters"] == 1
+
+
+async def test_upstream_is_cancelled_when_every_caller_left():
+    flight, upstream = SingleFlight(), Upstream()
+    callers = [asyncio.create_task(flight.do("clé", upstream)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    for caller in callers:
+        caller.cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert upstream.cancelled == 1
+    assert flight.stats()["cancelled_executions"] == 1
+    # Un nouvel appelant relance une exécution neuve
+    upstream.gate.set()
+    assert await flight.do("clé", upstream) == "résultat"
+    assert upstream.started == 2
@@ -0,0 +1,147 @@
+"""Historique des versions : deltas, reconstruction et élagage"""
+import copy
+import random
+
+import pytest
+
+from services.version_history import VersionHistory, apply_delta, diff_documents
+
+PAGE = {
+    "id": "p1",
+    "title": "Accueil",
+    "version": 3,
+    "sections": [
+        {"id": "hero", "content": {"heading": "Bienvenue", "cta": ["Acheter", "Voir"]}},
+        {"id": "about", "content": {"paragraphs": ["a", "b"]}},
+    ],
+}
+
+
+def typed(value):
+    """Forme comparable qui distingue 1, 1.0 et True (l'ordre des clés est ignoré)"""
+    if isinstance(value, dict):
+        return {key: typed(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [typed(item) for item in value]
+    return type(value).__name__, value
+
+
+def edited(**changes):
+    page = copy.deepcopy(PAGE)
+    for path, value in changes.items():
+        *parents, last = path.split("__")
+        target = page
+        for token in parents:
+            target = target[int(token) if token.isdigit() else token]
+        target[int(last) if last.isdigit() else last] = value
+    return page
+
+
+@pytest.mark.parametrize("after", [
+    edited(title="Maison"),
+    edited(sections__0__content__heading="Salut"),
+    edited(sections__1__content__paragraphs=["a", "x", "b"]),
+    edited(sections=[PAGE["sections"][1]]),
+    edited(sections__0__content={"heading": "Bienvenue"}),
+    {**PAGE, "published": True},
+    {key: value for key, value in PAGE.items() if key != "title"},
+])
+def test_delta_round_trip(after):
+    delta = diff_documents(PAGE, after)
+
+    assert apply_delta(copy.deepcopy(PAGE), delta) == after
+    assert diff_documents(PAGE, copy.deepcopy(PAGE)) == {}
+
+
+@pytest.mark.parametrize("old,new", [(1, 1.0), (1.0, True), (True, 1), (0, False), ([1, 2], [1.0, 2]), ({"a": 1}, {"a": True})])
+def test_type_changes_are_recorded(old, new):
+    before, after = {**PAGE, "value": old}, {**PAGE, "value": new}
+
+    delta = diff_documents(before, after)
+    restored = apply_delta(copy.deepcopy(before), delta)
+
+    assert delta
+    assert typed(restored["value"]) == typed(new)
+
+
+def random_value(rng, depth=0):
+    choice = rng.randrange(7 if depth < 3 else 4)
+    if choice == 0:
+        return rng.choice([0, 1, 2])
+    if choice == 1:
+        return rng.choice([0.0, 1.0, True, False, None])
+    if choice == 2:
+        return rng.choice("abc")
+    if choice == 3:
+        return rng.choice([[], {}])
+    if choice in (4, 5):
+        return [random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+    return {rng.choice("xyz"): random_value(rng, depth + 1) for _ in range(rng.randrange(4))}
+
+
+def test_random_documents_round_trip():
+    rng = random.Random(23)
+    for _ in range(2000):
+        before, after = random_value(rng, 1), random_value(rng, 1)
+        before, after = {"v": before}, {"v": after}
+
+        restored = apply_delta(copy.deepcopy(before), diff_documents(before, after))
+
+        assert typed(restored) == typed(after)
+
+
+@pytest.fixture
+async def history(mongo_db):
+    history = VersionHistory(snapshot_interval=5, detailed_versions=5, max_versions=12, max_age_days=0)
+    await history.attach_collection(mongo_db.document_versions)
+    return history
+
+
+def page_at(version):
+    return {
+        "id": "p1",
+        "user_id": "u1",
+        "version": version,
+        "title": f"Titre {version // 3}",
+        "sections": [{"id": f"s{number}", "n": number} for number in range(version % 4)],
+    }
+
+
+@pytest.mark.anyio
+async def test_every_recorded_version_is_rebuilt(history, mongo_db):
+    # Avant le premier élagage qui retire des deltas (version 10)
+    for version in range(1, 10):
+        await history.record(mongo_db.pages, page_at(version))
+
+    for version in range(1, 10):
+        assert await history.get_version("pages", "p1", "u1", version) == page_at(version)
+    assert await history.get_version("pages", "p1", "u2", 3) is None
+    assert [entry["version"] for entry in await history.list_versions("pages", "p1", "u1", limit=3)] == [9, 8, 7]
+    stats = history.stats()
+    assert (stats["snapshots"], stats["deltas"]) == (2, 7)
+
+
+@pytest.mark.anyio
+async def test_pruned_history_keeps_snapshots_and_recent_deltas(history, mongo_db):
+    for version in range(1, 31):
+        await history.record(mongo_db.pages, page_at(version))
+
+    kept = {
+        version: await history.get_version("pages", "p1", "u1", version)
+        for version in range(1, 31)
+    }
+
+    # Au-delà de max_versions : rien ; avant les versions détaillées : snapshots seulement
+    assert {version for version, page in kept.items() if page is not None} == {15, 20, *range(25, 31)}
+    assert all(page == page_at(version) for version, page in kept.items() if page is not None)
+
+
+@pytest.mark.anyio
+async def test_out_of_order_version_is_stored_as_snapshot(history, mongo_db):
+    await history.record(mongo_db.pages, page_at(1))
+    await history.record(mongo_db.pages, page_at(3))
+    await history.record(mongo_db.pages, page_at(2))
+
+    assert history.stats()["out_of_order"] == 1
+    for version in (1, 2, 3):
+        assert await history.get_version("pages", "p1", "u1", version) == page_at(version)